@@ -0,0 +1,144 @@
+"""Bit-matrix representation for binary relations over a small domain.
+
+A binary relation over a domain of `n` values numbered `0` to `n - 1` is stored as an
+`n` by `n` boolean matrix with each row packed into `uint64` words, so row `i` is the
+set of the values `j` with `(i, j)` in the relation. Union is a bitwise or of the
+words, and the composition of a set of pairs with the matrix, the join and project
+`{(i, k) | (i, j) in pairs, (j, k) in matrix}`, is a bitwise or of the rows `j` for
+each `i`. Both run as vectorised NumPy operations on whole rows in place of joining
+one tuple at a time, which is much faster for reachability when the domain is small
+enough that a row fits in a few thousand words.
+
+The relations in the interpreter stay `Relation` instances; `BitMatrix` is the
+representation the transitive-closure evaluation in `project5.closure` switches to
+while it evaluates an SCC whose active domain has at most `BITMATRIX_DOMAIN_LIMIT`
+values.
+
+This module requires NumPy which is an optional dependency of the package.
+"""
+
+import numpy as np
+import numpy.typing as npt
+
+from project5.relation import IncompatibleOperandError
+
+IdArray = npt.NDArray[np.int64]
+"""Defines a type for a vector of values by their number in the domain."""
+
+BitArray = npt.NDArray[np.uint64]
+"""Defines a type for rows of packed bits: one row per value and `uint64` words."""
+
+BITMATRIX_DOMAIN_LIMIT = 16384
+"""
+The most values in the domain of a closure evaluated with bit matrices. Each matrix
+takes `n * n / 8` bytes, which is 32 MiB at the limit.
+"""
+
+COMPOSE_CHUNK_WORDS = 1 << 20
+"""
+The most words of rows gathered at once by `BitMatrix.compose`, 8 MiB, so composing
+many pairs takes memory for the rows of the result and not a row for every pair.
+"""
+
+
+class BitMatrix:
+    """Boolean matrix of a binary relation with each row packed into words.
+
+    Attributes:
+        size (int): The number of values in the domain.
+        bits (BitArray): One row of `ceil(size / 64)` words for each value. Bit `j % 64`
+            of word `j // 64` in row `i` is set if `(i, j)` is in the relation.
+    """
+
+    __slots__ = ["size", "bits"]
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.bits: BitArray = np.zeros((size, (size + 63) // 64), dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return int(np.unpackbits(self.bits.view(np.uint8)).sum())
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, BitMatrix):
+            return False
+        return self.size == other.size and bool(np.array_equal(self.bits, other.bits))
+
+    def __repr__(self) -> str:
+        return f"BitMatrix(size={self.size!r}, pairs={len(self)!r})"
+
+    @staticmethod
+    def from_pairs(size: int, rows: IdArray, cols: IdArray) -> "BitMatrix":
+        """The matrix of size `size` with the pairs `(rows[k], cols[k])` set."""
+        answer = BitMatrix(size)
+        answer.add(rows, cols)
+        return answer
+
+    def add(self, rows: IdArray, cols: IdArray) -> None:
+        """Set the pairs `(rows[k], cols[k])` in this matrix in place."""
+        masks = np.left_shift(np.uint64(1), (cols % 64).astype(np.uint64))
+        np.bitwise_or.at(self.bits, (rows, cols // 64), masks)
+
+    def union(self, right_operand: "BitMatrix") -> "BitMatrix":
+        """The union of this matrix and another of the same size.
+
+        Raises:
+            error (IncompatibleOperandError): Error if the sizes are not the same.
+        """
+        if self.size != right_operand.size:
+            raise IncompatibleOperandError(
+                "Error: the sizes do not equal each other in BitMatrix.union"
+            )
+        answer = BitMatrix(self.size)
+        answer.bits = self.bits | right_operand.bits
+        return answer
+
+    def pairs(self) -> tuple[IdArray, IdArray]:
+        """The rows and columns of the pairs set in this matrix."""
+        rows = np.flatnonzero(self.bits.any(axis=1))
+        return _decode(rows, self.bits[rows], self.size)
+
+    def compose(self, rows: IdArray, mids: IdArray) -> tuple[IdArray, BitArray]:
+        """The composition of the pairs `(rows[k], mids[k])` with this matrix.
+
+        The composition has the pairs `(i, j)` with `(i, m)` one of the given pairs and
+        `(m, j)` in this matrix. Only the rows `i` of the given pairs are computed. The
+        rows `m` are gathered and or-ed into the rows `i` in chunks of at most
+        `COMPOSE_CHUNK_WORDS` words.
+
+        Returns:
+            out (tuple[IdArray, BitArray]): The distinct rows in increasing order and
+                the packed row of the composition for each.
+        """
+        if rows.shape[0] == 0:
+            return rows, self.bits[:0]
+        order = np.argsort(rows, kind="stable")
+        sorted_rows = rows[order]
+        sorted_mids = mids[order]
+        firsts = np.r_[True, sorted_rows[1:] != sorted_rows[:-1]]
+        groups = np.cumsum(firsts) - 1
+        composed = np.zeros((int(groups[-1]) + 1, self.bits.shape[1]), np.uint64)
+        chunk = max(1, COMPOSE_CHUNK_WORDS // max(1, self.bits.shape[1]))
+        for low in range(0, rows.shape[0], chunk):
+            high = min(low + chunk, rows.shape[0])
+            starts = np.flatnonzero(np.r_[True, firsts[low + 1 : high]])
+            reduced = np.bitwise_or.reduceat(
+                self.bits[sorted_mids[low:high]], starts, axis=0
+            )
+            composed[groups[low + starts]] |= reduced
+        return sorted_rows[firsts], composed
+
+    def new_pairs(self, rows: IdArray, bits: BitArray) -> tuple[IdArray, IdArray]:
+        """The pairs set in the packed `bits` for `rows` that are not in this matrix."""
+        return _decode(rows, bits & ~self.bits[rows], self.size)
+
+
+def _decode(rows: IdArray, bits: BitArray, size: int) -> tuple[IdArray, IdArray]:
+    """The rows and columns of the pairs set in the packed `bits` for `rows`."""
+    if rows.shape[0] == 0:
+        return rows, rows
+    unpacked = np.unpackbits(
+        bits.astype("<u8").view(np.uint8), axis=1, bitorder="little"
+    )[:, :size]
+    positions, cols = np.nonzero(unpacked)
+    return rows[positions].astype(np.int64), cols.astype(np.int64)
@@ -0,0 +1,276 @@
+"""Transitive-closure evaluation for the recursive SCCs that compute one.
+
+The most common recursion in a Datalog program is the transitive closure of a
+relation, written with one of three recursive rules for a head `p(X,Z)`:
+
+    p(X,Z) :- e(X,Y),p(Y,Z).   right-linear
+    p(X,Z) :- p(X,Y),e(Y,Z).   left-linear
+    p(X,Z) :- p(X,Y),p(Y,Z).   doubly recursive
+
+The rule `p(X,Z) :- e(X,Z).` that starts the closure does not depend on `p`, so it is
+in an SCC of its own that is evaluated before. An SCC made only of rules of these
+three shapes for the same head is evaluated here with adjacency indexes of `e` and `p`
+in place of the relational joins: each rule extends only the paths that end, or start,
+at the tuples added to `p` since the rule was last evaluated, which is a breadth-first
+search from every source at once. When the domain is small the indexes are
+`BitMatrix` rows and the joins are bitwise operations on them. The passes, the order
+of the rules, and the tuples each rule adds are exactly those of `Interpreter.eval_scc`,
+so the report is the same.
+"""
+
+from typing import TYPE_CHECKING, Iterator
+
+from project5.datalogprogram import Rule
+from project5.interpreter import Interpreter
+from project5.relation import Relation, RelationTuple, Value
+
+if TYPE_CHECKING:
+    from project5.bitmatrix import IdArray
+
+Adjacency = dict[Value, list[Value]]
+"""Defines a type for the values adjacent to each value in a binary relation."""
+
+
+def _adjacency(tuples: set[RelationTuple], source: int) -> Adjacency:
+    """The values in the other column for each value in column `source`."""
+    answer: Adjacency = {}
+    for r in tuples:
+        answer.setdefault(r[source], []).append(r[1 - source])
+    return answer
+
+
+def closure_shape(rule: Rule) -> tuple[str, str] | None:
+    """The shape of a transitive-closure rule and the name of its edge relation.
+
+    Returns:
+        out (tuple[str, str] | None): `("right", e)`, `("left", e)`, or `("double",
+            p)` for the shapes in this module, or `None` for any other rule.
+    """
+    head = rule.head
+    if len(head.parameters) != 2 or len(rule.predicates) != 2:
+        return None
+    first, second = rule.predicates
+    if [len(first.parameters), len(second.parameters)] != [2, 2]:
+        return None
+    parameters = head.parameters + first.parameters + second.parameters
+    if not all(i.is_id() for i in parameters):
+        return None
+    x, y, z = (
+        head.parameters[0].value,
+        first.parameters[1].value,
+        head.parameters[1].value,
+    )
+    if len(set([x, y, z])) != 3:
+        return None
+    if [i.value for i in first.parameters + second.parameters] != [x, y, y, z]:
+        return None
+    if first.name == head.name and second.name == head.name:
+        return ("double", head.name)
+    if second.name == head.name:
+        return ("right", first.name)
+    if first.name == head.name:
+        return ("left", second.name)
+    return None
+
+
+def closure_shapes(
+    interpreter: Interpreter, scc: list[int]
+) -> list[tuple[str, str]] | None:
+    """The shape of each rule in the SCC, or `None` if it is not a closure.
+
+    The rules must all have the same head and one of the shapes of `closure_shape`,
+    the edge relations must not be the head, and the relations must be stored in the
+    set backend.
+    """
+    rules = [interpreter.datalog.rules[i] for i in scc]
+    if interpreter.backend != "set" or len(set(i.head.name for i in rules)) != 1:
+        return None
+    shapes = [closure_shape(i) for i in rules]
+    answer = [i for i in shapes if i is not None]
+    if len(answer) != len(rules):
+        return None
+    if not all(i in interpreter.table_list for _, i in answer):
+        return None
+    return answer
+
+
+class _AdjacencyIndexes:
+    """The adjacency indexes of the edge and head relations of a closure SCC."""
+
+    __slots__ = ["name", "into", "out"]
+
+    def __init__(
+        self, interpreter: Interpreter, name: str, shapes: list[tuple[str, str]]
+    ) -> None:
+        self.name = name
+        self.into: dict[str, Adjacency] = {}
+        self.out: dict[str, Adjacency] = {}
+        for kind, edge in shapes:
+            tuples = interpreter.table_list[edge].set_of_tuples
+            if kind in ("right", "double") and edge not in self.into:
+                self.into[edge] = _adjacency(tuples, 1)
+            if kind in ("left", "double") and edge not in self.out:
+                self.out[edge] = _adjacency(tuples, 0)
+
+    def derive(
+        self, kind: str, edge: str, delta: list[RelationTuple]
+    ) -> set[RelationTuple]:
+        """The tuples the rule derives from the new tuples `delta` of the head."""
+        derived: set[RelationTuple] = set()
+        if kind in ("right", "double"):
+            for y, z in delta:
+                derived.update((x, z) for x in self.into[edge].get(y, []))
+        if kind in ("left", "double"):
+            for x, y in delta:
+                derived.update((x, z) for z in self.out[edge].get(y, []))
+        return derived
+
+    def record(self, new_tuples: set[RelationTuple]) -> None:
+        """Add the new tuples of the head to its indexes."""
+        if self.name in self.into:
+            for x, z in new_tuples:
+                self.into[self.name].setdefault(z, []).append(x)
+                self.out[self.name].setdefault(x, []).append(z)
+
+
+class _BitMatrices:
+    """The bit matrices of the edge and head relations of a closure SCC.
+
+    The `forward` matrix of a relation has a row for each value in the first column
+    and the `backward` matrix has a row for each value in the second column. The head
+    always has both, since they also tell which derived tuples are new.
+    """
+
+    __slots__ = ["name", "domain", "ids", "forward", "backward"]
+
+    def __init__(
+        self,
+        interpreter: Interpreter,
+        name: str,
+        shapes: list[tuple[str, str]],
+        domain: list[Value],
+    ) -> None:
+        from project5.bitmatrix import BitMatrix
+
+        self.name = name
+        self.domain = domain
+        self.ids = {j: i for i, j in enumerate(domain)}
+        self.forward: dict[str, BitMatrix] = {}
+        self.backward: dict[str, BitMatrix] = {}
+        for kind, edge in shapes + [("double", name)]:
+            first, second = self.encode(
+                list(interpreter.table_list[edge].set_of_tuples)
+            )
+            if kind in ("right", "double") and edge not in self.backward:
+                self.backward[edge] = BitMatrix.from_pairs(len(domain), second, first)
+            if kind in ("left", "double") and edge not in self.forward:
+                self.forward[edge] = BitMatrix.from_pairs(len(domain), first, second)
+
+    def encode(self, tuples: list[RelationTuple]) -> "tuple[IdArray, IdArray]":
+        """The numbers in the domain of the first and second values of `tuples`."""
+        import numpy as np
+
+        ids = np.array(
+            [[self.ids[i] for i in r] for r in tuples], dtype=np.int64
+        ).reshape(-1, 2)
+        return ids[:, 0], ids[:, 1]
+
+    def derive(
+        self, kind: str, edge: str, delta: list[RelationTuple]
+    ) -> set[RelationTuple]:
+        """The new tuples the rule derives from the new tuples `delta` of the head."""
+        first, second = self.encode(delta)
+        domain = self.domain
+        derived: set[RelationTuple] = set()
+        if kind in ("right", "double"):
+            rows, bits = self.backward[edge].compose(second, first)
+            zs, xs = self.backward[self.name].new_pairs(rows, bits)
+            derived.update(
+                (domain[x], domain[z]) for x, z in zip(xs.tolist(), zs.tolist())
+            )
+        if kind in ("left", "double"):
+            rows, bits = self.forward[edge].compose(first, second)
+            xs, zs = self.forward[self.name].new_pairs(rows, bits)
+            derived.update(
+                (domain[x], domain[z]) for x, z in zip(xs.tolist(), zs.tolist())
+            )
+        return derived
+
+    def record(self, new_tuples: set[RelationTuple]) -> None:
+        """Add the new tuples of the head to its matrices."""
+        first, second = self.encode(list(new_tuples))
+        self.forward[self.name].add(first, second)
+        self.backward[self.name].add(second, first)
+
+
+def _bit_matrices(
+    interpreter: Interpreter, name: str, shapes: list[tuple[str, str]]
+) -> _BitMatrices | None:
+    """The bit matrices for the SCC, or `None` without NumPy or for a large domain."""
+    try:
+        from project5 import bitmatrix
+    except ImportError:
+        return None
+    values: set[Value] = set()
+    for _, edge in shapes + [("double", name)]:
+        for r in interpreter.table_list[edge].set_of_tuples:
+            values.update(r)
+            if len(values) > bitmatrix.BITMATRIX_DOMAIN_LIMIT:
+                return None
+    return _BitMatrices(interpreter, name, shapes, list(values))
+
+
+def eval_scc_closure(
+    interpreter: Interpreter, scc: list[int], shapes: list[tuple[str, str]]
+) -> Iterator[tuple[Relation, Rule, Relation]]:
+    """Yield each _before_ relation, rule, and _after_ relation from one closure SCC.
+
+    The SCC is evaluated pass after pass like `Interpreter.eval_scc`, with each rule
+    joining only the tuples added to the head relation since it was last evaluated to
+    the edge relation, or to the head relation for the doubly recursive shape. A rule
+    with no new tuples to join yields equal snapshots.
+
+    The joins use `BitMatrix` rows when NumPy is installed and the values in the edge
+    and head relations number at most `project5.bitmatrix.BITMATRIX_DOMAIN_LIMIT`, and
+    dictionary adjacency indexes otherwise.
+
+    Args:
+        interpreter (Interpreter): The interpreter with the relations.
+        scc (list[int]): The indices of the rules in the component from `get_scc`.
+        shapes (list[tuple[str, str]]): The shapes from `closure_shapes` for `scc`.
+
+    Returns:
+        out (Iterator[tuple[Relation, Rule, Relation]]): As in `Interpreter.eval_scc`.
+    """
+    name = interpreter.datalog.rules[scc[0]].head.name
+    relation = interpreter.table_list[name]
+    indexes: _AdjacencyIndexes | _BitMatrices | None = _bit_matrices(
+        interpreter, name, shapes
+    )
+    if indexes is None:
+        indexes = _AdjacencyIndexes(interpreter, name, shapes)
+
+    seen: dict[int, int] = {}
+    finish = True
+    while finish:
+        finish = False
+        for rule_index, (kind, edge) in zip(scc, shapes):
+            rule = interpreter.datalog.rules[rule_index]
+            before = relation.snapshot()
+            version = len(relation.history)
+            if seen.get(rule_index) == version:
+                yield (before, rule, before)
+                continue
+            if rule_index in seen:
+                delta: list[RelationTuple] = relation.history[seen[rule_index] :]
+            else:
+                delta = list(relation.set_of_tuples)
+            seen[rule_index] = version
+            derived = indexes.derive(kind, edge, delta)
+            new_tuples = interpreter.extend_relation(
+                name, Relation(relation.header, derived)
+            )
+            indexes.record(new_tuples)
+            if len(new_tuples) > 0:
+                finish = True
+            yield (before, rule, relation.snapshot())
@@ -0,0 +1,393 @@
+"""Columnar relation type for interpreting Datalog.
+
+The `ColumnarRelation` is an alternative storage backend for `Relation`. Values are
+dictionary-encoded to integer ids with a `SymbolTable` and the tuples are stored as
+a NumPy array with one integer column per attribute in the header. The relational
+operators run as vectorised array operations on the ids, and the values are only
+decoded when `set_of_tuples` is read.
+
+This module requires NumPy which is an optional dependency of the package.
+"""
+
+import numpy as np
+import numpy.typing as npt
+
+from project5.relation import (
+    IncompatibleOperandError,
+    JoinIndex,
+    Relation,
+    RelationTuple,
+    Value,
+)
+from project5.symboltable import SymbolTable
+
+IdArray = npt.NDArray[np.int64]
+"""Defines a type for the encoded tuples: one row per tuple and one column per attribute."""
+
+ValueArray = npt.NDArray[np.object_]
+"""Defines a type for the values of a symbol table indexed by their ids."""
+
+
+class ColumnarSymbolTable(SymbolTable):
+    """Symbol table that also keeps its values as a NumPy array for decoding.
+
+    Attributes:
+        array (ValueArray): The value for each id below `decoded`, with room for more.
+        decoded (int): The number of values copied into `array`.
+
+    Examples:
+        >>> symbols = ColumnarSymbolTable()
+        >>> symbols.encode("'a'"), symbols.encode("'b'")
+        (0, 1)
+        >>> symbols.decoder()[[1, 0]].tolist()
+        ["'b'", "'a'"]
+    """
+
+    __slots__ = ["array", "decoded"]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.array: ValueArray = np.empty(0, dtype=object)
+        self.decoded = 0
+
+    def decoder(self) -> ValueArray:
+        """The array of the values by id, extended with the values added since."""
+        count = len(self.values)
+        if count > self.decoded:
+            if count > self.array.shape[0]:
+                array = np.empty(max(count, 2 * self.array.shape[0]), dtype=object)
+                array[: self.decoded] = self.array[: self.decoded]
+                self.array = array
+            self.array[self.decoded : count] = self.values[self.decoded : count]
+            self.decoded = count
+        return self.array
+
+
+def _unique_rows(ids: IdArray) -> IdArray:
+    """The rows of `ids` with the duplicates removed."""
+    if ids.shape[0] == 0:
+        return ids
+    if ids.shape[1] == 0:
+        return ids[:1]
+    return np.unique(ids, axis=0)
+
+
+SORT_MERGE_THRESHOLD = 4096
+"""Joins with fewer tuples than this, counting both operands, use a hash join."""
+
+
+def _row_keys(left: IdArray, right: IdArray) -> tuple[IdArray, IdArray]:
+    """One integer key per row such that rows are equal iff their keys are equal.
+
+    The keys are only comparable between `left` and `right` from the same call.
+    """
+    both = np.vstack([left, right])
+    if both.shape[1] == 0:
+        keys = np.zeros(both.shape[0], dtype=np.int64)
+    else:
+        _, inverse = np.unique(both, axis=0, return_inverse=True)
+        keys = inverse.reshape(-1).astype(np.int64)
+    return keys[: left.shape[0]], keys[left.shape[0] :]
+
+
+def _hash_join(
+    left: IdArray, right: IdArray, left_key: list[int], right_key: list[int]
+) -> tuple[IdArray, IdArray]:
+    """The positions of the matching rows in `left` and `right` by a hash join."""
+    index: dict[tuple[int, ...], list[int]] = {}
+    for position, row in enumerate(right[:, right_key].tolist()):
+        index.setdefault(tuple(row), []).append(position)
+    left_rows: list[int] = []
+    right_rows: list[int] = []
+    for position, row in enumerate(left[:, left_key].tolist()):
+        matches = index.get(tuple(row), [])
+        left_rows += [position] * len(matches)
+        right_rows += matches
+    return np.array(left_rows, dtype=np.int64), np.array(right_rows, dtype=np.int64)
+
+
+def _sort_merge_join(
+    left: IdArray, right: IdArray, left_key: list[int], right_key: list[int]
+) -> tuple[IdArray, IdArray]:
+    """The positions of the matching rows in `left` and `right` by a sort/merge join.
+
+    The right rows are sorted on the key columns with `np.lexsort`, and then the run
+    of matching right rows for every left row is found with `np.searchsorted`. The
+    runs are expanded into the output positions in bulk without a Python loop.
+    """
+    left_keys, right_keys = _row_keys(left[:, left_key], right[:, right_key])
+    order = np.lexsort(right[:, right_key].T[::-1])
+    sorted_keys = right_keys[order]
+    low = np.searchsorted(sorted_keys, left_keys, side="left")
+    high = np.searchsorted(sorted_keys, left_keys, side="right")
+    counts = high - low
+    left_rows = np.repeat(np.arange(left.shape[0]), counts)
+    starts = np.repeat(low - (np.cumsum(counts) - counts), counts)
+    right_rows = order[starts + np.arange(left_rows.shape[0])]
+    return left_rows, right_rows
+
+
+class ColumnarRelation(Relation):
+    """Columnar relation class for relational algebra.
+
+    The class has the same interface as `Relation` and agrees with it on every
+    operation, so the two can be compared and mixed as operands. The tuples added
+    with `add_tuple` are buffered and merged into the array the next time it is
+    needed, so building a relation one tuple at a time stays linear.
+
+    Attributes:
+        header (list[str]): The relation header.
+        id_array (IdArray): The encoded tuples without duplicates.
+        symbols (SymbolTable): The table used to encode and decode the values. A
+            relation created without one gets a new `ColumnarSymbolTable`; the
+            interpreter passes its own so its relations share one.
+    """
+
+    __slots__ = ["id_array", "pending", "symbols"]
+
+    def __init__(
+        self,
+        header: list[str],
+        set_of_tuples: set[RelationTuple],
+        symbols: SymbolTable | None = None,
+    ) -> None:
+        self.header = list(header)
+        self.symbols = ColumnarSymbolTable() if symbols is None else symbols
+        self.id_array: IdArray = np.empty((0, len(self.header)), dtype=np.int64)
+        self.pending: list[tuple[int, ...]] = []
+        self.tries = {}
+        self.history = []
+        self.changes = 0
+        for i in set_of_tuples:
+            self.add_tuple(i)
+
+    def __len__(self) -> int:
+        return int(self.get_ids().shape[0])
+
+    def __repr__(self) -> str:
+        return f"ColumnarRelation(header={self.header!r}, set_of_tuples={self.set_of_tuples!r})"
+
+    @property
+    def set_of_tuples(self) -> set[RelationTuple]:
+        """The decoded tuples belonging to the relation."""
+        return self.decode(self.get_ids())
+
+    @set_of_tuples.setter
+    def set_of_tuples(self, set_of_tuples: set[RelationTuple]) -> None:
+        self.id_array = np.empty((0, len(self.header)), dtype=np.int64)
+        self.pending = []
+        self.tries = {}
+        for i in set_of_tuples:
+            self.add_tuple(i)
+
+    @staticmethod
+    def from_ids(
+        header: list[str], ids: IdArray, symbols: SymbolTable, unique: bool = False
+    ) -> "ColumnarRelation":
+        """Create a relation directly from encoded tuples.
+
+        Args:
+            header (list[str]): The relation header.
+            ids (IdArray): The encoded tuples with one column per attribute.
+            symbols (SymbolTable): The table that encoded `ids`.
+            unique (bool): True iff `ids` is already known to have no duplicate rows.
+        """
+        r = ColumnarRelation(header, set(), symbols)
+        r.id_array = ids if unique else _unique_rows(ids)
+        return r
+
+    def get_ids(self) -> IdArray:
+        """The encoded tuples after merging any buffered tuples."""
+        if len(self.pending) > 0:
+            pending = np.array(self.pending, dtype=np.int64).reshape(
+                len(self.pending), len(self.header)
+            )
+            self.id_array = _unique_rows(np.vstack([self.id_array, pending]))
+            self.pending = []
+        return self.id_array
+
+    def decode(self, ids: IdArray) -> set[RelationTuple]:
+        """The tuples for the encoded rows in `ids`."""
+        if ids.shape[1] == 0:
+            return set([()] * ids.shape[0])
+        if isinstance(self.symbols, ColumnarSymbolTable):
+            values = self.symbols.decoder()
+        else:
+            values = np.array(self.symbols.values, dtype=object)
+        return set(map(tuple, values[ids].tolist()))
+
+    def encoded(self, other: Relation) -> IdArray:
+        """The tuples of `other` encoded with the symbol table of this relation."""
+        if isinstance(other, ColumnarRelation) and other.symbols is self.symbols:
+            return other.get_ids()
+        rows = [[self.symbols.encode(j) for j in i] for i in other.set_of_tuples]
+        return np.array(rows, dtype=np.int64).reshape(len(rows), len(other.header))
+
+    def add_tuple(self, r: RelationTuple) -> None:
+        """Add a new tuple to the relation.
+
+        Raises:
+            error (IncompatibleOperandError): Error if the length of the tuple doesn't
+                match the header or if the thing being added isn't a tuple of strings.
+        """
+        self.check_tuple(r)
+        self.pending.append(tuple(self.symbols.encode(i) for i in r))
+        self.tries.clear()
+
+    def extend(self, right_operand: Relation) -> set[RelationTuple]:
+        """Add the tuples of another relation to this relation in place.
+
+        The new rows are found and appended on the encoded tuples, and only they are
+        decoded for the returned set.
+
+        Returns:
+            new_tuples (set[RelationTuple]): The tuples in `right_operand` that were
+                not already in this relation.
+        Raises:
+            error (IncompatibleOperandError): Error if the headers are not the same.
+        """
+        if self.header != right_operand.header:
+            raise IncompatibleOperandError(
+                "The headers do not equal each other in extend"
+            )
+        ids = self.get_ids()
+        other = self.encoded(right_operand)
+        other_keys, keys = _row_keys(other, ids)
+        new_ids = other[~np.isin(other_keys, keys)]
+        if new_ids.shape[0] == 0:
+            return set()
+        self.id_array = np.vstack([ids, new_ids])
+        self.tries.clear()
+        new_tuples = self.decode(new_ids)
+        self.history.extend(new_tuples)
+        self.changes += len(new_tuples)
+        return new_tuples
+
+    def remove(self, tuples: set[RelationTuple]) -> set[RelationTuple]:
+        """Remove tuples from this relation in place.
+
+        The rows are matched and dropped on the encoded tuples.
+
+        Returns:
+            removed_tuples (set[RelationTuple]): The tuples in `tuples` that were in
+                this relation.
+        """
+        ids = self.get_ids()
+        other = self.encoded(Relation(self.header, tuples))
+        keys, other_keys = _row_keys(ids, other)
+        drop = np.isin(keys, other_keys)
+        if not drop.any():
+            return set()
+        self.id_array = ids[~drop]
+        self.tries.clear()
+        self.trim_history()
+        removed_tuples = self.decode(ids[drop])
+        self.changes += len(removed_tuples)
+        return removed_tuples
+
+    def count_distinct(self, attr: str) -> int:
+        if attr not in self.header:
+            raise IncompatibleOperandError("this failed")
+        column = self.get_ids()[:, self.header.index(attr)]
+        return int(np.unique(column).shape[0])
+
+    def difference(self, right_operand: Relation) -> "ColumnarRelation":
+        if self.header != right_operand.header:
+            raise IncompatibleOperandError(
+                f"Error: headers {self.header} and {right_operand.header} are not compatible in Relation.difference"
+            )
+        ids = self.get_ids()
+        left_keys, right_keys = _row_keys(ids, self.encoded(right_operand))
+        keep = ~np.isin(left_keys, right_keys)
+        return ColumnarRelation.from_ids(self.header, ids[keep], self.symbols, True)
+
+    def intersection(self, right_operand: Relation) -> "ColumnarRelation":
+        if self.header != right_operand.header:
+            raise IncompatibleOperandError("this failed")
+        ids = self.get_ids()
+        left_keys, right_keys = _row_keys(ids, self.encoded(right_operand))
+        keep = np.isin(left_keys, right_keys)
+        return ColumnarRelation.from_ids(self.header, ids[keep], self.symbols, True)
+
+    def join(
+        self, right_operand: Relation, right_index: JoinIndex | None = None
+    ) -> "ColumnarRelation":
+        """The natural join between this relation and another.
+
+        The join runs on the encoded tuples. It is a sort/merge join when the operands
+        together have at least `SORT_MERGE_THRESHOLD` tuples and a hash join otherwise.
+        The `right_index` is over decoded tuples, so it is not used.
+
+        Returns:
+            r (ColumnarRelation): A new relation that is self natural join with right_operand.
+        """
+        if len(self.header) == 0 or len(right_operand.header) == 0:
+            return ColumnarRelation([], set(), self.symbols)
+        if self.header == right_operand.header:
+            return self.intersection(right_operand)
+
+        left = self.get_ids()
+        right = self.encoded(right_operand)
+        common_attributes = [i for i in self.header if i in right_operand.header]
+        combined_header = list(self.header) + [
+            i for i in right_operand.header if i not in common_attributes
+        ]
+        right_rest = [
+            index
+            for index, attr in enumerate(right_operand.header)
+            if attr not in common_attributes
+        ]
+
+        if len(common_attributes) == 0:
+            left_rows = np.repeat(np.arange(left.shape[0]), right.shape[0])
+            right_rows = np.tile(np.arange(right.shape[0]), left.shape[0])
+        else:
+            left_key = [self.header.index(i) for i in common_attributes]
+            right_key = [right_operand.header.index(i) for i in common_attributes]
+            if left.shape[0] + right.shape[0] < SORT_MERGE_THRESHOLD:
+                left_rows, right_rows = _hash_join(left, right, left_key, right_key)
+            else:
+                left_rows, right_rows = _sort_merge_join(
+                    left, right, left_key, right_key
+                )
+
+        ids = np.hstack([left[left_rows], right[right_rows][:, right_rest]])
+        return ColumnarRelation.from_ids(combined_header, ids, self.symbols, True)
+
+    def project(self, to: list[str]) -> "ColumnarRelation":
+        for i in to:
+            if i not in self.header:
+                raise IncompatibleOperandError("this failed")
+        indices = [self.header.index(i) for i in to]
+        ids = self.get_ids()[:, indices]
+        return ColumnarRelation.from_ids(to, ids, self.symbols)
+
+    def rename(self, to: list[str]) -> "ColumnarRelation":
+        if len(to) != len(self.header):
+            raise IncompatibleOperandError("head does not match")
+        return ColumnarRelation.from_ids(to, self.get_ids(), self.symbols, True)
+
+    def select_eq_col(self, src: str, col: str) -> "ColumnarRelation":
+        if src not in self.header or col not in self.header:
+            raise IncompatibleOperandError("this failed")
+        ids = self.get_ids()
+        keep = ids[:, self.header.index(src)] == ids[:, self.header.index(col)]
+        return ColumnarRelation.from_ids(self.header, ids[keep], self.symbols, True)
+
+    def select_eq_lit(self, src: str, lit: Value) -> "ColumnarRelation":
+        if src not in self.header:
+            raise IncompatibleOperandError("this failed")
+        ids = self.get_ids()
+        id = self.symbols.lookup(lit)
+        if id is None:
+            return ColumnarRelation(self.header, set(), self.symbols)
+        keep = ids[:, self.header.index(src)] == id
+        return ColumnarRelation.from_ids(self.header, ids[keep], self.symbols, True)
+
+    def union(self, right_operand: Relation) -> "ColumnarRelation":
+        if self.header != right_operand.header:
+            raise IncompatibleOperandError(
+                "The headers do not equal each other in union"
+            )
+        ids = np.vstack([self.get_ids(), self.encoded(right_operand)])
+        return ColumnarRelation.from_ids(self.header, ids, self.symbols)
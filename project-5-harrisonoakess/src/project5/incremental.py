@@ -0,0 +1,244 @@
+"""Incremental maintenance of the relations when facts are inserted or deleted.
+
+After the rules reach their fix-point, the relations are a function of the facts.
+When a few facts change, the relations are updated from the change in place of
+evaluating every rule again:
+
+  * An insertion adds the new tuples and joins each tuple that is new to a relation
+    with the other predicates in the bodies of the rules that read the relation. The
+    tuples derived that are new are handled the same way until there are none.
+  * A deletion uses the delete and rederive (DRed) algorithm. It first removes every
+    tuple with a derivation that uses a deleted tuple, found the same way as for an
+    insertion. Some of those tuples have another derivation from the tuples that are
+    left, or are facts themselves, so they are checked one at a time by evaluating the
+    rules for their head top-down, and inserted again.
+
+The joins are tuple at a time through the `join_indexes` of the interpreter, so the
+work depends on the tuples that change and the tuples they join with rather than on
+the size of the relations. The facts are checked in `Interpreter.fact_tuples`, and the
+rules that read a relation or derive it are found with `Interpreter.get_rule_readers`
+and `Interpreter.get_rules_for_head`, for the same reason. The relations change in place and their `Relation.revision` grows, so the
+memos of the interpreter are not used again for them, and their `Relation.history`
+is trimmed after each update so that a long-lived interpreter does not keep it.
+"""
+
+from project5.datalogprogram import Predicate, Rule
+from project5.interpreter import Interpreter
+from project5.relation import JoinIndex, Relation, RelationTuple, Value
+
+Binding = dict[str, Value]
+"""Defines a type for the value of each variable in a rule."""
+
+Changes = dict[str, set[RelationTuple]]
+"""Defines a type for the tuples that change in each relation by name."""
+
+
+def _index(
+    interpreter: Interpreter, name: str, positions: tuple[int, ...]
+) -> JoinIndex:
+    """The join index of the relation for `name` on `positions`, built if it is new."""
+    indexes = interpreter.join_indexes.setdefault(name, {})
+    index = indexes.get(positions)
+    if index is None:
+        index = interpreter.table_list[name].index(list(positions))
+        indexes[positions] = index
+    return index
+
+
+def _lookup(
+    interpreter: Interpreter, predicate: Predicate, binding: Binding
+) -> set[RelationTuple]:
+    """The tuples of the relation for `predicate` that agree with its bound values."""
+    if predicate.name not in interpreter.table_list:
+        return set()
+    pattern = [
+        interpreter.encode_value(i.value) if i.is_string() else binding.get(i.value)
+        for i in predicate.parameters
+    ]
+    positions = tuple(i for i, j in enumerate(pattern) if j is not None)
+    if len(positions) == 0:
+        return interpreter.table_list[predicate.name].set_of_tuples
+    key = tuple(j for j in pattern if j is not None)
+    return _index(interpreter, predicate.name, positions).get(key, set())
+
+
+def _bind(
+    interpreter: Interpreter,
+    predicate: Predicate,
+    r: RelationTuple,
+    binding: Binding,
+) -> Binding | None:
+    """Extend `binding` by matching the parameters of `predicate` to the tuple `r`."""
+    new_binding = dict(binding)
+    for parameter, value in zip(predicate.parameters, r):
+        if parameter.is_string():
+            if interpreter.encode_value(parameter.value) != value:
+                return None
+        elif new_binding.setdefault(parameter.value, value) != value:
+            return None
+    return new_binding
+
+
+def _join(
+    interpreter: Interpreter,
+    rule: Rule,
+    bindings: list[Binding],
+    skip: int | None = None,
+) -> list[Binding]:
+    """The bindings that satisfy every predicate in the body but the one at `skip`."""
+    for position, predicate in enumerate(rule.predicates):
+        if position == skip:
+            continue
+        extended = []
+        for binding in bindings:
+            for r in _lookup(interpreter, predicate, binding):
+                new_binding = _bind(interpreter, predicate, r, binding)
+                if new_binding is not None:
+                    extended.append(new_binding)
+        bindings = extended
+        if len(bindings) == 0:
+            break
+    return bindings
+
+
+def _derive(
+    interpreter: Interpreter,
+    rule: Rule,
+    position: int,
+    tuples: set[RelationTuple],
+) -> set[RelationTuple]:
+    """The head tuples `rule` derives with one of `tuples` at `position` in its body."""
+    predicate = rule.predicates[position]
+    bindings = []
+    for r in tuples:
+        binding = _bind(interpreter, predicate, r, {})
+        if binding is not None:
+            bindings.append(binding)
+    return set(
+        tuple(
+            interpreter.encode_value(i.value) if i.is_string() else binding[i.value]
+            for i in rule.head.parameters
+        )
+        for binding in _join(interpreter, rule, bindings, position)
+    )
+
+
+def _derivable(interpreter: Interpreter, rule: Rule, r: RelationTuple) -> bool:
+    """True if `rule` derives the head tuple `r` from the relations as they are."""
+    binding = _bind(interpreter, rule.head, r, {})
+    return binding is not None and len(_join(interpreter, rule, [binding])) > 0
+
+
+def _encode(interpreter: Interpreter, fact: Predicate) -> RelationTuple:
+    return tuple(interpreter.encode_value(i.value) for i in fact.parameters)
+
+
+def _propagate(interpreter: Interpreter, pending: Changes) -> Changes:
+    """Add the consequences of the tuples in `pending`, which are already added."""
+    readers = interpreter.get_rule_readers()
+    added: Changes = {}
+    while pending:
+        name, tuples = pending.popitem()
+        added.setdefault(name, set()).update(tuples)
+        for rule, position in readers.get(name, []):
+            head = rule.head.name
+            derived = _derive(interpreter, rule, position, tuples)
+            new_tuples = interpreter.extend_relation(
+                head,
+                interpreter.as_backend(
+                    Relation(interpreter.table_list[head].header, derived)
+                ),
+            )
+            if len(new_tuples) > 0:
+                pending.setdefault(head, set()).update(new_tuples)
+    return added
+
+
+def _remove(interpreter: Interpreter, name: str, tuples: set[RelationTuple]) -> None:
+    """Remove `tuples` from the relation for `name` and from its join indexes."""
+    removed_tuples = interpreter.table_list[name].remove(tuples)
+    for positions, index in interpreter.join_indexes.get(name, {}).items():
+        for r in removed_tuples:
+            key = tuple(r[i] for i in positions)
+            index[key].discard(r)
+            if len(index[key]) == 0:
+                del index[key]
+
+
+def _trim(interpreter: Interpreter, changes: Changes) -> None:
+    """Trim the history of each relation that changed, which no evaluation reads now."""
+    for name in changes:
+        interpreter.table_list[name].trim_history()
+
+
+def insert_facts(interpreter: Interpreter, facts: list[Predicate]) -> Changes:
+    """Insert facts and the tuples they derive. See `Interpreter.insert_facts`."""
+    pending: Changes = {}
+    for fact in facts:
+        if fact.name not in interpreter.table_list:
+            continue
+        r = _encode(interpreter, fact)
+        interpreter.fact_tuples.setdefault(fact.name, set()).add(r)
+        header = interpreter.table_list[fact.name].header
+        new_tuples = interpreter.extend_relation(
+            fact.name, interpreter.as_backend(Relation(header, set([r])))
+        )
+        pending.setdefault(fact.name, set()).update(new_tuples)
+    added = _propagate(interpreter, pending)
+    _trim(interpreter, added)
+    return added
+
+
+def delete_facts(interpreter: Interpreter, facts: list[Predicate]) -> Changes:
+    """Delete facts and the tuples that depend on them. See `Interpreter.delete_facts`."""
+    pending: Changes = {}
+    for fact in facts:
+        relation = interpreter.table_list.get(fact.name)
+        if relation is None:
+            continue
+        r = _encode(interpreter, fact)
+        interpreter.fact_tuples.get(fact.name, set()).discard(r)
+        if r in relation.set_of_tuples:
+            pending.setdefault(fact.name, set()).add(r)
+
+    # Delete every tuple with a derivation that uses a deleted tuple
+    readers = interpreter.get_rule_readers()
+    deleted: Changes = {}
+    while pending:
+        name, tuples = pending.popitem()
+        deleted.setdefault(name, set()).update(tuples)
+        for rule, position in readers.get(name, []):
+            head = rule.head.name
+            relation = interpreter.table_list[head]
+            for r in _derive(interpreter, rule, position, tuples):
+                if r in relation.set_of_tuples and r not in deleted.get(head, set()):
+                    pending.setdefault(head, set()).add(r)
+    for name, tuples in deleted.items():
+        _remove(interpreter, name, tuples)
+
+    # Rederive the deleted tuples with a derivation from the tuples left
+    rules_for_head = interpreter.get_rules_for_head()
+    rederived: Changes = {}
+    for name, tuples in deleted.items():
+        if name not in rules_for_head:
+            continue
+        facts_left = interpreter.fact_tuples.get(name, set())
+        again = set(
+            r
+            for r in tuples
+            if r in facts_left
+            or any(_derivable(interpreter, i, r) for i in rules_for_head[name])
+        )
+        if len(again) > 0:
+            header = interpreter.table_list[name].header
+            rederived[name] = interpreter.extend_relation(
+                name, interpreter.as_backend(Relation(header, again))
+            )
+    _trim(interpreter, _propagate(interpreter, rederived))
+
+    removed: Changes = {}
+    for name, tuples in deleted.items():
+        gone = tuples.difference(interpreter.table_list[name].set_of_tuples)
+        if len(gone) > 0:
+            removed[name] = gone
+    return removed
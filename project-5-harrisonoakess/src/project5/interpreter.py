@@ -4,10 +4,19 @@ Provides an interpreter interface for interpreting Datalog
 programs using relational algebra.
 """
 
-from typing import Iterator
+from typing import Iterator, Literal
 
 from project5.datalogprogram import DatalogProgram, Predicate, Rule
-from project5.relation import Relation
+from project5.multiwayjoin import generic_join, is_cyclic
+from project5.querycache import QueryCache, query_pattern
+from project5.relation import JoinIndex, Relation, RelationTuple, Value
+from project5.symboltable import SymbolTable
+
+Backend = Literal["set", "columnar"]
+"""
+Relations are stored either as a set of tuples (`Relation`) or as dictionary-encoded
+NumPy columns (`ColumnarRelation`). The columnar backend requires NumPy.
+"""
 
 
 class Interpreter:
@@ -20,13 +29,127 @@ class Interpreter:
 
     Attributes:
         datalog (DatalogProgram): The Datalog program to interpret.
+        table_list (dict[str, Relation]): The relation for each scheme by name.
+        backend (Backend): The storage backend for the relations.
+        symbols (SymbolTable | None): The table interning every string constant in the
+            facts, rules, and queries when the interpreter is created with `intern`.
+            The relations then hold tuples of integer ids and `decode_relation` or the
+            reporter turn them back into strings. Interning applies to the set backend
+            only since the columnar backend already dictionary-encodes its values.
+        column_symbols (SymbolTable | None): The table the relations of the columnar
+            backend encode their values with, made when the first one is stored.
+        join_indexes (dict[str, dict[tuple[int, ...], JoinIndex]]): The join indexes
+            kept for each relation by name and key positions. They live across the
+            iterations of the fix-point and are extended with the new tuples each time
+            a rule adds to the relation, so joins probe them in place of a rebuild.
+        dependency_graph (dict[int, list[int]] | None): The rule dependency graph once
+            `get_rule_dependency_graph` has computed it.
+        reverse_graph (dict[int, list[int]] | None): The reverse of the rule dependency
+            graph once `get_reverse_graph` has computed it.
+        sccs (list[list[int]] | None): The strongly connected components once `get_scc`
+            has computed them.
+        rule_readers (dict[str, list[tuple[Rule, int]]] | None): Each rule and body
+            position that reads a relation, by the relation's name, once
+            `get_rule_readers` has computed it.
+        rules_for_head (dict[str, list[Rule]] | None): The rules that derive each
+            relation by name, once `get_rules_for_head` has computed it. The five are
+            computed once for the rules in `datalog` and must be reset to `None` if the
+            rules change.
+        fact_tuples (dict[str, set[RelationTuple]]): The tuples of the facts for each
+            relation by name, as stored in the relation. They are the facts of
+            `datalog` after `eval_facts`, and `insert_facts` and `delete_facts` keep
+            them up to date.
+        body_memo (dict[str, tuple[Relation, int, Relation]]): The result of
+            `single_query` for each body predicate by its text, with the relation it
+            queried and that relation's `Relation.revision`. Rules that have the same
+            body predicate share the result until the relation changes.
+        prefix_memo (dict[tuple[tuple[str, ...], frozenset[str]], tuple[tuple[
+            Relation, ...], tuple[int, ...], Relation]]): The projected join of the
+            first body predicates in the join order, by their text and the variables
+            kept, with the relations joined and their revisions. Rules that start their
+            joins the same way share the result.
+        distinct_memo (dict[str, tuple[Relation, int, dict[str, int]]]): The number of
+            distinct values in each column of a body relation for `plan_join_order`, by
+            the text of its predicate, with the relation counted and its revision. The
+            counts are reused until `body_query` returns a new relation.
+        query_cache (QueryCache): The selections that answered earlier queries, so a
+            repeated query, or one more specific than an earlier query, is answered
+            without scanning its relation again.
     """
 
-    __slots__ = ["datalog", "table_list"]
-
-    def __init__(self, datalog: DatalogProgram) -> None:
+    __slots__ = [
+        "datalog",
+        "table_list",
+        "backend",
+        "symbols",
+        "column_symbols",
+        "join_indexes",
+        "dependency_graph",
+        "reverse_graph",
+        "sccs",
+        "rule_readers",
+        "rules_for_head",
+        "fact_tuples",
+        "body_memo",
+        "prefix_memo",
+        "distinct_memo",
+        "query_cache",
+    ]
+
+    def __init__(
+        self, datalog: DatalogProgram, backend: Backend = "set", intern: bool = False
+    ) -> None:
         self.datalog = datalog
         self.table_list: dict[str, Relation] = {}
+        self.backend = backend
+        self.symbols = SymbolTable() if intern and backend == "set" else None
+        self.column_symbols: SymbolTable | None = None
+        self.join_indexes: dict[str, dict[tuple[int, ...], JoinIndex]] = {}
+        self.dependency_graph: dict[int, list[int]] | None = None
+        self.reverse_graph: dict[int, list[int]] | None = None
+        self.sccs: list[list[int]] | None = None
+        self.rule_readers: dict[str, list[tuple[Rule, int]]] | None = None
+        self.rules_for_head: dict[str, list[Rule]] | None = None
+        self.fact_tuples: dict[str, set[RelationTuple]] = {}
+        self.body_memo: dict[str, tuple[Relation, int, Relation]] = {}
+        self.prefix_memo: dict[
+            tuple[tuple[str, ...], frozenset[str]],
+            tuple[tuple[Relation, ...], tuple[int, ...], Relation],
+        ] = {}
+        self.distinct_memo: dict[str, tuple[Relation, int, dict[str, int]]] = {}
+        self.query_cache = QueryCache()
+
+    def encode_value(self, value: str) -> Value:
+        """Return the interned id for `value` or `value` itself without interning."""
+        if self.symbols is None:
+            return value
+        return self.symbols.encode(value)
+
+    def decode_relation(self, relation: Relation) -> Relation:
+        """Return `relation` with its interned ids turned back into strings."""
+        if self.symbols is None:
+            return relation
+        values = self.symbols.values
+        return Relation(
+            relation.header,
+            set(tuple(values[int(i)] for i in j) for j in relation.set_of_tuples),
+        )
+
+    def new_relation(self, header: list[str]) -> Relation:
+        """Return a new empty relation with `header` stored in the interpreter backend."""
+        return self.as_backend(Relation(header, set()))
+
+    def as_backend(self, relation: Relation) -> Relation:
+        """Return `relation` stored in the interpreter backend."""
+        if self.backend == "columnar" and type(relation) is Relation:
+            from project5.columnar import ColumnarRelation, ColumnarSymbolTable
+
+            if self.column_symbols is None:
+                self.column_symbols = ColumnarSymbolTable()
+            return ColumnarRelation(
+                relation.header, relation.set_of_tuples, self.column_symbols
+            )
+        return relation
 
     def eval_schemes(self) -> None:
         """Evaluate the schemes in the Datalog program.
@@ -40,7 +163,7 @@ class Interpreter:
             list1 = []
             for j in i.parameters:
                 list1.append(j.value)
-            self.table_list[i.name] = Relation(list1, set())
+            self.table_list[i.name] = self.new_relation(list1)
 
     def eval_facts(self) -> None:
         """Evaluate the facts in the Datalog program.
@@ -48,84 +171,79 @@ class Interpreter:
         Create, and store in the appropriate relation belonging to the
         interpreter, a tuple for each fact in the Datalog program.
         """
+        self.fact_tuples.clear()
+        self.join_indexes.clear()
+        self.query_cache.clear()
+        self.body_memo.clear()
+        self.prefix_memo.clear()
+        self.distinct_memo.clear()
 
         for i in self.datalog.facts:
             if i.name in self.table_list:
                 set1 = []
                 for j in i.parameters:
-                    set1.append(j.value)
+                    set1.append(self.encode_value(j.value))
                 self.table_list[i.name].add_tuple(tuple(set1))
+                self.fact_tuples.setdefault(i.name, set()).add(tuple(set1))
 
-    def eval_queries(self) -> Iterator[tuple[Predicate, Relation]]:
+    def eval_queries(self, jobs: int = 1) -> Iterator[tuple[Predicate, Relation]]:
         """Yield each query and resulting relation from evaluation."
 
         For each query in the Datalog program, evaluate the query to get a
         resulting relation that is the answer to the query, and then yield
         the resulting `(query, relation)` tuple.
 
+        The selections for the queries are kept in `query_cache`, so a query repeated
+        or subsumed by an earlier one filters the earlier selection in place of the
+        relation.
+
+        With `jobs` greater than one the queries are answered on a pool of worker
+        processes, each with a copy of the relations, and yielded in the same order.
+        See `project5.parallel.eval_queries_parallel`.
+
+        Args:
+            jobs (int): The number of worker processes, or 1 to answer the queries in
+                this process.
+
         Returns:
             out (tuple[Predicate, Relation]): An iterator to a tuple where the
             first element is the predicate for the query and the second element
             is the relation for the answer.
         """
-        for i in self.datalog.queries:  # first line
-            if i.name in self.table_list:
-                relation1: Relation = self.table_list[i.name]  # end of line 2
-                index = 0
-                id_dict = {}
-            for j in i.parameters:
-                if j.is_string():
-                    relation1 = relation1.select_eq_lit(
-                        relation1.header[index], j.value
-                    )  # line 3
-
-                if j.is_id():
-                    if j.value not in id_dict:
-                        id_dict[j.value] = index
-                    else:
-                        src = id_dict[j.value]
-                        relation1 = relation1.select_eq_col(
-                            relation1.header[src], relation1.header[index]
-                        )  # line 4
-                index += 1
-            index_proj = 0
-            list_project = []
-            for j in i.parameters:
-                index_project = 0
-                if j.is_id():
-                    list_project.append(relation1.header[index_proj])
-                    index_project += 1
-                index_proj += 1
-            relation1 = relation1.project(list_project)
-            list_rename = []
-            for j in i.parameters:
-                # index_rename = 0
-                # dict_rename = {}
+        if jobs > 1:
+            from project5.parallel import eval_queries_parallel
 
-                if j.is_id():
-                    # dict_rename[index_rename] = j.value
-                    list_rename.append(j.value)
-                # index_rename += 1
-            relation1 = relation1.rename(list_rename)
+            yield from eval_queries_parallel(self, jobs)
+            return
+        for i in self.datalog.queries:
+            yield (i, self.answer_query(i))
 
-            header_list = []
-            for z in relation1.header:
-                if z not in header_list:
-                    header_list.append(z)
+    def answer_query(self, query: Predicate) -> Relation:
+        """Return the answer to `query` through the selections in `query_cache`.
 
-            relation1 = relation1.project(header_list)
-
-            yield (i, relation1)
-
-    def single_query(self, i: Predicate) -> Relation:
-        if i.name in self.table_list:
-            relation1: Relation = self.table_list[i.name]  # end of line 2
+        The query need not be one of the queries in the Datalog program, but it must
+        name a scheme.
+        """
+        constants = [
+            self.encode_value(i.value) for i in query.parameters if i.is_string()
+        ]
+        relation = self.query_cache.select(
+            query.name, self.table_list[query.name], query_pattern(query, constants)
+        )
+        return self.single_query(query, relation)
+
+    def single_query(self, i: Predicate, relation: Relation | None = None) -> Relation:
+        if relation is not None or i.name in self.table_list:
+            # end of line 2
+            relation1: Relation = (
+                self.table_list[i.name] if relation is None else relation
+            )
             index = 0
             id_dict = {}
         for j in i.parameters:
             if j.is_string():
                 relation1 = relation1.select_eq_lit(
-                    relation1.header[index], j.value
+                    relation1.header[index], self.encode_value(j.value)
                 )  # line 3
 
             if j.is_id():
@@ -166,6 +284,254 @@ class Interpreter:
 
         return relation1
 
+    def body_query(self, predicate: Predicate) -> Relation:
+        """Return `single_query` for a body predicate, shared with the other rules.
+
+        The result is kept in `body_memo` by the text of the predicate, so every rule
+        with the same predicate, constants, and variables in its body reuses it until
+        the queried relation changes.
+        """
+        if predicate.name not in self.table_list:
+            return self.single_query(predicate)
+        relation = self.table_list[predicate.name]
+        key = str(predicate)
+        memo = self.body_memo.get(key)
+        if memo is not None and memo[0] is relation and memo[1] == relation.revision():
+            return memo[2]
+        answer = self.single_query(predicate, relation)
+        self.body_memo[key] = (relation, relation.revision(), answer)
+        return answer
+
+    def plan_join_order(
+        self, relations: list[Relation], keys: list[str | None] | None = None
+    ) -> list[int]:
+        """Return the order in which to join the relations from a rule body.
+
+        The plan is greedy. It starts with the smallest relation and then repeatedly
+        picks the remaining relation with the smallest estimated join result. A relation
+        that shares a variable with what is already joined is always preferred over one
+        that would make a cross product. The estimate divides the product of the sizes
+        by the number of distinct values in each shared column. The relations come from
+        `single_query`, so the selectivity of constants is already in their sizes.
+        Ties keep the source order.
+
+        The distinct counts of a relation with a key are kept in `distinct_memo`, so a
+        recursive SCC only counts again the body relations that changed since the pass
+        before.
+
+        Args:
+            relations (list[Relation]): The relations for the predicates in a rule body.
+            keys (list[str | None] | None): The key in `distinct_memo` for each relation,
+                or `None` to count its distinct values without the memo.
+
+        Returns:
+            out (list[int]): The indices of `relations` in the order they should be joined.
+        """
+        keys = [None] * len(relations) if keys is None else keys
+        distinct: list[dict[str, int]] = []
+        for relation, memo_key in zip(relations, keys):
+            memo = None if memo_key is None else self.distinct_memo.get(memo_key)
+            if (
+                memo is not None
+                and memo[0] is relation
+                and memo[1] == relation.revision()
+            ):
+                distinct.append(memo[2])
+                continue
+            counts = {i: relation.count_distinct(i) for i in relation.header}
+            if memo_key is not None:
+                self.distinct_memo[memo_key] = (relation, relation.revision(), counts)
+            distinct.append(counts)
+
+        first = min(range(len(relations)), key=lambda i: len(relations[i]))
+        order = [first]
+        joined_size = float(len(relations[first]))
+        joined_distinct = dict(distinct[first])
+        remaining = [i for i in range(len(relations)) if i != first]
+
+        while len(remaining) > 0:
+            best = remaining[0]
+            best_key: tuple[bool, float] = (True, float("inf"))
+            for i in remaining:
+                shared = [j for j in relations[i].header if j in joined_distinct]
+                estimate = joined_size * len(relations[i])
+                for attr in shared:
+                    estimate /= max(joined_distinct[attr], distinct[i][attr], 1)
+                key = (len(shared) == 0, estimate)
+                if key < best_key:
+                    best, best_key = i, key
+            order.append(best)
+            remaining.remove(best)
+            joined_size = best_key[1]
+            for attr, count in distinct[best].items():
+                joined_distinct[attr] = min(
+                    joined_distinct.get(attr, count), count, max(int(joined_size), 1)
+                )
+        return order
+
+    def get_join_index(
+        self, predicate: Predicate, left_header: list[str]
+    ) -> JoinIndex | None:
+        """Return the kept join index for joining a body predicate to `left_header`.
+
+        Only a predicate whose parameters are all distinct variables qualifies. For
+        such a predicate `single_query` only renames the stored relation, so an index
+        of the stored relation on the positions of the shared variables serves the
+        join as is. The index is built the first time it is needed and kept in
+        `join_indexes` after that.
+
+        Returns:
+            out (JoinIndex | None): The index or `None` if the predicate does not qualify,
+                there are no shared variables, or the backend is not the set backend.
+        """
+        if self.backend != "set" or any(not i.is_id() for i in predicate.parameters):
+            return None
+        names = [i.value for i in predicate.parameters]
+        if len(set(names)) != len(names):
+            return None
+        positions = tuple(names.index(i) for i in left_header if i in names)
+        if len(positions) == 0:
+            return None
+        indexes = self.join_indexes.setdefault(predicate.name, {})
+        index = indexes.get(positions)
+        if index is None:
+            index = self.table_list[predicate.name].index(list(positions))
+            indexes[positions] = index
+        return index
+
+    def extend_relation(self, name: str, derived: Relation) -> set[RelationTuple]:
+        """Add the tuples a rule derived to the relation for `name` in place.
+
+        The join indexes kept for the relation are extended with the new tuples.
+
+        Returns:
+            new_tuples (set[RelationTuple]): The tuples in `derived` that were new.
+        """
+        new_tuples = self.table_list[name].extend(derived)
+        for positions, index in self.join_indexes.get(name, {}).items():
+            for r in new_tuples:
+                index.setdefault(tuple(r[i] for i in positions), set()).add(r)
+        return new_tuples
+
+    def body_versions(self, rule: Rule) -> tuple[int, ...]:
+        """The version of each relation in the body of `rule`.
+
+        The version of a relation is its `Relation.revision`, which grows when
+        `extend_relation` adds new tuples to it or a deletion takes tuples out. A rule
+        evaluated again on the same versions derives nothing new.
+        """
+        return tuple(self.table_list[i.name].revision() for i in rule.predicates)
+
+    def eval_rule(
+        self, rule: Rule, sources: dict[int, Relation] | None = None
+    ) -> Relation:
+        """Evaluate the body of a rule and return the tuples it derives for the head.
+
+        Each predicate in the body is evaluated with `body_query`, the results are
+        joined in the order chosen by `plan_join_order`, and the join is projected to
+        the head variables and renamed to the header of the head relation. The result
+        is not added to the head relation.
+
+        Variables are projected away as soon as neither the head nor a later relation
+        in the join order needs them, so the intermediate relations stay narrow and
+        duplicates collapse early. An intermediate relation is never projected to an
+        empty header since `Relation.join` treats an empty header as an empty relation.
+
+        The projected join of the first predicates in the join order is kept in
+        `prefix_memo`, so rules that start their joins with the same predicates and keep
+        the same variables share it until one of the relations grows. Predicates read
+        from `sources` are never shared.
+
+        A body with three or more predicates that share variables cyclically is joined
+        all at once with `generic_join` in place of the chain of binary joins.
+
+        Args:
+            rule (Rule): The rule to evaluate.
+            sources (dict[int, Relation] | None): A relation by position in the body to
+                query in place of the stored relation for the predicate at that position,
+                such as the new tuples of the relation in semi-naive evaluation.
+
+        Returns:
+            out (Relation): The relation derived by the rule with the head relation header.
+        """
+        sources = {} if sources is None else sources
+        list_of_predicates = []
+        for position, predicate in enumerate(rule.predicates):
+            if position in sources:
+                list_of_predicates.append(
+                    self.single_query(predicate, sources[position])
+                )
+            else:
+                list_of_predicates.append(self.body_query(predicate))
+        header_list = []
+        for head in rule.head.parameters:
+            if head.is_id():
+                header_list.append(head.value)
+
+        headers = [i.header for i in list_of_predicates]
+        if (
+            len(headers) >= 3
+            and all(len(i) > 0 for i in headers)
+            and is_cyclic(headers)
+        ):
+            combined_relation = self.as_backend(generic_join(list_of_predicates))
+        else:
+            order = self.plan_join_order(
+                list_of_predicates,
+                [
+                    None if i in sources else str(j)
+                    for i, j in enumerate(rule.predicates)
+                ],
+            )
+            combined_relation = list_of_predicates[order[0]]
+            for position, i in enumerate(order):
+                live = set(header_list)
+                for j in order[position + 1 :]:
+                    live.update(list_of_predicates[j].header)
+                prefix = order[: position + 1]
+                key = (
+                    tuple(str(rule.predicates[j]) for j in prefix),
+                    frozenset(
+                        attr
+                        for j in prefix
+                        for attr in list_of_predicates[j].header
+                        if attr in live
+                    ),
+                )
+                shared = position > 0 and all(j not in sources for j in prefix)
+                if shared:
+                    relations = tuple(
+                        self.table_list[rule.predicates[j].name] for j in prefix
+                    )
+                    versions = tuple(j.revision() for j in relations)
+                    memo = self.prefix_memo.get(key)
+                    if (
+                        memo is not None
+                        and memo[1] == versions
+                        and all(j is k for j, k in zip(memo[0], relations))
+                    ):
+                        combined_relation = memo[2]
+                        continue
+                if position > 0:
+                    combined_relation = combined_relation.join(
+                        list_of_predicates[i],
+                        None
+                        if i in sources
+                        else self.get_join_index(
+                            rule.predicates[i], combined_relation.header
+                        ),
+                    )
+                keep = [attr for attr in combined_relation.header if attr in live]
+                if 0 < len(keep) < len(combined_relation.header):
+                    combined_relation = combined_relation.project(keep)
+                if shared:
+                    self.prefix_memo[key] = (relations, versions, combined_relation)
+        # There should be one relation now that is fully combined at this point
+        combined_relation = combined_relation.project(header_list)
+        # There should be one relation that has completed projection at this point
+        original_relation = self.table_list[rule.head.name]
+        return combined_relation.rename(original_relation.header)
+
     def eval_rules(self) -> Iterator[tuple[Relation, Rule, Relation]]:
         """Yield each _before_ relation, rule, and _after_ relation from evaluation.
 
@@ -191,6 +557,9 @@ class Interpreter:
         `rule_a` on `A_0` etc. The same for `B`. The iteration stops because `A_2 == A_3` and
         `B_2 == B_3`.
 
+        The relation for each head grows in place with `Relation.extend`, so the _before_
+        and _after_ relations are read-only snapshots of it rather than copies.
+
         Returns:
             out (Iterator[tuple[Relation, Rule, Relation]]): An iterator to a tuple where the
                 first element is the relation before rule evaluation, the second element is
@@ -201,33 +570,16 @@ class Interpreter:
         while finish:
             finish = False
             for rule in self.datalog.rules:  # this loops through each rule
-                list_of_predicates = []
-                for predicate in rule.predicates:  # This loops through the right side of the rule which is a list of predicates
-                    list_of_predicates.append(self.single_query(predicate))
-                combined_relation: Relation = list_of_predicates[0]
-                list_of_predicates.pop(0)
-                while len(list_of_predicates) > 0:
-                    combined_relation = combined_relation.join(list_of_predicates[0])
-                    list_of_predicates.pop(0)
-                # There should be one relation now that is fully combined at this point
-                header_list = []
-                for head in rule.head.parameters:
-                    if head.is_id():
-                        if head not in header_list:
-                            header_list.append(head.value)
-                combined_relation = combined_relation.project(header_list)
-                # There should be one relation that has completed projection at this point
-                original_relation = self.table_list[rule.head.name]
-                combined_relation = combined_relation.rename(original_relation.header)
-                # There should be one relation that has a completed rename at this point
-                combined_relation = combined_relation.union(original_relation)
+                original_relation = self.table_list[rule.head.name].snapshot()
+                new_tuples = self.extend_relation(rule.head.name, self.eval_rule(rule))
                 # This should complete the union up to this point
-                if len(original_relation.set_of_tuples) != len(
-                    combined_relation.set_of_tuples
-                ):
+                if len(new_tuples) > 0:
                     finish = True
-                yield (original_relation, rule, combined_relation)
-                self.table_list[rule.head.name] = combined_relation
+                yield (
+                    original_relation,
+                    rule,
+                    self.table_list[rule.head.name].snapshot(),
+                )
 
             # raise NotImplementedError
 
@@ -253,7 +605,12 @@ class Interpreter:
         Here `A_0` is the initial relation for `A`, `A_1` is the relation after evaluating
         `rule_a` on `A_0` etc. The same for `B` and `C`. The iteration on the first SCC stops
         because `A_2 == A_3` and `B_2 == B_3`. After the iteration for the second SCC starts
-        and stops after two iterations when `C_1 == C_2`.
+        and stops after two iterations when `C_1 == C_2`. As in `eval_rules`, the _before_
+        and _after_ relations are read-only snapshots of the relation that grows in place.
+
+        A rule in an SCC is only evaluated again when a relation in its body has grown since
+        it was last evaluated, as told by `body_versions`. Otherwise the rule is reported
+        with equal _before_ and _after_ relations without doing any join work.
 
         Returns:
             out (Iterator[tuple[Relation, Rule, Relation]]): An iterator to a tuple where the
@@ -262,77 +619,153 @@ class Interpreter:
                 from the rule evaluation.
         """
 
-        list_of_sccs = self.get_scc()
-
-        for scc in list_of_sccs:
-            rule_index = scc[0]
-            rule = self.datalog.rules[rule_index]
-            dependency_graph = self.get_rule_dependency_graph()
-            if len(scc) == 1 and rule_index not in dependency_graph[rule_index]:
-                # Evaluate the rule once
-                before_relation = self.table_list[rule.head.name]
-                intermediate_rels = []
-                for pred in rule.predicates:
-                    intermediate_rels.append(self.single_query(pred))
-
-                # Perform join of all intermediate relations
-                joined_rel = intermediate_rels[0]
-                for rel in intermediate_rels[1:]:
-                    joined_rel = joined_rel.join(rel)
-
-                # Project, rename, and union
-                proj_list = []
-                for param in rule.head.parameters:
-                    if param.is_id():
-                        proj_list.append(param.value)
-
-                joined_rel = joined_rel.project(proj_list).rename(
-                    before_relation.header
-                )
-                after_relation = joined_rel.union(before_relation)
+        for scc in self.get_scc():
+            yield from self.eval_scc(scc)
 
-                # Yield the result
-                yield (before_relation, rule, after_relation)
+    def eval_rules_parallel(
+        self, jobs: int | None = None
+    ) -> Iterator[tuple[Relation, Rule, Relation]]:
+        """Yield the same as `eval_rules_optimized` with independent SCCs run in parallel.
 
-                # Update the global table
-                self.table_list[rule.head.name] = after_relation
-                continue
-            finish = True
-            while finish:
-                finish = False
-                for rule_index in scc:  # this loops through each rule
-                    list_of_predicates = []
-                    rule = self.datalog.rules[rule_index]
-                    for predicate in rule.predicates:  # This loops through the right side of the rule which is a list of predicates
-                        list_of_predicates.append(self.single_query(predicate))
-                    combined_relation: Relation = list_of_predicates[0]
-                    list_of_predicates.pop(0)
-                    while len(list_of_predicates) > 0:
-                        combined_relation = combined_relation.join(
-                            list_of_predicates[0]
-                        )
-                        list_of_predicates.pop(0)
-                    # There should be one relation now that is fully combined at this point
-                    header_list = []
-                    for head in rule.head.parameters:
-                        if head.is_id():
-                            if head not in header_list:
-                                header_list.append(head.value)
-                    combined_relation = combined_relation.project(header_list)
-                    # There should be one relation that has completed projection at this point
-                    original_relation = self.table_list[rule.head.name]
-                    combined_relation = combined_relation.rename(
-                        original_relation.header
-                    )
-                    # There should be one relation that has a completed rename at this point
-                    combined_relation = combined_relation.union(original_relation)
-                    # This should complete the union up to this point
-                    if len(original_relation.set_of_tuples) != len(
-                        combined_relation.set_of_tuples
-                    ):
-                        finish = True
-                    yield (original_relation, rule, combined_relation)
-                    self.table_list[rule.head.name] = combined_relation
+        The SCCs run on a pool of `jobs` worker processes as soon as the SCCs they depend
+        on are done. See `project5.parallel.eval_rules_parallel`.
+
+        Args:
+            jobs (int | None): The number of worker processes, or `None` for one per CPU.
+        """
+        from project5.parallel import eval_rules_parallel
+
+        return eval_rules_parallel(self, jobs)
+
+    def eval_rules_jacobi(
+        self, jobs: int | None = None
+    ) -> Iterator[tuple[Relation, Rule, Relation]]:
+        """Yield as `eval_rules_optimized` with the rules of each pass run concurrently.
+
+        Every rule in a pass of a recursive SCC reads the relations as they were at the
+        start of the pass, and the results are merged at the end of the pass. The final
+        relations are the same, but an SCC can take more passes. See
+        `project5.parallel.eval_rules_jacobi`.
+
+        Args:
+            jobs (int | None): The number of worker processes, or `None` for one per CPU.
+        """
+        from project5.parallel import eval_rules_jacobi
+
+        return eval_rules_jacobi(self, jobs)
+
+    def eval_rules_partitioned(self, jobs: int | None = None) -> None:
+        """Evaluate the rules with each recursive SCC as a data-parallel fix-point.
+
+        The final relations are the same as from `eval_rules_optimized`, but the rule
+        evaluations are not reported. See `project5.parallel.eval_rules_partitioned`.
+
+        Args:
+            jobs (int | None): The number of worker processes, or `None` for one per CPU.
+        """
+        from project5.parallel import eval_rules_partitioned
+
+        eval_rules_partitioned(self, jobs)
+
+    def insert_facts(self, facts: list[Predicate]) -> dict[str, set[RelationTuple]]:
+        """Insert facts after the fix-point and update the relations incrementally.
+
+        The tuples of the facts are added to `fact_tuples` and to the relations, and
+        only the tuples they derive are added after them, so the relations are the
+        same as from evaluating the rules again on all the facts. See
+        `project5.incremental`.
+
+        Args:
+            facts (list[Predicate]): The facts to insert.
+
+        Returns:
+            out (dict[str, set[RelationTuple]]): The tuples added to each relation by
+                name, as stored in the relation.
+        """
+        from project5.incremental import insert_facts
+
+        return insert_facts(self, facts)
+
+    def delete_facts(self, facts: list[Predicate]) -> dict[str, set[RelationTuple]]:
+        """Delete facts after the fix-point and update the relations incrementally.
+
+        The tuples of the facts are removed from `fact_tuples` and from the relations,
+        along with the tuples that can no longer be derived, so the
+        relations are the same as from evaluating the rules again on the facts that
+        are left. Snapshots of a relation taken before a deletion are no longer valid.
+        See `project5.incremental`.
+
+        Args:
+            facts (list[Predicate]): The facts to delete.
+
+        Returns:
+            out (dict[str, set[RelationTuple]]): The tuples removed from each relation
+                by name, as stored in the relation.
+        """
+        from project5.incremental import delete_facts
+
+        return delete_facts(self, facts)
+
+    def eval_scc(self, scc: list[int]) -> Iterator[tuple[Relation, Rule, Relation]]:
+        """Yield each _before_ relation, rule, and _after_ relation from evaluating one SCC.
+
+        A component with a single rule that does not depend on itself is evaluated once.
+        Otherwise the rules in the component are evaluated in order, pass after pass, until
+        a pass adds no new tuples. This is the body of `eval_rules_optimized` for one SCC.
+
+        A component that computes a transitive closure, as recognised by
+        `project5.closure.closure_shapes`, is evaluated with the adjacency indexes of
+        `project5.closure.eval_scc_closure`, which yields the same passes and tuples.
+
+        Args:
+            scc (list[int]): The indices of the rules in the component from `get_scc`.
+
+        Returns:
+            out (Iterator[tuple[Relation, Rule, Relation]]): As in `eval_rules_optimized`.
+        """
+        dependency_graph = self.get_rule_dependency_graph()
+        rule_index = scc[0]
+        rule = self.datalog.rules[rule_index]
+        from project5.closure import closure_shapes, eval_scc_closure
+
+        shapes = closure_shapes(self, scc)
+        if shapes is not None:
+            yield from eval_scc_closure(self, scc, shapes)
+            return
+        if len(scc) == 1 and rule_index not in dependency_graph[rule_index]:
+            # Evaluate the rule once
+            before_relation = self.table_list[rule.head.name].snapshot()
+            self.extend_relation(rule.head.name, self.eval_rule(rule))
+
+            # Yield the result
+            yield (
+                before_relation,
+                rule,
+                self.table_list[rule.head.name].snapshot(),
+            )
+            return
+        evaluated_versions: dict[int, tuple[int, ...]] = {}
+        finish = True
+        while finish:
+            finish = False
+            for rule_index in scc:  # this loops through each rule
+                rule = self.datalog.rules[rule_index]
+                original_relation = self.table_list[rule.head.name].snapshot()
+                versions = self.body_versions(rule)
+                if evaluated_versions.get(rule_index) == versions:
+                    # Nothing the rule reads changed, so it derives nothing new
+                    yield (original_relation, rule, original_relation)
+                    continue
+                evaluated_versions[rule_index] = versions
+                new_tuples = self.extend_relation(rule.head.name, self.eval_rule(rule))
+                # This should complete the union up to this point
+                if len(new_tuples) > 0:
+                    finish = True
+                yield (
+                    original_relation,
+                    rule,
+                    self.table_list[rule.head.name].snapshot(),
+                )
 
     # def eval_rules_optimized(self) -> Iterator[tuple[Relation, Rule, Relation]]:
     #     """
@@ -391,94 +824,125 @@ class Interpreter:
         Returns:
             out: A map with an entry for each rule and the associated rules connected to it.
         """
-        return_dict: dict[int, list[int]] = {}
-        adj_dict: dict[str, list[int]] = {}
-        rule_index = 0
-        for rule in self.datalog.rules:
-            if rule.head.name in adj_dict:
-                adj_dict[rule.head.name].append(rule_index)
-            else:
-                adj_dict[rule.head.name] = [rule_index]
-            return_dict[rule_index] = []
-            rule_index += 1
-
-        rule_index_2 = 0
-        for rule in self.datalog.rules:
-            for predicate in rule.predicates:
-                if predicate.name in adj_dict:
-                    for num in adj_dict[predicate.name]:
-                        if num not in return_dict[rule_index_2]:
-                            return_dict[rule_index_2].append(num)
-            rule_index_2 += 1
-        for key in return_dict.keys():
-            return_dict[key] = sorted(return_dict[key])
-        return return_dict
+        if self.dependency_graph is None:
+            rules_for_head: dict[str, list[int]] = {}
+            for rule_index, rule in enumerate(self.datalog.rules):
+                rules_for_head.setdefault(rule.head.name, []).append(rule_index)
+
+            graph: dict[int, list[int]] = {}
+            for rule_index, rule in enumerate(self.datalog.rules):
+                edges: set[int] = set()
+                for predicate in rule.predicates:
+                    edges.update(rules_for_head.get(predicate.name, []))
+                graph[rule_index] = sorted(edges)
+            self.dependency_graph = graph
+        return self.dependency_graph
+
+    def get_rule_readers(self) -> dict[str, list[tuple[Rule, int]]]:
+        """Return each rule and body position that reads a relation, by its name.
+
+        A rule with a relation twice in its body reads it at both positions. The map is
+        what incremental maintenance follows from a relation that changed to the rules
+        it changes.
+        """
+        if self.rule_readers is None:
+            readers: dict[str, list[tuple[Rule, int]]] = {}
+            for rule in self.datalog.rules:
+                for position, predicate in enumerate(rule.predicates):
+                    readers.setdefault(predicate.name, []).append((rule, position))
+            self.rule_readers = readers
+        return self.rule_readers
+
+    def get_rules_for_head(self) -> dict[str, list[Rule]]:
+        """Return the rules that derive each relation, by the relation's name.
+
+        The rules are in the order of the Datalog program.
+        """
+        if self.rules_for_head is None:
+            rules_for_head: dict[str, list[Rule]] = {}
+            for rule in self.datalog.rules:
+                rules_for_head.setdefault(rule.head.name, []).append(rule)
+            self.rules_for_head = rules_for_head
+        return self.rules_for_head
 
     def get_reverse_graph(self) -> dict[int, list[int]]:
-        old_dict = Interpreter.get_rule_dependency_graph(self)
-        return_dict: dict[int, list[int]] = {}
-
-        for i in old_dict:
-            return_dict[i] = []
-        for i in old_dict:
-            for j in old_dict[i]:
-                return_dict[j].append(i)
-        return return_dict
-
-    def post_order_recursion(
-        self,
-        bool_dict: dict[int, bool],
-        reversed_dict: dict[int, list[int]],
-        post_ordered_list: list[int],
-        node: int,
-    ) -> None:
-        if not bool_dict[node]:
-            bool_dict[node] = True
-            for value in reversed_dict[node]:
-                if not bool_dict[value]:
-                    self.post_order_recursion(
-                        bool_dict, reversed_dict, post_ordered_list, value
-                    )
-            post_ordered_list.append(node)
+        """Return the reverse of the rule dependency graph.
+
+        Each edge `R1 -> R2` in the dependency graph is an edge `R2 -> R1` in the reverse
+        graph. The edges for each rule are in ascending order.
+
+        Returns:
+            out: A map with an entry for each rule and the associated rules connected to it.
+        """
+        if self.reverse_graph is None:
+            graph = self.get_rule_dependency_graph()
+            reverse: dict[int, list[int]] = {i: [] for i in graph}
+            for i, edges in graph.items():
+                for j in edges:
+                    reverse[j].append(i)
+            self.reverse_graph = reverse
+        return self.reverse_graph
 
     def get_post_order_sequence(self) -> list[int]:
+        """Return the post-order of a depth-first search of the reverse graph.
+
+        The search starts from each unvisited rule in ascending order and visits the
+        edges of each rule in ascending order. It keeps an explicit stack in place of
+        recursion so long chains of rules do not overflow the call stack.
+
+        Returns:
+            out: The rules in the order the search finishes them.
+        """
         reversed_dict = self.get_reverse_graph()
         post_ordered_list: list[int] = []
-        bool_dict = {}
-        for i in range(len(reversed_dict)):
-            bool_dict[i] = False
-
-        for node in reversed_dict:
-            if not bool_dict[node]:
-                self.post_order_recursion(
-                    bool_dict, reversed_dict, post_ordered_list, node
-                )
+        visited = [False] * len(reversed_dict)
+
+        for root in reversed_dict:
+            if visited[root]:
+                continue
+            visited[root] = True
+            stack = [(root, iter(reversed_dict[root]))]
+            while stack:
+                node, edges = stack[-1]
+                for value in edges:
+                    if not visited[value]:
+                        visited[value] = True
+                        stack.append((value, iter(reversed_dict[value])))
+                        break
+                else:
+                    stack.pop()
+                    post_ordered_list.append(node)
         return post_ordered_list
 
     def get_scc(self) -> list[list[int]]:
-        reverse_dict = self.get_reverse_graph()
-        post_order_list = self.get_post_order_sequence()
-        post_order_list.reverse()
-
-        transposed_graph: dict[int, list[int]] = {key: [] for key in reverse_dict}
-        for node, values in reverse_dict.items():
-            for value in values:
-                transposed_graph[value].append(node)
-
-        bool_dict = {i: False for i in range(len(transposed_graph))}
-        sccs = []
-
-        for node in post_order_list:
-            if not bool_dict[node]:
-                stack = [node]
-                scc = []
-                while stack:
-                    current = stack.pop()
-                    if not bool_dict[current]:
-                        bool_dict[current] = True
-                        scc.append(current)
-                        for value in transposed_graph[current]:
-                            if not bool_dict[value]:
-                                stack.append(value)
-                sccs.append(sorted(scc))
-        return sccs
+        """Return the strongly connected components of the rule dependency graph.
+
+        The components are found by searching the dependency graph from each rule in
+        the reverse of `get_post_order_sequence`, so each component only depends on
+        components that come before it. The rules in each component are sorted.
+
+        Returns:
+            out: The components in evaluation order.
+        """
+        if self.sccs is None:
+            graph = self.get_rule_dependency_graph()
+            post_order_list = self.get_post_order_sequence()
+            post_order_list.reverse()
+
+            visited = [False] * len(graph)
+            sccs = []
+            for node in post_order_list:
+                if not visited[node]:
+                    stack = [node]
+                    scc = []
+                    while stack:
+                        current = stack.pop()
+                        if not visited[current]:
+                            visited[current] = True
+                            scc.append(current)
+                            for value in graph[current]:
+                                if not visited[value]:
+                                    stack.append(value)
+                    sccs.append(sorted(scc))
+            self.sccs = sccs
+        return self.sccs
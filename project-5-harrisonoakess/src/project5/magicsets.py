@@ -0,0 +1,176 @@
+"""Magic-sets rewriting of Datalog programs for demand-driven evaluation.
+
+Bottom-up evaluation derives every fact of every rule, even when the queries only
+ask about a few of them. The magic-sets rewrite turns the constants in the queries
+into _magic_ facts and guards every rule with the magic relation for its head, so
+the rewritten program only derives the facts that the queries can reach. The query
+answers do not change.
+
+The rewrite works on _adorned_ predicates: a predicate paired with a binding
+pattern that marks each argument bound (`b`) or free (`f`). The bindings flow left
+to right through each rule body: an argument is bound if it is a variable bound by
+the head or by an earlier predicate in the body. Constants in rule bodies are
+treated as free so that the magic rules only have variables in their heads.
+"""
+
+from project5.datalogprogram import DatalogProgram, Parameter, Predicate, Rule
+
+
+def _adornment(parameters: list[Parameter], bound: set[str]) -> str:
+    """The binding pattern for the parameters given the bound variables."""
+    return "".join(["b" if i.is_id() and i.value in bound else "f" for i in parameters])
+
+
+def _bound(parameters: list[Parameter], adornment: str) -> list[Parameter]:
+    """The parameters at the bound positions of the adornment."""
+    return [i for i, j in zip(parameters, adornment) if j == "b"]
+
+
+class _Rewriter:
+    """The state for rewriting one program: the names and the adorned predicates."""
+
+    __slots__ = ["datalog", "schemes", "taken", "names", "pending", "rules"]
+
+    def __init__(self, datalog: DatalogProgram) -> None:
+        self.datalog = datalog
+        self.schemes = {i.name: i for i in datalog.schemes}
+        self.taken = set(self.schemes)
+        self.names: dict[tuple[str, str], tuple[str, str]] = {}
+        self.pending: list[tuple[str, str]] = []
+        self.rules: list[Rule] = []
+
+    def _fresh(self, name: str) -> str:
+        while name in self.taken:
+            name += "_"
+        self.taken.add(name)
+        return name
+
+    def adorned(self, name: str, adornment: str) -> tuple[str, str]:
+        """The names of the adorned and magic predicates, queued if they are new."""
+        key = (name, adornment)
+        if key not in self.names:
+            self.names[key] = (
+                self._fresh(f"{name}_{adornment}"),
+                self._fresh(f"magic_{name}_{adornment}"),
+            )
+            self.pending.append(key)
+        return self.names[key]
+
+    def rewrite(self, name: str, adornment: str, idb: set[str]) -> None:
+        """Add the adorned and magic rules for one adorned predicate."""
+        adorned_name, magic_name = self.names[(name, adornment)]
+        for rule in [i for i in self.datalog.rules if i.head.name == name]:
+            guard = Predicate(magic_name, _bound(rule.head.parameters, adornment))
+            body = [guard] if "b" in adornment else []
+            bound = set(i.value for i in guard.parameters)
+            for predicate in rule.predicates:
+                if predicate.name in idb:
+                    sub_adornment = _adornment(predicate.parameters, bound)
+                    sub_name, sub_magic = self.adorned(predicate.name, sub_adornment)
+                    if "b" in sub_adornment:
+                        magic_head = Predicate(
+                            sub_magic, _bound(predicate.parameters, sub_adornment)
+                        )
+                        self.rules.append(Rule(magic_head, list(body)))
+                    predicate = Predicate(sub_name, predicate.parameters)
+                body.append(predicate)
+                bound.update(i.value for i in predicate.parameters if i.is_id())
+            self.rules.append(Rule(Predicate(adorned_name, rule.head.parameters), body))
+
+
+def magic_sets(datalog: DatalogProgram) -> DatalogProgram:
+    """The magic-sets rewrite of a Datalog program for its queries.
+
+    Every query on a predicate defined by rules is given the adornment of its
+    constants, and its constants become a fact of the magic predicate for that
+    adornment. The rules are replaced by the adorned rules, each guarded by the magic
+    predicate of its head, and the magic rules that pass the bindings on to the
+    predicates in the body. A predicate queried with no constants has no magic
+    predicate, so its adorned rules are unguarded. Finally, a copy-back rule for each
+    adornment of a query fills the original relation, so the queries, the facts, and the
+    original schemes are unchanged. Facts given for a predicate that is also defined by
+    rules are copied into each of its adorned relations through its magic predicate.
+
+    The answers to the queries are the same for the rewritten program.
+
+    Returns:
+        out (DatalogProgram): The rewritten program. The input program is not changed.
+
+    Examples:
+        >>> datalog = DatalogProgram(
+        ...     schemes=[
+        ...         Predicate("edge", [Parameter.id("A"), Parameter.id("B")]),
+        ...         Predicate("reach", [Parameter.id("A"), Parameter.id("B")]),
+        ...     ],
+        ...     facts=[],
+        ...     rules=[
+        ...         Rule(
+        ...             Predicate("reach", [Parameter.id("X"), Parameter.id("Y")]),
+        ...             [Predicate("edge", [Parameter.id("X"), Parameter.id("Y")])],
+        ...         ),
+        ...         Rule(
+        ...             Predicate("reach", [Parameter.id("X"), Parameter.id("Z")]),
+        ...             [
+        ...                 Predicate("edge", [Parameter.id("X"), Parameter.id("Y")]),
+        ...                 Predicate("reach", [Parameter.id("Y"), Parameter.id("Z")]),
+        ...             ],
+        ...         ),
+        ...     ],
+        ...     queries=[
+        ...         Predicate("reach", [Parameter.string("'a'"), Parameter.id("Y")])
+        ...     ],
+        ... )
+        >>> rewritten = magic_sets(datalog)
+        >>> print("\\n".join([str(i) for i in rewritten.rules]))
+        reach_bf(X,Y) :- magic_reach_bf(X),edge(X,Y)
+        magic_reach_bf(Y) :- magic_reach_bf(X),edge(X,Y)
+        reach_bf(X,Z) :- magic_reach_bf(X),edge(X,Y),reach_bf(Y,Z)
+        reach(A,B) :- reach_bf(A,B)
+        >>> print(rewritten.facts[0])
+        magic_reach_bf('a')
+    """
+    idb = set(i.head.name for i in datalog.rules)
+    rewriter = _Rewriter(datalog)
+    schemes = list(datalog.schemes)
+    facts = list(datalog.facts)
+
+    queried: list[tuple[str, str]] = []
+    for query in datalog.queries:
+        if query.name not in idb:
+            continue
+        adornment = "".join(["b" if i.is_string() else "f" for i in query.parameters])
+        _, magic_name = rewriter.adorned(query.name, adornment)
+        if (query.name, adornment) not in queried:
+            queried.append((query.name, adornment))
+        if "b" in adornment:
+            seed = Predicate(magic_name, _bound(query.parameters, adornment))
+            if seed not in facts:
+                facts.append(seed)
+
+    while rewriter.pending:
+        name, adornment = rewriter.pending.pop(0)
+        adorned_name, magic_name = rewriter.names[(name, adornment)]
+        header = rewriter.schemes[name].parameters
+        schemes.append(Predicate(adorned_name, list(header)))
+        if "b" in adornment:
+            schemes.append(Predicate(magic_name, _bound(header, adornment)))
+        rewriter.rewrite(name, adornment, idb)
+        if any(i.name == name for i in datalog.facts):
+            guard = [Predicate(magic_name, _bound(header, adornment))]
+            rewriter.rules.append(
+                Rule(
+                    Predicate(adorned_name, header),
+                    (guard if "b" in adornment else []) + [Predicate(name, header)],
+                )
+            )
+
+    for name, adornment in queried:
+        header = rewriter.schemes[name].parameters
+        adorned_name, _ = rewriter.names[(name, adornment)]
+        rewriter.rules.append(
+            Rule(Predicate(name, header), [Predicate(adorned_name, header)])
+        )
+
+    return DatalogProgram(
+        schemes=schemes, facts=facts, rules=rewriter.rules, queries=datalog.queries
+    )
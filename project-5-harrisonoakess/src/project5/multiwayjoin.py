@@ -0,0 +1,106 @@
+"""Worst-case optimal multi-way join for interpreting Datalog.
+
+A chain of binary joins over a cyclic rule body such as
+`tri(A,B,C) :- e(A,B), e(B,C), e(A,C).` materialises intermediate relations
+(here `e(A,B)` joined with `e(B,C)`) that can be much larger than the final
+result. The generic join in this module instead binds one variable at a time
+across all the relations at once, so it never builds an intermediate relation.
+"""
+
+from project5.relation import Relation, RelationTuple, Trie, Value
+
+
+def is_cyclic(headers: list[list[str]]) -> bool:
+    """True iff the hypergraph with an edge for each header is cyclic.
+
+    The test is the GYO reduction: repeatedly remove any attribute that belongs
+    to only one edge and any edge that is contained in another edge. The
+    hypergraph is acyclic iff the reduction leaves at most one edge.
+
+    Examples:
+        >>> is_cyclic([["A", "B"], ["B", "C"], ["A", "C"]])
+        True
+        >>> is_cyclic([["A", "B"], ["B", "C"], ["C", "D"]])
+        False
+    """
+    edges = [set(i) for i in headers]
+    changed = True
+    while changed and len(edges) > 1:
+        changed = False
+        for edge in edges:
+            for attr in list(edge):
+                if sum(attr in i for i in edges) == 1:
+                    edge.remove(attr)
+                    changed = True
+        for index, edge in enumerate(edges):
+            others = edges[:index] + edges[index + 1 :]
+            if any(edge <= i for i in others):
+                edges.pop(index)
+                changed = True
+                break
+    return len(edges) > 1
+
+
+def _variable_order(headers: list[list[str]]) -> list[str]:
+    """The order in which to bind the attributes in the generic join.
+
+    Attributes shared by more relations come first, so the intersections that
+    prune the most are done closest to the root. Ties keep the order in which
+    the attributes first appear.
+    """
+    order: list[str] = []
+    for header in headers:
+        for attr in header:
+            if attr not in order:
+                order.append(attr)
+    return sorted(order, key=lambda i: -sum(i in j for j in headers))
+
+
+def generic_join(relations: list[Relation]) -> Relation:
+    """The natural join of all the relations computed with the generic join.
+
+    The attributes are bound one at a time in the order from `_variable_order`.
+    For each attribute the candidate values are the intersection of the keys at
+    the current level of the `Relation.trie` of every relation that has the
+    attribute, iterating over the smallest of those key sets. Every relation must
+    have a non-empty header.
+
+    Returns:
+        r (Relation): The natural join with the attributes in binding order.
+
+    Examples:
+        >>> e = Relation(["a", "b"], {("1", "2"), ("2", "3"), ("1", "3"), ("3", "4")})
+        >>> triangles = generic_join(
+        ...     [e, e.rename(["b", "c"]), e.rename(["a", "c"])]
+        ... )
+        >>> triangles.header, triangles.set_of_tuples
+        (['a', 'b', 'c'], {('1', '2', '3')})
+    """
+    order = _variable_order([i.header for i in relations])
+    relation_orders = [[j for j in order if j in i.header] for i in relations]
+    tries = [i.trie(j).root for i, j in zip(relations, relation_orders)]
+    participants = [
+        [index for index, i in enumerate(relation_orders) if attr in i]
+        for attr in order
+    ]
+
+    new_tuples: set[RelationTuple] = set()
+    binding: list[Value] = []
+
+    def _bind(depth: int, nodes: list[Trie]) -> None:
+        if depth == len(order):
+            new_tuples.add(tuple(binding))
+            return
+        levels = [nodes[i] for i in participants[depth]]
+        smallest = min(levels, key=len)
+        for value in smallest:
+            if all(value in i for i in levels):
+                next_nodes = list(nodes)
+                for i in participants[depth]:
+                    next_nodes[i] = nodes[i][value]
+                binding.append(value)
+                _bind(depth + 1, next_nodes)
+                binding.pop()
+
+    _bind(0, tries)
+    return Relation(order, new_tuples)
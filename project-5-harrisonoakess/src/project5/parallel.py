@@ -0,0 +1,550 @@
+"""Parallel evaluation of the rules in a Datalog program.
+
+The strongly connected components (SCCs) of the rule dependency graph form a DAG:
+a component only reads relations written by the components it depends on. The
+scheduler in this module sends every component whose dependencies are done to a
+process pool, along with only the relations the component reads or writes, and
+merges the new tuples back into the interpreter as the components finish.
+
+The worker processes are started with a copy of the Datalog program and the
+symbol table, so the tasks only carry the relations and the new tuples.
+
+A single large recursive SCC is instead evaluated data-parallel with
+`eval_scc_partitioned`: every worker keeps a replica of the relations and
+evaluates the rules semi-naively on its own hash partition of the new tuples.
+With `eval_scc_jacobi` the workers instead split the rules of each pass, which
+all read the relations as they were at the start of the pass.
+
+After the fix-point the queries only read the relations, so
+`eval_queries_parallel` answers them on a pool of workers that are each given
+the relations once.
+"""
+
+import os
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Iterator
+
+from project5.datalogprogram import DatalogProgram, Predicate, Rule
+from project5.interpreter import Backend, Interpreter
+from project5.relation import Relation, RelationTuple
+from project5.symboltable import SymbolTable
+
+ShippedRelations = dict[str, tuple[list[str], set[RelationTuple]]]
+"""Defines a type for the relations sent to a worker: the header and tuples by name."""
+
+_worker_interpreter: Interpreter | None = None
+"""The interpreter in a worker process, set by `_init_worker`."""
+
+
+def _init_worker(
+    datalog: DatalogProgram, backend: Backend, symbols: SymbolTable | None
+) -> None:
+    """Create the interpreter for the Datalog program in a worker process."""
+    global _worker_interpreter
+    _worker_interpreter = Interpreter(datalog, backend)
+    _worker_interpreter.symbols = symbols
+
+
+def _init_query_worker(
+    datalog: DatalogProgram,
+    backend: Backend,
+    symbols: SymbolTable | None,
+    relations: ShippedRelations,
+) -> None:
+    """Create the interpreter with all the relations in a query worker process."""
+    _init_worker(datalog, backend, symbols)
+    assert _worker_interpreter is not None
+    _load(_worker_interpreter, relations)
+
+
+def _load(interpreter: Interpreter, relations: ShippedRelations) -> None:
+    """Replace the relations in the interpreter with the shipped relations.
+
+    The indexes and memos for the relations replaced are dropped with them, so a worker
+    that is reused for another program does not keep the relations of the last one.
+    """
+    interpreter.table_list = {
+        name: interpreter.as_backend(Relation(header, tuples))
+        for name, (header, tuples) in relations.items()
+    }
+    interpreter.join_indexes.clear()
+    interpreter.body_memo.clear()
+    interpreter.prefix_memo.clear()
+    interpreter.distinct_memo.clear()
+    interpreter.query_cache.clear()
+
+
+def _ship(interpreter: Interpreter, names: set[str]) -> ShippedRelations:
+    """Copy the named relations of the interpreter for sending to a worker."""
+    return {
+        name: (
+            interpreter.table_list[name].header,
+            set(interpreter.table_list[name].set_of_tuples),
+        )
+        for name in names
+    }
+
+
+def _eval_scc(
+    scc: list[int], relations: ShippedRelations
+) -> list[tuple[int, set[RelationTuple]]]:
+    """Evaluate one SCC in a worker process.
+
+    Returns:
+        out (list[tuple[int, set[RelationTuple]]]): The index of the rule and the new
+            tuples for each step of `Interpreter.eval_scc`.
+    """
+    interpreter = _worker_interpreter
+    assert interpreter is not None
+    _load(interpreter, relations)
+    rule_indices = {id(interpreter.datalog.rules[i]): i for i in scc}
+    return [
+        (rule_indices[id(rule)], after.difference(before).set_of_tuples)
+        for before, rule, after in interpreter.eval_scc(scc)
+    ]
+
+
+def scc_dependencies(interpreter: Interpreter) -> list[set[int]]:
+    """The components each SCC must wait for, by position in `Interpreter.get_scc`.
+
+    A component waits for every component with a rule it depends on. It also waits
+    for the last earlier component that writes the same head relation, so that every
+    relation is written by its components in the same order as in the sequential
+    evaluation. That makes the new tuples of each step identical to the sequential
+    evaluation regardless of the order in which the components finish.
+    """
+    sccs = interpreter.get_scc()
+    graph = interpreter.get_rule_dependency_graph()
+    component = {rule: index for index, scc in enumerate(sccs) for rule in scc}
+    last_writer: dict[str, int] = {}
+    dependencies: list[set[int]] = []
+    for index, scc in enumerate(sccs):
+        waits = {component[j] for i in scc for j in graph[i]}
+        for i in scc:
+            name = interpreter.datalog.rules[i].head.name
+            if name in last_writer:
+                waits.add(last_writer[name])
+            last_writer[name] = index
+        waits.discard(index)
+        dependencies.append(waits)
+    return dependencies
+
+
+def eval_rules_parallel(
+    interpreter: Interpreter, jobs: int | None = None
+) -> Iterator[tuple[Relation, Rule, Relation]]:
+    """Yield each _before_ relation, rule, and _after_ relation with parallel SCCs.
+
+    The yields are the same, and in the same order, as `eval_rules_optimized`. The
+    components run on a pool of `jobs` processes as soon as the components they
+    depend on, from `scc_dependencies`, are done. Each task carries only the relations
+    named in the rules of its component. The new tuples of a finished component are
+    added to the interpreter right away, and the _before_ and _after_ snapshots of
+    each step are held until every earlier component has been yielded.
+
+    Args:
+        interpreter (Interpreter): The interpreter with its facts evaluated.
+        jobs (int | None): The number of worker processes, or `None` for one per CPU.
+    """
+    sccs = interpreter.get_scc()
+    dependencies = scc_dependencies(interpreter)
+    dependents: list[list[int]] = [[] for _ in sccs]
+    for index, waits in enumerate(dependencies):
+        for i in waits:
+            dependents[i].append(index)
+    remaining = [len(i) for i in dependencies]
+    results: dict[int, list[tuple[Relation, Rule, Relation]]] = {}
+    next_index = 0
+
+    with ProcessPoolExecutor(
+        max_workers=jobs or os.cpu_count(),
+        initializer=_init_worker,
+        initargs=(interpreter.datalog, interpreter.backend, interpreter.symbols),
+    ) as pool:
+        running: dict[Future[list[tuple[int, set[RelationTuple]]]], int] = {}
+
+        def _submit(index: int) -> None:
+            names: set[str] = set()
+            for i in sccs[index]:
+                rule = interpreter.datalog.rules[i]
+                names.add(rule.head.name)
+                names.update(j.name for j in rule.predicates)
+            future = pool.submit(_eval_scc, sccs[index], _ship(interpreter, names))
+            running[future] = index
+
+        for index, count in enumerate(remaining):
+            if count == 0:
+                _submit(index)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                steps: list[tuple[Relation, Rule, Relation]] = []
+                for rule_index, new_tuples in future.result():
+                    rule = interpreter.datalog.rules[rule_index]
+                    relation = interpreter.table_list[rule.head.name]
+                    before = relation.snapshot()
+                    interpreter.extend_relation(
+                        rule.head.name, Relation(relation.header, new_tuples)
+                    )
+                    steps.append((before, rule, relation.snapshot()))
+                results[index] = steps
+                for i in dependents[index]:
+                    remaining[i] -= 1
+                    if remaining[i] == 0:
+                        _submit(i)
+            while next_index in results:
+                yield from results.pop(next_index)
+                next_index += 1
+
+
+def _part(r: RelationTuple, parts: int) -> int:
+    """The partition of a tuple, the same in every process unlike `hash`."""
+    return zlib.crc32(repr(r).encode()) % parts
+
+
+def _shard(relation: Relation, part: int, parts: int) -> Relation:
+    """The tuples of `relation` in partition `part` of `parts`."""
+    return Relation(
+        relation.header,
+        set(i for i in relation.set_of_tuples if _part(i, parts) == part),
+    )
+
+
+def _apply(interpreter: Interpreter, deltas: dict[str, set[RelationTuple]]) -> None:
+    """Add the new tuples from the coordinator to the replicas in a worker."""
+    for name, tuples in deltas.items():
+        relation = interpreter.table_list[name]
+        interpreter.extend_relation(name, Relation(relation.header, tuples))
+
+
+def _eval_partition(
+    interpreter: Interpreter,
+    scc: list[int],
+    part: int,
+    parts: int,
+    deltas: dict[str, set[RelationTuple]] | None,
+) -> dict[str, set[RelationTuple]]:
+    """One round of the partitioned fix-point in a worker.
+
+    The first round, with `deltas` of `None`, evaluates every rule with the first
+    relation in its body replaced by its partition. Later rounds first add `deltas`,
+    the new tuples of the previous round, to the replicas and then evaluate every rule
+    once for each body relation with new tuples, replaced by the partition of the new
+    tuples. In both cases the union over the partitions is the full result.
+
+    Returns:
+        out (dict[str, set[RelationTuple]]): The derived tuples for each head relation
+            that are not already in the replica.
+    """
+    rules = [interpreter.datalog.rules[i] for i in scc]
+    derived: dict[str, set[RelationTuple]] = {i.head.name: set() for i in rules}
+    if deltas is not None:
+        _apply(interpreter, deltas)
+    for rule in rules:
+        for position, predicate in enumerate(rule.predicates):
+            if deltas is None:
+                if position > 0:
+                    break
+                source = _shard(interpreter.table_list[predicate.name], part, parts)
+            elif predicate.name in deltas:
+                header = interpreter.table_list[predicate.name].header
+                source = _shard(Relation(header, deltas[predicate.name]), part, parts)
+            else:
+                continue
+            derived[rule.head.name].update(
+                interpreter.eval_rule(
+                    rule, {position: interpreter.as_backend(source)}
+                ).set_of_tuples
+            )
+    return {
+        name: tuples.difference(interpreter.table_list[name].set_of_tuples)
+        for name, tuples in derived.items()
+    }
+
+
+def _eval_rules(
+    interpreter: Interpreter,
+    deltas: dict[str, set[RelationTuple]],
+    rule_indices: list[int],
+) -> list[tuple[int, set[RelationTuple]]]:
+    """One pass of the Jacobi evaluation in a worker.
+
+    The new tuples of the previous pass are added to the replicas, and then each rule
+    is evaluated against the replicas, which are the relations at the start of the pass.
+
+    Returns:
+        out (list[tuple[int, set[RelationTuple]]]): The index of each rule and the tuples
+            it derived that are not already in the replica of its head relation.
+    """
+    _apply(interpreter, deltas)
+    derived = []
+    for i in rule_indices:
+        rule = interpreter.datalog.rules[i]
+        tuples = interpreter.eval_rule(rule).set_of_tuples
+        head = interpreter.table_list[rule.head.name]
+        derived.append((i, tuples.difference(head.set_of_tuples)))
+    return derived
+
+
+def _scc_worker(
+    conn: Connection,
+    part: int,
+    parts: int,
+    datalog: DatalogProgram,
+    backend: Backend,
+    symbols: SymbolTable | None,
+    scc: list[int],
+    relations: ShippedRelations,
+) -> None:
+    """Run the commands sent on `conn` until the coordinator sends `"stop"`.
+
+    A `"round"` command runs `_eval_partition` and a `"rules"` command runs
+    `_eval_rules`, both against the replicas this worker keeps between commands.
+    """
+    _init_worker(datalog, backend, symbols)
+    interpreter = _worker_interpreter
+    assert interpreter is not None
+    _load(interpreter, relations)
+    while True:
+        try:
+            command, payload = conn.recv()
+        except EOFError:
+            return
+        if command == "round":
+            conn.send(_eval_partition(interpreter, scc, part, parts, payload))
+        elif command == "rules":
+            conn.send(_eval_rules(interpreter, *payload))
+        else:
+            return
+
+
+SccWorkers = list[tuple[BaseProcess, Connection]]
+"""Defines a type for the worker processes of one SCC and the connection to each."""
+
+
+def _start_workers(interpreter: Interpreter, scc: list[int], parts: int) -> SccWorkers:
+    """Start `parts` workers, each with a replica of the relations named in the SCC."""
+    names: set[str] = set()
+    for i in scc:
+        rule = interpreter.datalog.rules[i]
+        names.add(rule.head.name)
+        names.update(j.name for j in rule.predicates)
+    relations = _ship(interpreter, names)
+    context = get_context()
+    workers: SccWorkers = []
+    for part in range(parts):
+        conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=_scc_worker,
+            args=(
+                child_conn,
+                part,
+                parts,
+                interpreter.datalog,
+                interpreter.backend,
+                interpreter.symbols,
+                scc,
+                relations,
+            ),
+        )
+        process.start()
+        child_conn.close()
+        workers.append((process, conn))
+    return workers
+
+
+def _stop_workers(workers: SccWorkers) -> None:
+    """Stop the workers and wait for them to exit."""
+    for process, conn in workers:
+        if process.is_alive():
+            conn.send(("stop", None))
+        conn.close()
+        process.join()
+
+
+def eval_scc_partitioned(interpreter: Interpreter, scc: list[int], parts: int) -> int:
+    """Evaluate one recursive SCC to its fix-point with `parts` worker processes.
+
+    The evaluation is semi-naive. Every worker holds a replica of the relations named
+    in the rules, and in each round evaluates the rules only against its hash partition
+    of the tuples that were new in the previous round. The coordinator merges the
+    derived tuples into the interpreter and sends only the new ones back to every
+    worker for the next round. The rounds end when a round derives nothing new. The
+    final relations are the same as from `Interpreter.eval_scc`.
+
+    Partitioning the new tuples, rather than every relation on its join keys, lets the
+    rules in the component join on different keys without moving the full relations.
+
+    Args:
+        interpreter (Interpreter): The interpreter with the relations the SCC depends on.
+        scc (list[int]): The indices of the rules in the component from `get_scc`.
+        parts (int): The number of worker processes.
+
+    Returns:
+        rounds (int): The number of rounds.
+    """
+    workers = _start_workers(interpreter, scc, parts)
+    rounds = 0
+    try:
+        deltas: dict[str, set[RelationTuple]] | None = None
+        while True:
+            for _, conn in workers:
+                conn.send(("round", deltas))
+            derived: dict[str, set[RelationTuple]] = {}
+            for _, conn in workers:
+                for name, tuples in conn.recv().items():
+                    derived.setdefault(name, set()).update(tuples)
+            rounds += 1
+            deltas = {}
+            for name, tuples in derived.items():
+                header = interpreter.table_list[name].header
+                new_tuples = interpreter.extend_relation(name, Relation(header, tuples))
+                if len(new_tuples) > 0:
+                    deltas[name] = new_tuples
+            if len(deltas) == 0:
+                return rounds
+    finally:
+        _stop_workers(workers)
+
+
+def eval_rules_partitioned(interpreter: Interpreter, jobs: int | None = None) -> None:
+    """Evaluate the rules with every recursive SCC run by `eval_scc_partitioned`.
+
+    The SCCs are evaluated in order. An SCC with a single rule that does not depend on
+    itself is evaluated once in this process. The final relations are the same as from
+    `Interpreter.eval_rules_optimized`, but the steps are not reported.
+
+    Args:
+        interpreter (Interpreter): The interpreter with its facts evaluated.
+        jobs (int | None): The number of worker processes, or `None` for one per CPU.
+    """
+    graph = interpreter.get_rule_dependency_graph()
+    for scc in interpreter.get_scc():
+        if len(scc) == 1 and scc[0] not in graph[scc[0]]:
+            for _ in interpreter.eval_scc(scc):
+                pass
+        else:
+            eval_scc_partitioned(interpreter, scc, jobs or os.cpu_count() or 1)
+
+
+def eval_scc_jacobi(
+    interpreter: Interpreter, scc: list[int], parts: int
+) -> Iterator[tuple[Relation, Rule, Relation]]:
+    """Yield each _before_ relation, rule, and _after_ relation from a Jacobi evaluation.
+
+    In each pass every rule of the SCC reads the relations as they were at the start of
+    the pass, so the rules are independent and are spread over `parts` worker processes
+    that each keep a replica of the relations. The derived tuples are merged into the
+    interpreter at the end of the pass in rule order, which is when the steps of the pass
+    are yielded, and the new tuples are sent to every worker for the next pass. As in
+    `Interpreter.eval_scc` a rule is only evaluated again when a relation in its body has
+    grown, and the passes end when a pass adds no new tuples.
+
+    The fix-point is the same as from `Interpreter.eval_scc`, the in-order (Gauss-Seidel)
+    evaluation, but it can take more passes since a tuple derived in a pass is only seen
+    by the other rules in the next pass.
+
+    Args:
+        interpreter (Interpreter): The interpreter with the relations the SCC depends on.
+        scc (list[int]): The indices of the rules in the component from `get_scc`.
+        parts (int): The number of worker processes.
+    """
+    workers = _start_workers(interpreter, scc, parts)
+    try:
+        deltas: dict[str, set[RelationTuple]] = {}
+        evaluated_versions: dict[int, tuple[int, ...]] = {}
+        finish = True
+        while finish:
+            finish = False
+            assigned = []
+            for i in scc:
+                versions = interpreter.body_versions(interpreter.datalog.rules[i])
+                if evaluated_versions.get(i) != versions:
+                    evaluated_versions[i] = versions
+                    assigned.append(i)
+            for part, (_, conn) in enumerate(workers):
+                conn.send(("rules", (deltas, assigned[part::parts])))
+            derived: dict[int, set[RelationTuple]] = {}
+            for _, conn in workers:
+                derived.update(conn.recv())
+
+            deltas = {}
+            for i in scc:
+                rule = interpreter.datalog.rules[i]
+                relation = interpreter.table_list[rule.head.name]
+                before = relation.snapshot()
+                if i in derived:
+                    new_tuples = interpreter.extend_relation(
+                        rule.head.name, Relation(relation.header, derived[i])
+                    )
+                    if len(new_tuples) > 0:
+                        finish = True
+                        deltas.setdefault(rule.head.name, set()).update(new_tuples)
+                yield (before, rule, relation.snapshot())
+    finally:
+        _stop_workers(workers)
+
+
+def eval_rules_jacobi(
+    interpreter: Interpreter, jobs: int | None = None
+) -> Iterator[tuple[Relation, Rule, Relation]]:
+    """Yield each _before_ relation, rule, and _after_ relation with Jacobi passes.
+
+    The SCCs are evaluated in order as in `Interpreter.eval_rules_optimized`, but every
+    recursive SCC is evaluated with `eval_scc_jacobi`.
+
+    Args:
+        interpreter (Interpreter): The interpreter with its facts evaluated.
+        jobs (int | None): The number of worker processes, or `None` for one per CPU.
+    """
+    graph = interpreter.get_rule_dependency_graph()
+    for scc in interpreter.get_scc():
+        if len(scc) == 1 and scc[0] not in graph[scc[0]]:
+            yield from interpreter.eval_scc(scc)
+        else:
+            yield from eval_scc_jacobi(interpreter, scc, jobs or os.cpu_count() or 1)
+
+
+def _eval_query(index: int) -> tuple[list[str], set[RelationTuple]]:
+    """The header and tuples of the answer to one query in a worker process."""
+    interpreter = _worker_interpreter
+    assert interpreter is not None
+    answer = interpreter.single_query(interpreter.datalog.queries[index])
+    return answer.header, answer.set_of_tuples
+
+
+def eval_queries_parallel(
+    interpreter: Interpreter, jobs: int | None = None
+) -> Iterator[tuple[Predicate, Relation]]:
+    """Yield each query and resulting relation with the queries answered in parallel.
+
+    The yields are the same, and in the same order, as `Interpreter.eval_queries`.
+    Every worker process is given all the relations once when it starts, and the
+    queries are then sent to the workers by index in chunks.
+
+    Args:
+        interpreter (Interpreter): The interpreter with its rules evaluated.
+        jobs (int | None): The number of worker processes, or `None` for one per CPU.
+    """
+    queries = interpreter.datalog.queries
+    jobs = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_query_worker,
+        initargs=(
+            interpreter.datalog,
+            interpreter.backend,
+            interpreter.symbols,
+            _ship(interpreter, set(interpreter.table_list)),
+        ),
+    ) as pool:
+        answers = pool.map(
+            _eval_query, range(len(queries)), chunksize=len(queries) // (4 * jobs) + 1
+        )
+        for query, (header, tuples) in zip(queries, answers):
+            yield (query, interpreter.as_backend(Relation(header, tuples)))
@@ -1,18 +1,37 @@
-"""Project 5 optimized rule and query interpreter for Datalog programs."""
+"""Project 5 optimized rule and query interpreter for Datalog programs.
 
-from sys import argv
+The modules for the magic-sets rewrite, the tabled interpreter, and the query server
+are only imported by the options that use them, so that a plain run, and each worker
+of a batch, starts without them.
+"""
+
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from typing import Iterator
 
-from project5.interpreter import Interpreter
+from project5.interpreter import Backend, Interpreter
 from project5.datalogprogram import DatalogProgram, Predicate, Rule
 from project5.lexer import lexer
 from project5.parser import parse, UnexpectedTokenException
 from project5.relation import Relation
-from project5.reporter import project_5_report
+from project5.reporter import passes_report, project_5_report
 from project5.token import Token
 
 
-def project5(input_string: str) -> str:
+def project5(
+    input_string: str,
+    backend: Backend = "set",
+    intern: bool = True,
+    jobs: int = 1,
+    jacobi: bool = False,
+    magic: bool = False,
+    tabled: bool = False,
+    partitioned: bool = False,
+) -> str:
     """Interpret queries in the Datalog program input.
 
     The function creates the lexer and parser to turn the input string into
@@ -20,6 +39,27 @@ def project5(input_string: str) -> str:
     answers to each query in the Datalog program. The answers are formatted for output
     matching with an appropriate reporter interface.
 
+    Args:
+        input_string (str): The Datalog program.
+        backend (Backend): The storage backend for the relations in the interpreter.
+        intern (bool): True to evaluate on interned integer ids in place of strings.
+        jobs (int): The number of worker processes for evaluating independent SCCs and
+            answering the queries in parallel, or 1 to do both in this process.
+        jacobi (bool): True to evaluate the rules of each pass of a recursive SCC
+            concurrently on `jobs` worker processes, all reading the relations as they
+            were at the start of the pass. The number of passes for each SCC is added
+            to the report.
+        magic (bool): True to evaluate the magic-sets rewrite of the program from
+            `magic_sets`, which only derives the facts the queries need. The query
+            answers are the same, but the rule evaluation reports the rewritten rules.
+        tabled (bool): True to answer each query top-down with the tabled subgoals of
+            `TabledInterpreter` in place of evaluating the rules bottom-up. The query
+            answers are the same, but the rule evaluation is empty.
+        partitioned (bool): True to evaluate each recursive SCC with its tuples
+            partitioned over `jobs` worker processes by
+            `Interpreter.eval_rules_partitioned`. The query answers are the same, but
+            the rule evaluation is empty since the steps are not reported.
+
     Returns:
         answer (str): The string representing the rule evaluation and the answers for
         each query in the given Datalog program or a parse failure.
@@ -27,23 +67,183 @@ def project5(input_string: str) -> str:
     token_iterator: Iterator[Token] = lexer(input_string)
     try:
         datalog_program: DatalogProgram = parse(token_iterator)
-        interpreter: Interpreter = Interpreter(datalog_program)
+        if magic:
+            from project5.magicsets import magic_sets
+
+            datalog_program = magic_sets(datalog_program)
+        interpreter: Interpreter
+        if tabled:
+            from project5.tabled import TabledInterpreter
+
+            interpreter = TabledInterpreter(datalog_program, backend, intern)
+        else:
+            interpreter = Interpreter(datalog_program, backend, intern)
         interpreter.eval_schemes()
         interpreter.eval_facts()
         depedency_graph = interpreter.get_rule_dependency_graph()
 
-        rule_evals: list[tuple[Relation, Rule, Relation]] = [
-            i for i in interpreter.eval_rules_optimized()
-        ]
+        rule_iterator: Iterator[tuple[Relation, Rule, Relation]]
+        if tabled:
+            rule_iterator = iter([])
+        elif partitioned:
+            interpreter.eval_rules_partitioned(jobs)
+            rule_iterator = iter([])
+        elif jacobi:
+            rule_iterator = interpreter.eval_rules_jacobi(jobs)
+        elif jobs > 1:
+            rule_iterator = interpreter.eval_rules_parallel(jobs)
+        else:
+            rule_iterator = interpreter.eval_rules_optimized()
+        rule_evals: list[tuple[Relation, Rule, Relation]] = [i for i in rule_iterator]
         query_evals: list[tuple[Predicate, Relation]] = [
-            i for i in interpreter.eval_queries()
+            i for i in interpreter.eval_queries(jobs)
         ]
-        answer: str = project_5_report(depedency_graph, rule_evals, query_evals)
+        answer: str = project_5_report(
+            depedency_graph, rule_evals, query_evals, interpreter.symbols
+        )
+        if jacobi and not tabled:
+            evaluations = Counter(id(i[1]) for i in rule_evals)
+            passes = [
+                (i, evaluations[id(datalog_program.rules[i[0]])])
+                for i in interpreter.get_scc()
+            ]
+            answer += f"\n\nSCC Passes\n{passes_report(passes)}"
         return answer
     except UnexpectedTokenException as e:
         return "Failure!\n  " + str(e.token)
 
 
+def _project5_file(
+    input_file: str,
+    output_file: str,
+    backend: Backend,
+    jacobi: bool,
+    magic: bool,
+    tabled: bool,
+    partitioned: bool,
+) -> tuple[float, str | None]:
+    """Write the report for one input file and return the seconds it took.
+
+    An error, such as an input file that cannot be read, is returned as its message
+    in place of being raised, so the other files of the batch are still reported.
+    """
+    start = time.perf_counter()
+    try:
+        with open(input_file, "r") as f:
+            result = project5(
+                f.read(),
+                backend,
+                jacobi=jacobi,
+                magic=magic,
+                tabled=tabled,
+                partitioned=partitioned,
+            )
+        with open(output_file, "w") as f:
+            f.write(result + "\n")
+    except Exception as e:
+        return time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    return time.perf_counter() - start, None
+
+
+def project5batch(
+    input_files: list[str],
+    out_dir: str,
+    jobs: int | None = None,
+    backend: Backend = "set",
+    jacobi: bool = False,
+    magic: bool = False,
+    tabled: bool = False,
+    partitioned: bool = False,
+) -> Iterator[tuple[str, str, float, str | None]]:
+    """Interpret many Datalog programs on a pool of worker processes.
+
+    Each input file is interpreted with `project5` in a worker process and its
+    report is written to a file in `out_dir` with the name of the input file and
+    the extension `.out`, so `dir/input1.txt` is reported in `out_dir/input1.out`.
+    A file that fails, for example because it cannot be read, is returned with its
+    error and does not stop the files after it.
+
+    Args:
+        input_files (list[str]): The files with the Datalog programs.
+        out_dir (str): The directory for the reports, created if it does not exist.
+        jobs (int | None): The number of worker processes, or `None` for one per CPU.
+        backend (Backend): The storage backend for the relations in the interpreter.
+        jacobi (bool): True to evaluate the rules in Jacobi mode as in `project5`.
+        magic (bool): True to evaluate the magic-sets rewrite as in `project5`.
+        tabled (bool): True to answer the queries top-down as in `project5`.
+        partitioned (bool): True to evaluate the recursive SCCs partitioned as in
+            `project5`.
+
+    Returns:
+        out (Iterator[tuple[str, str, float, str | None]]): The input file, the report
+            file, the seconds taken, and the error or `None` for each input file, in
+            the order of `input_files`.
+
+    Raises:
+        error (ValueError): Error if two input files would have the same report file.
+    """
+    output_files = [
+        os.path.join(out_dir, os.path.splitext(os.path.basename(i))[0] + ".out")
+        for i in input_files
+    ]
+    if len(set(output_files)) != len(output_files):
+        raise ValueError("Error: two input files have the same name in project5batch")
+    os.makedirs(out_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(
+            _project5_file,
+            input_files,
+            output_files,
+            [backend] * len(input_files),
+            [jacobi] * len(input_files),
+            [magic] * len(input_files),
+            [tabled] * len(input_files),
+            [partitioned] * len(input_files),
+        )
+        for input_file, output_file, (seconds, error) in zip(
+            input_files, output_files, results
+        ):
+            yield (input_file, output_file, seconds, error)
+
+
+def project5serve(argv: list[str]) -> None:
+    """Serve the queries on a Datalog program until interrupted.
+
+    The program is evaluated once by `QueryServer.load` and its queries are then
+    answered over the Unix socket or localhost TCP port. See `project5.server`.
+
+    Args:
+        argv (list[str]): The arguments after `serve` on the command line: the input
+            file and one of `--socket PATH` or `--port N`, with the `--backend` option
+            as in `project5cli`.
+    """
+    import asyncio
+
+    from project5.server import QueryServer
+
+    parser = ArgumentParser(prog="project5 serve")
+    parser.add_argument("input_file")
+    parser.add_argument("--backend", choices=["set", "columnar"], default="set")
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument("--socket", help="listen on this Unix domain socket")
+    address.add_argument("--port", type=int, help="listen on this localhost TCP port")
+    args = parser.parse_args(argv)
+
+    with open(args.input_file, "r") as f:
+        input_string = f.read()
+    try:
+        server = QueryServer.load(input_string, args.backend)
+    except UnexpectedTokenException as e:
+        print("Failure!\n  " + str(e.token))
+        sys.exit(1)
+    where = args.socket if args.socket is not None else f"127.0.0.1:{args.port}"
+    print(f"serving {args.input_file} on {where}", flush=True)
+    try:
+        asyncio.run(server.serve(args.socket, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
 def project5cli() -> None:
     """Answer queries in a Datalog program
 
@@ -52,6 +252,18 @@ def project5cli() -> None:
 
     Args:
         argv (list[str]): Generated from the command line and needs to name the input file.
+            The `--backend columnar` option stores the relations as NumPy columns and
+            the `--jacobi` option evaluates the rules of each pass concurrently. The
+            `--magic` option evaluates the magic-sets rewrite of the program and the
+            `--tabled` option answers the queries top-down. The `--partitioned`
+            option evaluates each recursive SCC with its tuples partitioned over
+            the worker processes. With
+            `--out-dir D` any number of input files are interpreted on a pool of
+            `--jobs N` processes by `project5batch`, each report is written to `D`,
+            and the time taken for each file is printed. A file that fails is
+            printed with its error, the others are still reported, and the exit
+            status is 1. `project5 serve` evaluates a
+            program once and answers queries over a socket, see `project5serve`.
 
     Examples:
 
@@ -106,13 +318,99 @@ def project5cli() -> None:
       A='1', B='2'
       A='3', B='5'
       A='4', B='3'
+
+    $ project5 --jobs 4 --out-dir reports prog.txt other.txt
+    prog.txt -> reports/prog.out: 0.004s
+    other.txt -> reports/other.out: 0.003s
+    2 programs in 0.112s
+
+    $ project5 --out-dir reports prog.txt missing.txt
+    prog.txt -> reports/prog.out: 0.004s
+    missing.txt failed: FileNotFoundError: [Errno 2] No such file or directory: 'missing.txt': 0.000s
+    2 programs in 0.108s, 1 failed
+
+    $ project5 serve prog.txt --socket /tmp/project5.sock
+    serving prog.txt on /tmp/project5.sock
     ```
     """
-    if len(argv) == 2:
-        input_file = argv[1]
-        with open(input_file, "r") as f:
+    if sys.argv[1:2] == ["serve"]:
+        project5serve(sys.argv[2:])
+        return
+
+    parser = ArgumentParser(prog="project5")
+    parser.add_argument("input_file", nargs="+")
+    parser.add_argument("--backend", choices=["set", "columnar"], default="set")
+    parser.add_argument(
+        "--jacobi",
+        action="store_true",
+        help="evaluate the rules of each pass concurrently and report the passes",
+    )
+    parser.add_argument(
+        "--magic",
+        action="store_true",
+        help="evaluate only the facts the queries need with the magic-sets rewrite",
+    )
+    parser.add_argument(
+        "--tabled",
+        action="store_true",
+        help="answer each query top-down with tabling in place of evaluating the rules",
+    )
+    parser.add_argument(
+        "--partitioned",
+        action="store_true",
+        help="evaluate each recursive SCC with its tuples partitioned over the workers",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="the number of worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--out-dir",
+        default=None,
+        help="write the report for each input file to this directory",
+    )
+    args = parser.parse_args()
+
+    if args.out_dir is None:
+        if len(args.input_file) > 1:
+            parser.error("--out-dir is required with more than one input file")
+        with open(args.input_file[0], "r") as f:
             input_string = f.read()
-            result = project5(input_string)
+            concurrent = args.jacobi or args.partitioned
+            jobs = args.jobs or ((os.cpu_count() or 1) if concurrent else 1)
+            result = project5(
+                input_string,
+                args.backend,
+                jobs=jobs,
+                jacobi=args.jacobi,
+                magic=args.magic,
+                tabled=args.tabled,
+                partitioned=args.partitioned,
+            )
             print(result)
-    else:
-        print("usage: project5 <input file>")
+        return
+
+    start = time.perf_counter()
+    failed = 0
+    for input_file, output_file, seconds, error in project5batch(
+        args.input_file,
+        args.out_dir,
+        args.jobs,
+        args.backend,
+        args.jacobi,
+        args.magic,
+        args.tabled,
+        args.partitioned,
+    ):
+        if error is None:
+            print(f"{input_file} -> {output_file}: {seconds:.3f}s")
+        else:
+            failed += 1
+            print(f"{input_file} failed: {error}: {seconds:.3f}s")
+    total = time.perf_counter() - start
+    summary = f"{len(args.input_file)} programs in {total:.3f}s"
+    print(summary if failed == 0 else f"{summary}, {failed} failed")
+    if failed > 0:
+        sys.exit(1)
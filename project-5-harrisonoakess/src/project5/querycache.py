@@ -0,0 +1,204 @@
+"""Cache for the selections that answer queries."""
+
+from collections import OrderedDict
+
+from project5.datalogprogram import Predicate
+from project5.relation import Relation, RelationDelta, Value
+
+Pattern = tuple[tuple[bool, Value], ...]
+"""
+The normalised form of a query: for each position, `(True, value)` for a constant or
+`(False, k)` for the `k`-th distinct variable, so `f(X,'a',X)?` and `f(Y,'a',Y)?` have
+the same pattern.
+"""
+
+
+def query_pattern(query: Predicate, constants: list[Value]) -> Pattern:
+    """The pattern of `query` with its constants given as `constants` in order."""
+    variables: dict[str, int] = {}
+    values = iter(constants)
+    return tuple(
+        (
+            (True, next(values))
+            if i.is_string()
+            else (False, variables.setdefault(i.value, len(variables)))
+        )
+        for i in query.parameters
+    )
+
+
+def subsumes(general: Pattern, specific: Pattern) -> bool:
+    """True if every tuple matching `specific` also matches `general`.
+
+    Examples:
+        >>> subsumes(((False, 0), (False, 1)), ((True, "'a'"), (False, 0)))
+        True
+        >>> subsumes(((False, 0), (False, 0)), ((True, "'a'"), (True, "'a'")))
+        True
+        >>> subsumes(((False, 0), (False, 0)), ((False, 0), (False, 1)))
+        False
+    """
+    if len(general) != len(specific):
+        return False
+    bound: dict[Value, tuple[bool, Value]] = {}
+    for i, j in zip(general, specific):
+        if i[0]:
+            if i != j:
+                return False
+        elif bound.setdefault(i[1], j) != j:
+            return False
+    return True
+
+
+def select(relation: Relation, pattern: Pattern) -> Relation:
+    """The tuples of `relation` that match `pattern`, with the same header."""
+    first: dict[Value, str] = {}
+    for attribute, (is_constant, value) in zip(relation.header, pattern):
+        if is_constant:
+            relation = relation.select_eq_lit(attribute, value)
+        elif value in first:
+            relation = relation.select_eq_col(first[value], attribute)
+        else:
+            first[value] = attribute
+    return relation
+
+
+class QueryCache:
+    """Least recently used cache for the selections that answer queries.
+
+    Each entry is the relation selected from a base relation for a query pattern, with
+    the header of the base relation. A query is answered from an entry for the same
+    pattern, or by filtering the smallest entry whose pattern subsumes it, in place of
+    scanning the base relation. Entries are only used while the base relation is the
+    same object with the same `Relation.revision`, since the relations for the rule
+    heads change in place.
+
+    The entries are keyed by the identity of the base relation as well as the pattern,
+    so the versions of a relation in different snapshots do not replace each other,
+    and the patterns cached for each base relation are indexed, so a query only checks
+    the patterns over its own relation for one that subsumes it.
+
+    The cache holds at most `budget` tuples over all its entries. The least recently
+    used entries are evicted to make room for a new one, and a selection larger than the
+    budget is not cached.
+
+    Attributes:
+        budget (int): The most tuples held over all the entries.
+        size (int): The tuples held over all the entries.
+        entries (OrderedDict[tuple[str, int, Pattern], tuple[Relation, int,
+            Relation]]): The base relation, its revision, and the selection for each
+            name, `id` of the base relation, and pattern, from least to most recently
+            used.
+        patterns (dict[tuple[str, int], set[Pattern]]): The patterns in `entries` for
+            each name and `id` of the base relation.
+        hits (int): The selections taken from an entry in place of the base relation.
+
+    Examples:
+        >>> f = Relation(["A", "B"], set([("'a'", "'b'"), ("'b'", "'b'")]))
+        >>> cache = QueryCache(10)
+        >>> sorted(cache.select("f", f, ((False, 0), (True, "'b'"))).set_of_tuples)
+        [("'a'", "'b'"), ("'b'", "'b'")]
+        >>> sorted(cache.select("f", f, ((True, "'b'"), (True, "'b'"))).set_of_tuples)
+        [("'b'", "'b'")]
+        >>> cache.hits, cache.size
+        (1, 3)
+    """
+
+    __slots__ = ["budget", "size", "entries", "patterns", "hits"]
+
+    def __init__(self, budget: int = 100_000) -> None:
+        self.budget = budget
+        self.size = 0
+        self.entries: OrderedDict[
+            tuple[str, int, Pattern], tuple[Relation, int, Relation]
+        ] = OrderedDict()
+        self.patterns: dict[tuple[str, int], set[Pattern]] = {}
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        self.entries.clear()
+        self.patterns.clear()
+        self.size = 0
+
+    def discard(self, relation: Relation) -> None:
+        """Remove the entries selected from `relation`."""
+        for name, base in [i for i in self.patterns if i[1] == id(relation)]:
+            for pattern in list(self.patterns[(name, base)]):
+                self.remove((name, base, pattern))
+
+    def remove(self, key: tuple[str, int, Pattern]) -> None:
+        """Remove the entry for `key`, which must be in `entries`."""
+        self.size -= len(self.entries.pop(key)[2])
+        patterns = self.patterns[key[:2]]
+        patterns.discard(key[2])
+        if len(patterns) == 0:
+            del self.patterns[key[:2]]
+
+    def select(self, name: str, relation: Relation, pattern: Pattern) -> Relation:
+        """The tuples of `relation`, named `name`, that match `pattern`.
+
+        The selection is taken from the cache when an entry for `relation` subsumes
+        `pattern`, and is then cached unless it is all of `relation`. The selection
+        from a `RelationDelta` is the selection for `pattern` from its parent, when it
+        is cached, with the delta applied, so the parent is not scanned.
+        """
+        version = relation.revision()
+        source = relation
+        key = general = (name, id(relation), pattern)
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] == version:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+        if isinstance(relation, RelationDelta):
+            parent_key = (name, id(relation.parent), pattern)
+            entry = self.entries.get(parent_key)
+            if entry is not None and entry[1] == relation.parent.revision():
+                self.entries.move_to_end(parent_key)
+                self.hits += 1
+                added = select(Relation(relation.header, relation.added), pattern)
+                answer = Relation(
+                    relation.header,
+                    entry[2].set_of_tuples.difference(relation.deleted),
+                )
+                answer.set_of_tuples.update(added.set_of_tuples)
+                self.add(key, relation, version, answer)
+                return answer
+        for i in self.patterns.get((name, id(relation)), set()):
+            _, base_version, selected = self.entries[(name, id(relation), i)]
+            if (
+                base_version == version
+                and subsumes(i, pattern)
+                and len(selected) <= len(source)
+            ):
+                source = selected
+                general = (name, id(relation), i)
+        if source is not relation:
+            self.entries.move_to_end(general)
+            self.hits += 1
+        answer = select(source, pattern)
+        if answer is not relation:
+            self.add(key, relation, version, answer)
+        return answer
+
+    def add(
+        self,
+        key: tuple[str, int, Pattern],
+        relation: Relation,
+        version: int,
+        selected: Relation,
+    ) -> None:
+        """Cache `selected` for `key`, evicting the least recently used entries."""
+        if key in self.entries:
+            self.remove(key)
+        if len(selected) > self.budget:
+            return
+        while self.size + len(selected) > self.budget:
+            self.remove(next(iter(self.entries)))
+        self.entries[key] = (relation, version, selected)
+        self.patterns.setdefault(key[:2], set()).add(key[2])
+        self.size += len(selected)
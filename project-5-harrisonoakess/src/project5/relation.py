@@ -1,7 +1,7 @@
 """Relation type for interpreting Datalog."""
 
 from tabulate import tabulate
-from typing import Any
+from typing import Any, Iterator
 
 
 class IncompatibleOperandError(Exception):
@@ -11,8 +11,96 @@ class IncompatibleOperandError(Exception):
         super().__init__(msg)
 
 
-RelationTuple = tuple[str, ...]
-"""Defines a type for tuples in the relation. Here the tuple can be any number of strings."""
+Value = str | int
+"""Defines a type for the values in a tuple: a string or its interned integer id."""
+
+RelationTuple = tuple[Value, ...]
+"""Defines a type for tuples in the relation. Here the tuple can be any number of strings,
+or any number of integers when the strings are interned with a `SymbolTable`."""
+
+JoinIndex = dict[RelationTuple, set[RelationTuple]]
+"""Defines a type for a join index: the tuples of a relation grouped by the values of key columns."""
+
+Trie = dict[Value, "Trie"]
+"""Defines a type for a trie over tuples: one level of nested keys per attribute."""
+
+
+class RelationTrie:
+    """Trie class for an alternative access path to the tuples in a relation.
+
+    The trie nests one dictionary level per attribute in a chosen column order, so
+    tuples that share a prefix share the nodes for that prefix. It supports lookups
+    by a bound prefix and a sorted view of the keys under any prefix that can be
+    walked without rehashing the tuples, which is what multi-way joins need.
+
+    Attributes:
+        order (list[str]): The attributes in the order of the trie levels.
+        indices (list[int]): The position in the relation tuples of each attribute in `order`.
+        root (Trie): The root node of the trie.
+        size (int): The number of tuples in the trie.
+
+    Examples:
+        >>> r = Relation(["a", "b"], {("1", "3"), ("2", "3"), ("1", "2")})
+        >>> trie = r.trie(["b", "a"])
+        >>> trie.keys(), trie.keys(("3",))
+        (['2', '3'], ['1', '2'])
+        >>> list(trie)
+        [('2', '1'), ('3', '1'), ('3', '2')]
+    """
+
+    __slots__ = ["order", "indices", "root", "size", "sorted_keys"]
+
+    def __init__(self, header: list[str], order: list[str]) -> None:
+        self.order = list(order)
+        self.indices = [header.index(i) for i in order]
+        self.root: Trie = {}
+        self.size = 0
+        self.sorted_keys: dict[RelationTuple, list[Value]] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f"RelationTrie(order={self.order!r}, size={self.size!r})"
+
+    def __iter__(self) -> Iterator[RelationTuple]:
+        """Iterate the tuples, with attributes in trie order, in sorted order."""
+
+        def _walk(prefix: RelationTuple) -> Iterator[RelationTuple]:
+            if len(prefix) == len(self.order):
+                yield prefix
+                return
+            for key in self.keys(prefix):
+                yield from _walk(prefix + (key,))
+
+        return _walk(())
+
+    def insert(self, r: RelationTuple) -> None:
+        """Insert a tuple given with the attributes in the order of the relation header."""
+        node = self.root
+        for index in self.indices:
+            node = node.setdefault(r[index], {})
+        self.size += 1
+        self.sorted_keys.clear()
+
+    def lookup(self, prefix: RelationTuple) -> Trie | None:
+        """The node under `prefix`, in trie order, or `None` if no tuple has the prefix."""
+        node = self.root
+        for key in prefix:
+            next_node = node.get(key)
+            if next_node is None:
+                return None
+            node = next_node
+        return node
+
+    def keys(self, prefix: RelationTuple = ()) -> list[Value]:
+        """The sorted keys of the node under `prefix` or `[]` if no tuple has the prefix."""
+        keys = self.sorted_keys.get(prefix)
+        if keys is None:
+            node = self.lookup(prefix)
+            keys = [] if node is None else sorted(node)
+            self.sorted_keys[prefix] = keys
+        return keys
 
 
 class Relation:
@@ -21,14 +109,21 @@ class Relation:
     The interface for the class is complete meaning that it defines all the
     needed attributes and relation operations to implement the Datalog interpreter.
     It is expected that additional internal functions are to be added in support
-    of the published public interface. No additional attributes should be needed.
+    of the published public interface.
 
     Attributes:
         header (list[str]): The relation header.
         set_of_tuples (set[RelationTuple]): The tuples belonging to the relation.
+        tries (dict[tuple[str, ...], RelationTrie]): The tries built by `trie` for
+            each column order, kept up to date as tuples are added.
+        history (list[RelationTuple]): The tuples added by `extend` in the order they
+            were added, which is what lets a `snapshot` stay valid as the relation grows.
+            It is cleared by `trim_history` once no snapshot needs it.
+        changes (int): The number of tuples added by `extend` and taken out by
+            `remove`, which `trim_history` does not reset.
     """
 
-    __slots__ = ["header", "set_of_tuples"]
+    __slots__ = ["header", "set_of_tuples", "tries", "history", "changes"]
 
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, Relation):
@@ -44,9 +139,15 @@ class Relation:
         """
         self.header = list(header)
         self.set_of_tuples: set[RelationTuple] = set()
+        self.tries: dict[tuple[str, ...], RelationTrie] = {}
+        self.history: list[RelationTuple] = []
+        self.changes = 0
         for i in set_of_tuples:
             self.add_tuple(i)
 
+    def __len__(self) -> int:
+        return len(self.set_of_tuples)
+
     def __repr__(self) -> str:
         return f"Relation(header={self.header!r}, set_of_tuples={self.set_of_tuples!r})"
 
@@ -72,15 +173,150 @@ class Relation:
             error (IncompatibleOperandError): Error if the length of the tuple doesn't
                 match the header or if the thing being added isn't a tuple of strings.
         """
+        self.check_tuple(r)
+        if r not in self.set_of_tuples:
+            self.set_of_tuples.add(r)
+            for trie in self.tries.values():
+                trie.insert(r)
+
+    def extend(self, right_operand: "Relation") -> set[RelationTuple]:
+        """Add the tuples of another relation to this relation in place.
+
+        This is the in-place union for relations that only grow, such as the head
+        relations during rule evaluation. Only the new tuples are touched, so the cost
+        does not depend on the size of this relation. The new tuples are recorded in
+        `history` so that earlier snapshots of this relation stay valid.
+
+        Returns:
+            new_tuples (set[RelationTuple]): The tuples in `right_operand` that were
+                not already in this relation.
+        Raises:
+            error (IncompatibleOperandError): Error if the headers are not the same.
+        """
+        if self.header != right_operand.header:
+            raise IncompatibleOperandError(
+                "The headers do not equal each other in extend"
+            )
+        new_tuples = right_operand.set_of_tuples.difference(self.set_of_tuples)
+        self.set_of_tuples.update(new_tuples)
+        for trie in self.tries.values():
+            for r in new_tuples:
+                trie.insert(r)
+        self.history.extend(new_tuples)
+        self.changes += len(new_tuples)
+        return new_tuples
+
+    def remove(self, tuples: set[RelationTuple]) -> set[RelationTuple]:
+        """Remove tuples from this relation in place.
+
+        The tries are dropped, to be built again when next asked for, and `changes`
+        counts the tuples taken out so that `revision` tells the relation has changed.
+        The snapshots taken before are no longer valid, so the history is trimmed.
+
+        Returns:
+            removed_tuples (set[RelationTuple]): The tuples in `tuples` that were in
+                this relation.
+        """
+        removed_tuples = tuples.intersection(self.set_of_tuples)
+        self.set_of_tuples.difference_update(removed_tuples)
+        if len(removed_tuples) > 0:
+            self.tries.clear()
+            self.trim_history()
+        self.changes += len(removed_tuples)
+        return removed_tuples
+
+    def trim_history(self) -> None:
+        """Forget the order in which the tuples in `history` were added.
+
+        The snapshots taken before are no longer valid. The `revision` does not change.
+        """
+        self.history.clear()
+
+    def revision(self) -> int:
+        """A number that grows with each tuple added by `extend` or taken out by `remove`.
+
+        Memos that keep a result computed from the relation keep its revision too, and
+        use the result only while the revision is the same. Tuples added by `add_tuple`
+        do not count.
+
+        Examples:
+            >>> r = Relation(["a"], {("1",)})
+            >>> r.extend(Relation(["a"], {("2",)}))
+            {('2',)}
+            >>> r.revision(), r.remove({("2",)}), r.revision(), r.history
+            (1, {('2',)}, 2, [])
+        """
+        return self.changes
+
+    def snapshot(self) -> "RelationVersion":
+        """A read-only view of this relation as it is now.
+
+        The view does not copy the tuples. It stays equal to this relation as it is now
+        while later tuples are added with `extend`, but not with `add_tuple`, and not
+        once tuples are taken out with `remove`.
+
+        Examples:
+            >>> r = Relation(["a"], {("1",)})
+            >>> before = r.snapshot()
+            >>> r.extend(Relation(["a"], {("1",), ("2",)}))
+            {('2',)}
+            >>> before.set_of_tuples, r.difference(before).set_of_tuples
+            ({('1',)}, {('2',)})
+        """
+        return RelationVersion(self, len(self.history))
+
+    def check_tuple(self, r: RelationTuple) -> None:
+        """Check that a tuple can be added to the relation.
+
+        Raises:
+            error (IncompatibleOperandError): Error if the length of the tuple doesn't
+                match the header or if the thing being added isn't a tuple of strings
+                or a tuple of integers.
+        """
         if len(self.header) != len(r):
             raise IncompatibleOperandError(
                 f"Error: {r} is not compatible with header {self.header} in Relation.add_tuple"
             )
-        if not isinstance(r, tuple) or any(not isinstance(i, str) for i in r):
+        if not isinstance(r, tuple) or not (
+            all(isinstance(i, str) for i in r) or all(isinstance(i, int) for i in r)
+        ):
             raise IncompatibleOperandError(
                 f"Error: {r} is not type compatible with Relation.RelationTuple in Relation.add_tuple"
             )
-        self.set_of_tuples.add(r)
+
+    def trie(self, order: list[str]) -> RelationTrie:
+        """The trie over the tuples in the relation with the attributes in `order`.
+
+        The trie is built the first time it is asked for and then kept with the
+        relation, so later calls and later `add_tuple` calls do not rebuild it.
+
+        Raises:
+            error (IncompatibleOperandError): Error if `order` is not an ordering of
+                the attributes in the header.
+        """
+        if sorted(order) != sorted(self.header):
+            raise IncompatibleOperandError(
+                f"Error: {order} is not an ordering of header {self.header} in Relation.trie"
+            )
+        key = tuple(order)
+        trie = self.tries.get(key)
+        if trie is None:
+            trie = RelationTrie(self.header, order)
+            for r in self.set_of_tuples:
+                trie.insert(r)
+            self.tries[key] = trie
+        return trie
+
+    def count_distinct(self, attr: str) -> int:
+        """The number of distinct values for `attr` in the relation.
+
+        Raises:
+            error (IncompatibleOperandError): Error if `attr` is not found in the header.
+        """
+        if attr not in self.header:
+            raise IncompatibleOperandError("this failed")
+        index = self.header.index(attr)
+        return len({i[index] for i in self.set_of_tuples})
 
     def difference(self, right_operand: "Relation") -> "Relation":
         """The difference between this relation and another.
@@ -120,12 +356,20 @@ class Relation:
             self.header, self.set_of_tuples.intersection(right_operand.set_of_tuples)
         )
 
-    def join(self, right_operand: "Relation") -> "Relation":
+    def join(
+        self, right_operand: "Relation", right_index: JoinIndex | None = None
+    ) -> "Relation":
         """The natural join between this relation and another.
 
         The left operand is this relation (self) and the right operand
         is provided in the function call.
 
+        The join on common attributes is a hash join that indexes the right
+        operand and probes the index with the left operand. An existing index
+        of the right operand, from `index` with the positions of the common
+        attributes in the order they appear in the left header, can be given
+        as `right_index` so that the join only probes it.
+
         Returns:
             r (Relation): A new relation that is self natural join with right_operand.
         """
@@ -135,12 +379,9 @@ class Relation:
 
         # If the headers are exactly the same
         if self.header == right_operand.header:
-            new_relation = Relation(self.header, set())
-            for i in self.set_of_tuples:
-                for j in right_operand.set_of_tuples:
-                    if i == j:
-                        new_relation.add_tuple(i)
-            return new_relation
+            return Relation(
+                self.header, self.set_of_tuples & right_operand.set_of_tuples
+            )
 
         # If there are no common attributes
         if not any(char in self.header for char in right_operand.header):
@@ -151,43 +392,43 @@ class Relation:
                     set_list.append(i + j)
             return Relation(none_header, set(set_list))
 
-        # Otherwise, perform natural join on common attributes
-        common_attributes = set(self.header) & set(right_operand.header)
+        # Otherwise, perform a hash join on common attributes
+        common_attributes = [
+            attr for attr in self.header if attr in right_operand.header
+        ]
         combined_header = list(self.header) + [
             attr for attr in right_operand.header if attr not in common_attributes
         ]
-        # return_relation = Relation(combined_header, set())
-
-        # Create index maps for accessing tuple values
-        left_dict = {}
-        index = 0
-        for attr in self.header:
-            left_dict[attr] = index
-            index += 1
-        right_dict = {}
-        index = 0
-        for attr in right_operand.header:
-            right_dict[attr] = index
-            index += 1
+        left_key = [self.header.index(attr) for attr in common_attributes]
+        right_key = [right_operand.header.index(attr) for attr in common_attributes]
+        right_rest = [
+            index
+            for index, attr in enumerate(right_operand.header)
+            if attr not in common_attributes
+        ]
 
+        # Index the right operand on its key, then probe it with the left operand
+        index = right_operand.index(right_key) if right_index is None else right_index
         new_tuples = set()
         for left_tuple in self.set_of_tuples:
-            for right_tuple in right_operand.set_of_tuples:
-                if all(
-                    left_tuple[left_dict[attr]] == right_tuple[right_dict[attr]]
-                    for attr in common_attributes
-                ):
-                    # Create the combined tuple without duplicating common attributes
-                    combined_tuple = list(left_tuple)
-                    combined_tuple += [
-                        right_tuple[right_dict[attr]]
-                        for attr in right_operand.header
-                        if attr not in common_attributes
-                    ]
-                    new_tuples.add(tuple(combined_tuple))
+            key = tuple(left_tuple[i] for i in left_key)
+            for right_tuple in index.get(key, []):
+                new_tuples.add(left_tuple + tuple(right_tuple[i] for i in right_rest))
 
         return Relation(combined_header, new_tuples)
 
+    def index(self, positions: list[int]) -> JoinIndex:
+        """The tuples of this relation grouped by their values at `positions`.
+
+        Returns:
+            index (JoinIndex): A map from each key, the values at `positions` in order,
+                to the tuples having that key.
+        """
+        index: JoinIndex = {}
+        for r in self.set_of_tuples:
+            index.setdefault(tuple(r[i] for i in positions), set()).add(r)
+        return index
+
     def project(self, to: list[str]) -> "Relation":
         """The projection of this relation to a new header.
 
@@ -260,7 +501,7 @@ class Relation:
                 new_tuples.add(tup)
         return Relation(self.header, new_tuples)
 
-    def select_eq_lit(self, src: str, lit: str) -> "Relation":
+    def select_eq_lit(self, src: str, lit: Value) -> "Relation":
         """The select of this relation where the `src` entry equals `lit`.
 
         The `src` must be known in the header. The new resulting relation
@@ -301,3 +542,160 @@ class Relation:
         return Relation(
             self.header, self.set_of_tuples.union(right_operand.set_of_tuples)
         )
+
+
+class RelationVersion(Relation):
+    """A read-only view of a relation after a number of `Relation.extend` insertions.
+
+    The view is the relation less the tuples added to it by `extend` since the view
+    was taken, so it is only materialized when its tuples are read. The difference
+    between two views of the same relation is read directly from the history of the
+    relation.
+
+    Attributes:
+        base (Relation): The relation that is viewed.
+        version (int): The length of the history of `base` when the view was taken.
+    """
+
+    __slots__ = ["base", "version"]
+
+    def __init__(self, base: Relation, version: int) -> None:
+        self.header = list(base.header)
+        self.tries = {}
+        self.history = []
+        self.changes = 0
+        self.base = base
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.base) - (len(self.base.history) - self.version)
+
+    def __repr__(self) -> str:
+        return f"RelationVersion(header={self.header!r}, set_of_tuples={self.set_of_tuples!r})"
+
+    @property
+    def set_of_tuples(self) -> set[RelationTuple]:
+        """The tuples belonging to the relation when the view was taken."""
+        return self.base.set_of_tuples.difference(self.base.history[self.version :])
+
+    @set_of_tuples.setter
+    def set_of_tuples(self, set_of_tuples: set[RelationTuple]) -> None:
+        raise IncompatibleOperandError(
+            "Error: the tuples of the read-only RelationVersion cannot be set"
+        )
+
+    def add_tuple(self, r: RelationTuple) -> None:
+        raise IncompatibleOperandError(
+            f"Error: {r} cannot be added to the read-only RelationVersion"
+        )
+
+    def extend(self, right_operand: Relation) -> set[RelationTuple]:
+        raise IncompatibleOperandError(
+            "Error: the read-only RelationVersion cannot be extended"
+        )
+
+    def remove(self, tuples: set[RelationTuple]) -> set[RelationTuple]:
+        raise IncompatibleOperandError(
+            "Error: tuples cannot be removed from the read-only RelationVersion"
+        )
+
+    def difference(self, right_operand: Relation) -> Relation:
+        """The difference between this view and another.
+
+        When `right_operand` is an earlier view of the same relation, the difference is
+        the tuples added between the two views and the relation is not materialized.
+        """
+        if (
+            isinstance(right_operand, RelationVersion)
+            and right_operand.base is self.base
+            and right_operand.version <= self.version
+        ):
+            return Relation(
+                self.header,
+                set(self.base.history[right_operand.version : self.version]),
+            )
+        return super().difference(right_operand)
+
+
+class RelationDelta(Relation):
+    """A read-only relation that is another relation with tuples added and taken out.
+
+    Only the tuples that differ from `parent` are kept, so publishing a small change to
+    a large relation does not copy it, and the relation is only materialized when its
+    tuples are read. The parent may be a delta too. Reading the tuples starts from the
+    relation at the root of the chain and applies each delta in turn.
+
+    Attributes:
+        parent (Relation): The relation that is changed, which must not change itself.
+        added (set[RelationTuple]): The tuples added, none of which are in `parent`.
+        deleted (set[RelationTuple]): The tuples taken out, all of which are in `parent`.
+        changes (int): The number of tuples added and taken out over the chain of
+            deltas from the root relation, which is the memory the chain holds on top
+            of the root.
+
+    Examples:
+        >>> r = Relation(["a"], {("1",), ("2",)})
+        >>> delta = RelationDelta(RelationDelta(r, {("3",)}, set()), set(), {("1",)})
+        >>> sorted(delta.set_of_tuples), len(delta), delta.changes
+        ([('2',), ('3',)], 2, 2)
+    """
+
+    __slots__ = ["parent", "added", "deleted", "changes"]
+
+    def __init__(
+        self,
+        parent: Relation,
+        added: set[RelationTuple],
+        deleted: set[RelationTuple],
+    ) -> None:
+        self.header = list(parent.header)
+        self.tries = {}
+        self.history = []
+        self.changes = 0
+        self.parent = parent
+        self.added = added
+        self.deleted = deleted
+        self.changes = len(added) + len(deleted)
+        if isinstance(parent, RelationDelta):
+            self.changes += parent.changes
+
+    def __len__(self) -> int:
+        return len(self.parent) + len(self.added) - len(self.deleted)
+
+    def __repr__(self) -> str:
+        return f"RelationDelta(header={self.header!r}, added={self.added!r}, deleted={self.deleted!r})"
+
+    @property
+    def set_of_tuples(self) -> set[RelationTuple]:
+        """The tuples of the root relation with each delta in the chain applied."""
+        chain: list[RelationDelta] = []
+        relation: Relation = self
+        while isinstance(relation, RelationDelta):
+            chain.append(relation)
+            relation = relation.parent
+        set_of_tuples = set(relation.set_of_tuples)
+        for delta in reversed(chain):
+            set_of_tuples.difference_update(delta.deleted)
+            set_of_tuples.update(delta.added)
+        return set_of_tuples
+
+    @set_of_tuples.setter
+    def set_of_tuples(self, set_of_tuples: set[RelationTuple]) -> None:
+        raise IncompatibleOperandError(
+            "Error: the tuples of the read-only RelationDelta cannot be set"
+        )
+
+    def add_tuple(self, r: RelationTuple) -> None:
+        raise IncompatibleOperandError(
+            f"Error: {r} cannot be added to the read-only RelationDelta"
+        )
+
+    def extend(self, right_operand: Relation) -> set[RelationTuple]:
+        raise IncompatibleOperandError(
+            "Error: the read-only RelationDelta cannot be extended"
+        )
+
+    def remove(self, tuples: set[RelationTuple]) -> set[RelationTuple]:
+        raise IncompatibleOperandError(
+            "Error: tuples cannot be removed from the read-only RelationDelta"
+        )
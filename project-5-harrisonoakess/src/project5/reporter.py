@@ -4,6 +4,7 @@ from functools import reduce
 
 from project5.datalogprogram import Predicate, Rule
 from project5.relation import Relation, RelationTuple
+from project5.symboltable import SymbolTable
 
 
 def _graph_to_str(graph: dict[int, list[int]]) -> str:
@@ -29,6 +30,15 @@ def _is_only_strings(predicate: Predicate) -> bool:
     )
 
 
+def _decode_sorted(
+    tuples: set[RelationTuple], symbols: SymbolTable | None
+) -> list[RelationTuple]:
+    """The tuples decoded with the symbol table, if any, and sorted as strings."""
+    if symbols is None:
+        return sorted(tuples)
+    return sorted(tuple(symbols.decode(int(i)) for i in r) for r in tuples)
+
+
 def _tuple_to_str(header: list[str], r: RelationTuple) -> str:
     """The string representation of a tuple given its associated header."""
     assert len(header) == len(r)
@@ -59,19 +69,40 @@ def project_5_report(
     dependency_graph: dict[int, list[int]],
     rule_evals: list[tuple[Relation, Rule, Relation]],
     query_evals: list[tuple[Predicate, Relation]],
+    symbols: SymbolTable | None = None,
 ) -> str:
     """The string representation for the project 5 report
 
     Assumes (and enforces) at least rule and at least one entry in each list.
+    The `symbols` table decodes the tuples when the interpreter interned them.
     """
     dependency_graph_str = _graph_to_str(dependency_graph)
-    rule_reports = "\n".join([rule_report(i, j, k) for i, j, k in rule_evals])
-    query_reports = "\n".join([query_report(i, j) for i, j in query_evals])
+    rule_reports = "\n".join([rule_report(i, j, k, symbols) for i, j, k in rule_evals])
+    query_reports = "\n".join([query_report(i, j, symbols) for i, j in query_evals])
 
     return f"Dependency Graph\n{dependency_graph_str}\n\nRule Evaluation\n{rule_reports}\n\nQuery Evaluation\n{query_reports}"
 
 
-def query_report(query: Predicate, answer: Relation) -> str:
+def passes_report(passes: list[tuple[list[int], int]]) -> str:
+    """The string representation of the number of passes for each SCC.
+
+    Here the format is one line per SCC with the number of passes through
+    its rules followed by the rules.
+
+    3 passes: R0,R1
+    1 pass: R2
+    """
+    entries = [
+        f"{count} {'pass' if count == 1 else 'passes'}: "
+        + ",".join([f"R{i}" for i in scc])
+        for scc, count in passes
+    ]
+    return "\n".join(entries)
+
+
+def query_report(
+    query: Predicate, answer: Relation, symbols: SymbolTable | None = None
+) -> str:
     """The string representation of a query report.
 
     Here the format is the query followed by yes/no with how
@@ -83,7 +114,7 @@ def query_report(query: Predicate, answer: Relation) -> str:
       A='a', B='c'
       A='b', B='c'
     """
-    tuples: list[RelationTuple] = sorted(answer.set_of_tuples)
+    tuples: list[RelationTuple] = _decode_sorted(answer.set_of_tuples, symbols)
     if len(tuples) == 0:
         return f"{query}? No"
 
@@ -95,7 +126,9 @@ def query_report(query: Predicate, answer: Relation) -> str:
     return f"{query}? Yes({len(tuples)})\n  {entries_str}"
 
 
-def rule_report(before: Relation, rule: Rule, after: Relation) -> str:
+def rule_report(
+    before: Relation, rule: Rule, after: Relation, symbols: SymbolTable | None = None
+) -> str:
     """The string representation of a rule evaluation report
 
     Here the format is the rule followed by the printing of the tuples
@@ -107,8 +140,8 @@ def rule_report(before: Relation, rule: Rule, after: Relation) -> str:
       e='4', f='3'
     """
     assert before.header == after.header
-    tuples: list[RelationTuple] = sorted(
-        after.set_of_tuples.difference(before.set_of_tuples)
+    tuples: list[RelationTuple] = _decode_sorted(
+        after.difference(before).set_of_tuples, symbols
     )
 
     if len(tuples) == 0:
@@ -0,0 +1,246 @@
+"""Query server that answers Datalog queries from a materialised database.
+
+The program is lexed, parsed, and evaluated to its fix-point once, and the relations
+in `Interpreter.table_list` are then kept in memory to answer queries sent over a Unix
+domain socket or a localhost TCP port. Each line a client sends holds one or more
+queries, such as `f(A,'b')? g(C,D)?`, parsed with `lexer` and the `query` rule of the
+parser, and the server writes back the report for each query as in the _Query
+Evaluation_ section of `project_5_report`, followed by an empty line. A line that does
+not parse, has a query that does not match a scheme, or fails while it is answered, is
+answered with a `Failure!` report in place of the query reports.
+
+A line that starts with `+` or `-` followed by facts, such as `+ f('1','2').`, inserts
+or deletes the facts and updates the relations incrementally. The queries are answered
+on the snapshots of a `SnapshotStore`, so they are answered during an update from the
+relations as they were before it, and see all of its changes once it is published.
+The update is answered with `Published version N` once it is.
+
+Example session with `project5 serve prog.txt --socket /tmp/project5.sock`:
+
+```
+$ printf "g('4',B)?\\n+ f('4','1').\\nr(E,'3')? r('4',F)?\\n" | nc -U /tmp/project5.sock
+g('4',B)? Yes(1)
+  B='5'
+
+Published version 1
+
+r(E,'3')? Yes(1)
+  E='4'
+r('4',F)? Yes(2)
+  F='1'
+  F='3'
+
+```
+"""
+
+import asyncio
+import os
+
+from project5.datalogprogram import Predicate
+from project5.interpreter import Backend, Interpreter
+from project5.lexer import lexer
+from project5.parser import (
+    TokenStream,
+    UnexpectedTokenException,
+    fact,
+    factlist,
+    parse,
+    query,
+    querylist,
+)
+from project5.reporter import query_report
+from project5.snapshot import SnapshotStore
+
+
+def parse_queries(line: str) -> list[Predicate]:
+    """Parse a line with one or more queries and nothing else.
+
+    Examples:
+        >>> [str(i) for i in parse_queries("f(A,'b')? g(C,D)?")]
+        ["f(A,'b')", 'g(C,D)']
+
+    Raises:
+        error (UnexpectedTokenException): Error if the line is not a list of queries.
+    """
+    token = TokenStream(lexer(line))
+    queries = [query(token)] + querylist(token)
+    token.match("EOF")
+    return queries
+
+
+def parse_facts(line: str) -> list[Predicate]:
+    """Parse a line with one or more facts and nothing else.
+
+    Raises:
+        error (UnexpectedTokenException): Error if the line is not a list of facts.
+    """
+    token = TokenStream(lexer(line))
+    facts = [fact(token)] + factlist(token)
+    token.match("EOF")
+    return facts
+
+
+def load_interpreter(
+    input_string: str, backend: Backend = "set", intern: bool = True
+) -> Interpreter:
+    """Parse and evaluate the Datalog program in `input_string` to its fix-point.
+
+    Raises:
+        error (UnexpectedTokenException): Error if the program does not parse.
+    """
+    interpreter = Interpreter(parse(lexer(input_string)), backend, intern)
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+    for _ in interpreter.eval_rules_optimized():
+        pass
+    return interpreter
+
+
+class QueryServer:
+    """Server that answers queries from the relations of one evaluated program.
+
+    Each line of queries is answered on the snapshot it pins from `store`, so the
+    reports for a line are consistent with each other even if an update is published
+    while they are made. Updates run one at a time in a worker thread, holding a lock
+    that only the updates take, and the queries are answered in the event loop
+    meanwhile.
+
+    Attributes:
+        store (SnapshotStore): The published snapshots of the relations.
+        updating (asyncio.Lock): The lock that serializes the updates.
+        answered (int): The number of queries answered.
+
+    Examples:
+        >>> server = QueryServer.load(
+        ...     "Schemes: f(a,b) Facts: f('1','2'). Rules: Queries: f(A,B)?"
+        ... )
+        >>> print(server.answer("f(A,'2')? f('2',B)?"))
+        f(A,'2')? Yes(1)
+          A='1'
+        f('2',B)? No
+        >>> print(server.answer("g(A)?"))
+        Failure!
+          g(A)? does not match a scheme
+        >>> print(asyncio.run(server.update("+ f('2','3').")))
+        Published version 1
+        >>> print(server.answer("f('2',B)?"))
+        f('2',B)? Yes(1)
+          B='3'
+    """
+
+    __slots__ = ["store", "updating", "answered"]
+
+    def __init__(self, interpreter: Interpreter) -> None:
+        self.store = SnapshotStore(interpreter)
+        self.updating = asyncio.Lock()
+        self.answered = 0
+
+    @staticmethod
+    def load(
+        input_string: str, backend: Backend = "set", intern: bool = True
+    ) -> "QueryServer":
+        """Parse and evaluate the Datalog program in `input_string` to serve it.
+
+        Raises:
+            error (UnexpectedTokenException): Error if the program does not parse.
+        """
+        return QueryServer(load_interpreter(input_string, backend, intern))
+
+    def mismatch(self, predicates: list[Predicate], suffix: str) -> str | None:
+        """A failure report for the first predicate that does not match a scheme."""
+        table_list = self.store.current.table_list
+        for i in predicates:
+            if i.name not in table_list or len(table_list[i.name].header) != len(
+                i.parameters
+            ):
+                return f"Failure!\n  {i}{suffix} does not match a scheme"
+        return None
+
+    def answer(self, line: str) -> str:
+        """The report for the queries in `line`, or a failure report."""
+        try:
+            queries = parse_queries(line)
+        except UnexpectedTokenException as e:
+            return "Failure!\n  " + str(e.token)
+        failure = self.mismatch(queries, "?")
+        if failure is not None:
+            return failure
+        reports = []
+        with self.store.pinned() as snapshot:
+            for i in queries:
+                answer = self.store.answer_query(snapshot, i)
+                symbols = self.store.interpreter.symbols
+                reports.append(query_report(i, answer, symbols))
+        self.answered += len(queries)
+        return "\n".join(reports)
+
+    async def update(self, line: str) -> str:
+        """Insert the facts in a `+` line or delete those in a `-` line and publish."""
+        try:
+            facts = parse_facts(line[1:])
+        except UnexpectedTokenException as e:
+            return "Failure!\n  " + str(e.token)
+        failure = self.mismatch(facts, ".")
+        if failure is not None:
+            return failure
+        async with self.updating:
+            if line.startswith("+"):
+                snapshot = await asyncio.to_thread(self.store.update, insert=facts)
+            else:
+                snapshot = await asyncio.to_thread(self.store.update, delete=facts)
+            self.store.publish(snapshot)
+        return f"Published version {snapshot.version}"
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer each line from a client until it closes the connection.
+
+        A line that is not valid UTF-8 is decoded with replacement characters, which do
+        not lex, and an error while answering or updating is reported as a `Failure!`
+        for the line, so the connection stays open for the lines after it.
+        """
+        try:
+            while line := await reader.readline():
+                text = line.decode(errors="replace").strip()
+                if len(text) == 0:
+                    continue
+                try:
+                    if text[0] in "+-":
+                        answer = await self.update(text)
+                    else:
+                        answer = self.answer(text)
+                except Exception as e:
+                    answer = f"Failure!\n  {e}"
+                writer.write((answer + "\n\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(
+        self, socket_path: str | None = None, port: int | None = None
+    ) -> asyncio.Server:
+        """Start listening on the Unix socket `socket_path` or on localhost `port`.
+
+        Raises:
+            error (ValueError): Error if not exactly one of the two is given.
+        """
+        if (socket_path is None) == (port is None):
+            raise ValueError("Error: give one of socket_path or port in start")
+        if socket_path is not None:
+            return await asyncio.start_unix_server(self.handle, path=socket_path)
+        return await asyncio.start_server(self.handle, host="127.0.0.1", port=port)
+
+    async def serve(
+        self, socket_path: str | None = None, port: int | None = None
+    ) -> None:
+        """Answer clients on the socket or port from `start` until cancelled."""
+        server = await self.start(socket_path, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if socket_path is not None and os.path.exists(socket_path):
+                os.unlink(socket_path)
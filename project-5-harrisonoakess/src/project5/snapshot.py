@@ -0,0 +1,220 @@
+"""Versioned relations with snapshot isolation for queries during updates.
+
+A long-lived `Interpreter` changes its relations in place when facts are inserted or
+deleted, so a query that reads them while an update runs could see some of its tuples
+and not others. The `SnapshotStore` keeps the relations in versions instead:
+
+  * A `Snapshot` is one published version of `table_list`. Its relations are never
+    changed after it is published, so any number of readers can query it at once.
+  * A reader _pins_ the current snapshot, answers its queries on it, and releases it.
+    A writer that publishes a new version meanwhile does not change what the reader
+    sees.
+  * A writer updates the relations of the interpreter, which no reader touches, and
+    then publishes each relation that changed as a `RelationDelta` on the relation in
+    the current snapshot, holding only the tuples added and taken out. The relations
+    that did not change are shared with the snapshot before. Once the deltas over a
+    chain add up to half the relation, the relation is copied in full instead, so the
+    chains stay short and hold at most half again the memory of their root.
+  * A query on a delta is answered from the cached selection for its parent with the
+    delta applied, so a small update does not make the next queries scan the relation.
+  * Publishing swaps the current snapshot. An older snapshot is reclaimed, dropping
+    its relations and their cached selections, once no reader has it pinned and no
+    live snapshot has a delta on them.
+
+Readers never wait for a writer and never take a lock. Writers must be serialized by
+the caller, as the `project5.server` does with one lock held only by writers.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator
+
+from project5.datalogprogram import Predicate
+from project5.interpreter import Interpreter
+from project5.querycache import QueryCache, query_pattern
+from project5.relation import Relation, RelationDelta, RelationTuple, Value
+
+
+def _chain(relation: Relation) -> Iterator[Relation]:
+    """The relation and, for a `RelationDelta`, each relation it is a delta on."""
+    yield relation
+    while isinstance(relation, RelationDelta):
+        relation = relation.parent
+        yield relation
+
+
+class Snapshot:
+    """One published version of the relations.
+
+    Attributes:
+        version (int): The number of the version, counting publishes from 0.
+        table_list (dict[str, Relation]): The relation for each scheme by name. The
+            relations are not changed once the snapshot is published.
+        pins (int): The number of readers that have the snapshot pinned.
+    """
+
+    __slots__ = ["version", "table_list", "pins"]
+
+    def __init__(self, version: int, table_list: dict[str, Relation]) -> None:
+        self.version = version
+        self.table_list = table_list
+        self.pins = 0
+
+    def __repr__(self) -> str:
+        return f"Snapshot(version={self.version!r}, pins={self.pins!r})"
+
+
+class SnapshotStore:
+    """The published snapshots of the relations of an interpreter.
+
+    Attributes:
+        interpreter (Interpreter): The interpreter with the relations at the fix-point.
+            Only the writer reads or changes its relations.
+        current (Snapshot): The latest published snapshot, which new readers pin.
+        live (dict[int, Snapshot]): The current snapshot and the older snapshots that
+            are still pinned, by version.
+        query_cache (QueryCache): The selections that answered queries on the
+            snapshots. Only readers use it.
+        reclaimed (int): The number of snapshots reclaimed.
+
+    Examples:
+        >>> from project5.server import load_interpreter, parse_facts, parse_queries
+        >>> store = SnapshotStore(
+        ...     load_interpreter("Schemes: f(a,b) Facts: f('1','2'). Rules: Queries:")
+        ... )
+        >>> query = parse_queries("f(A,B)?")[0]
+        >>> with store.pinned() as old:
+        ...     store.publish(store.update(delete=parse_facts("f('1','2').")))
+        ...     len(store.answer_query(old, query)), old.version
+        (1, 0)
+        >>> len(store.answer_query(store.current, query)), list(store.live)
+        (0, [1])
+    """
+
+    __slots__ = ["interpreter", "current", "live", "query_cache", "reclaimed"]
+
+    def __init__(self, interpreter: Interpreter) -> None:
+        self.interpreter = interpreter
+        self.current = Snapshot(
+            0, {i: self.copy(j) for i, j in interpreter.table_list.items()}
+        )
+        self.live: dict[int, Snapshot] = {0: self.current}
+        self.query_cache = QueryCache()
+        self.reclaimed = 0
+
+    def copy(self, relation: Relation) -> Relation:
+        """A copy of `relation` to publish, in the backend of the interpreter."""
+        return self.interpreter.as_backend(
+            Relation(relation.header, set(relation.set_of_tuples))
+        )
+
+    def pin(self) -> Snapshot:
+        """Pin the current snapshot for a reader, which must `release` it."""
+        snapshot = self.current
+        snapshot.pins += 1
+        return snapshot
+
+    def release(self, snapshot: Snapshot) -> None:
+        """Release a pinned snapshot, and reclaim it if it is unused and not current."""
+        snapshot.pins -= 1
+        if snapshot.pins == 0 and snapshot is not self.current:
+            self.reclaim(snapshot)
+
+    @contextmanager
+    def pinned(self) -> Iterator[Snapshot]:
+        """Pin the current snapshot for the body of a `with` statement."""
+        snapshot = self.pin()
+        try:
+            yield snapshot
+        finally:
+            self.release(snapshot)
+
+    def update(
+        self,
+        insert: list[Predicate] | None = None,
+        delete: list[Predicate] | None = None,
+    ) -> Snapshot:
+        """Delete and then insert facts, and build the next snapshot to `publish`.
+
+        The relations of the interpreter are updated with `Interpreter.delete_facts`
+        and `Interpreter.insert_facts`. The next snapshot has a `RelationDelta`, or a
+        copy once a chain of deltas changes half the relation, for each relation that changed and
+        shares the other relations with the current snapshot. Only one writer may call
+        `update` and `publish` at a time, but readers may pin and query the current
+        snapshot meanwhile, from another thread too.
+        """
+        removed = self.interpreter.delete_facts(delete) if delete else {}
+        added = self.interpreter.insert_facts(insert) if insert else {}
+        table_list = dict(self.current.table_list)
+        empty: set[RelationTuple] = set()
+        for name in removed.keys() | added.keys():
+            new_tuples = added.get(name, empty).difference(removed.get(name, empty))
+            gone = removed.get(name, empty).difference(added.get(name, empty))
+            if len(new_tuples) == 0 and len(gone) == 0:
+                continue
+            delta = RelationDelta(table_list[name], new_tuples, gone)
+            if 2 * delta.changes < len(delta):
+                table_list[name] = delta
+            else:
+                table_list[name] = self.copy(self.interpreter.table_list[name])
+        return Snapshot(self.current.version + 1, table_list)
+
+    def publish(self, snapshot: Snapshot) -> None:
+        """Make `snapshot` from `update` current, reclaiming the old one if unused."""
+        old = self.current
+        self.current = snapshot
+        self.live[snapshot.version] = snapshot
+        if old.pins == 0:
+            self.reclaim(old)
+
+    def reclaim(self, snapshot: Snapshot) -> None:
+        """Drop `snapshot` and the cached selections of the relations only it has.
+
+        The relations a live snapshot has a delta on are kept with their selections,
+        which answer queries on the deltas.
+        """
+        del self.live[snapshot.version]
+        self.reclaimed += 1
+        shared = set(
+            id(k)
+            for i in self.live.values()
+            for j in i.table_list.values()
+            for k in _chain(j)
+        )
+        for relation in snapshot.table_list.values():
+            for i in _chain(relation):
+                if id(i) not in shared:
+                    self.query_cache.discard(i)
+
+    def answer_query(self, snapshot: Snapshot, query: Predicate) -> Relation:
+        """Return the answer to `query` on a pinned `snapshot`.
+
+        The constants of the query are only looked up in the symbol table, which the
+        writer may be adding to: a constant that is not there is in no tuple, so the
+        answer is empty. The selection is projected and renamed here in place of
+        `Interpreter.single_query`, which would encode the constants again and so add
+        to the symbol table from the reader.
+        """
+        interpreter = self.interpreter
+        relation = snapshot.table_list[query.name]
+        constants: list[Value] = []
+        for i in query.parameters:
+            if not i.is_string():
+                continue
+            if interpreter.symbols is None:
+                constants.append(i.value)
+                continue
+            id = interpreter.symbols.lookup(i.value)
+            if id is None:
+                header = [j.value for j in query.parameters if j.is_id()]
+                return Relation(list(dict.fromkeys(header)), set())
+            constants.append(id)
+        relation = self.query_cache.select(
+            query.name, relation, query_pattern(query, constants)
+        )
+        columns: list[str] = []
+        variables: list[str] = []
+        for attribute, i in zip(relation.header, query.parameters):
+            if i.is_id() and i.value not in variables:
+                columns.append(attribute)
+                variables.append(i.value)
+        return relation.project(columns).rename(variables)
@@ -0,0 +1,55 @@
+"""Symbol table for dictionary-encoding the values in relations."""
+
+from project5.relation import Value
+
+
+class SymbolTable:
+    """Symbol table class for interning values as dense integers.
+
+    Every distinct value is given the next unused integer the first time it is
+    encoded, so the ids are dense and start at zero. Two values are equal if and
+    only if their ids are equal, which is what lets relations compare, hash, and
+    join on the ids in place of the values.
+
+    Attributes:
+        ids (dict[Value, int]): The id for each value in the table.
+        values (list[Value]): The value for each id in the table.
+
+    Examples:
+        >>> symbols = SymbolTable()
+        >>> symbols.encode("'a'"), symbols.encode("'b'"), symbols.encode("'a'")
+        (0, 1, 0)
+        >>> symbols.decode(1)
+        "'b'"
+        >>> symbols.lookup("'c'") is None
+        True
+    """
+
+    __slots__ = ["ids", "values"]
+
+    def __init__(self) -> None:
+        self.ids: dict[Value, int] = {}
+        self.values: list[Value] = []
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self) -> str:
+        return f"SymbolTable(values={self.values!r})"
+
+    def encode(self, value: Value) -> int:
+        """Return the id for `value`, adding it to the table if it is new."""
+        id = self.ids.get(value)
+        if id is None:
+            id = len(self.values)
+            self.ids[value] = id
+            self.values.append(value)
+        return id
+
+    def lookup(self, value: Value) -> int | None:
+        """Return the id for `value` or `None` if it is not in the table."""
+        return self.ids.get(value)
+
+    def decode(self, id: int) -> Value:
+        """Return the value for `id`."""
+        return self.values[id]
@@ -0,0 +1,261 @@
+"""Tabled top-down query evaluation for Datalog programs."""
+
+from typing import Iterator
+
+from project5.datalogprogram import DatalogProgram, Predicate, Rule
+from project5.interpreter import Backend, Interpreter
+from project5.relation import Relation, RelationTuple, Value
+
+Call = tuple[str, tuple[Value | None, ...]]
+"""
+A subgoal: the name of a predicate and, for each of its positions, the value the
+call binds or `None` if the position is free.
+"""
+
+Binding = dict[str, Value]
+
+
+class TabledInterpreter(Interpreter):
+    """Interpreter that answers each query top-down with tabled subgoals.
+
+    The bottom-up `Interpreter` derives every fact of every rule before it answers a
+    query. This interpreter starts from the query instead. A query is a _call_ that
+    binds the positions with constants, and the rules for the predicate are evaluated
+    for just that call: each predicate in a rule body is a new call with the
+    positions bound by the head or by the earlier predicates in the body. The answers
+    for each call are kept in a table, so a call that is made again, as in a
+    recursive rule, reads the table in place of being evaluated again. The tables are
+    evaluated again and again until none of them grows, which is when the answers are
+    complete and the query is answered from its table.
+
+    Only the facts reachable from the constants in the query are derived, so a query
+    with selective constants is answered without materialising the relations. The
+    rules are never evaluated bottom-up and the relations for the rule heads only hold
+    their facts. Completed tables are kept across the queries.
+
+    Attributes:
+        tables (dict[Call, Relation]): The answer table for each call. Each holds the
+            tuples of the predicate, with its scheme header, that match the call.
+        complete (set[Call]): The calls whose tables hold all their answers.
+        rules_for_head (dict[str, list[Rule]]): The rules for each predicate by name.
+        fact_indexes (dict[tuple[str, tuple[int, ...]], dict[RelationTuple,
+            list[RelationTuple]]]): The tuples of each relation keyed by the values at
+            the positions, built the first time a call binds those positions.
+        seen (dict[tuple[Call, int], dict[Call, int]]): The size of each table read
+            the last time a rule, by its index, was evaluated for a call.
+    """
+
+    __slots__ = ["tables", "complete", "rules_for_head", "fact_indexes", "seen"]
+
+    def __init__(
+        self, datalog: DatalogProgram, backend: Backend = "set", intern: bool = False
+    ) -> None:
+        super().__init__(datalog, backend, intern)
+        self.tables: dict[Call, Relation] = {}
+        self.complete: set[Call] = set()
+        self.rules_for_head: dict[str, list[Rule]] = {}
+        for rule in datalog.rules:
+            self.rules_for_head.setdefault(rule.head.name, []).append(rule)
+        self.fact_indexes: dict[
+            tuple[str, tuple[int, ...]], dict[RelationTuple, list[RelationTuple]]
+        ] = {}
+        self.seen: dict[tuple[Call, int], dict[Call, int]] = {}
+
+    def eval_facts(self) -> None:
+        """Evaluate the facts and forget the tables built on the earlier facts."""
+        super().eval_facts()
+        self.tables.clear()
+        self.complete.clear()
+        self.fact_indexes.clear()
+        self.seen.clear()
+
+    def eval_queries(self, jobs: int = 1) -> Iterator[tuple[Predicate, Relation]]:
+        """Yield each query and resulting relation from tabled evaluation.
+
+        The rules are evaluated for the call of each query, so `eval_rules` need not be
+        called first. The queries are always answered in this process.
+
+        Args:
+            jobs (int): Ignored, the tables are built in this process.
+
+        Returns:
+            out (tuple[Predicate, Relation]): An iterator to a tuple where the
+            first element is the predicate for the query and the second element
+            is the relation for the answer.
+        """
+        for query in self.datalog.queries:
+            relation = self.table_list[query.name]
+            if query.name in self.rules_for_head:
+                call = (
+                    query.name,
+                    tuple(
+                        self.encode_value(i.value) if i.is_string() else None
+                        for i in query.parameters
+                    ),
+                )
+                self.solve(call)
+                relation = self.tables[call]
+            yield (query, self.single_query(query, relation))
+
+    def solve(self, call: Call) -> None:
+        """Evaluate the tables until the answers for `call` are complete.
+
+        Every table made while evaluating `call` is evaluated again in each round, and
+        the rounds stop when a round adds no answers and makes no new calls. All of
+        those tables are then complete.
+        """
+        if call in self.complete:
+            return
+        self.table(call)
+        changed = True
+        while changed:
+            changed = False
+            for i in [j for j in self.tables if j not in self.complete]:
+                count = len(self.tables)
+                if self.expand(i) or count != len(self.tables):
+                    changed = True
+        self.complete.update(self.tables)
+
+    def table(self, call: Call) -> Relation:
+        """The answer table for `call`, made with the matching facts if it is new."""
+        answers = self.tables.get(call)
+        if answers is None:
+            name, pattern = call
+            answers = Relation(self.table_list[name].header, set())
+            answers.extend(Relation(answers.header, set(self.facts(name, pattern))))
+            self.tables[call] = answers
+        return answers
+
+    def facts(
+        self, name: str, pattern: tuple[Value | None, ...]
+    ) -> list[RelationTuple]:
+        """The tuples in the relation for `name` with the values bound in `pattern`."""
+        positions = tuple(i for i, j in enumerate(pattern) if j is not None)
+        index = self.fact_indexes.get((name, positions))
+        if index is None:
+            index = {}
+            for r in self.table_list[name].set_of_tuples:
+                index.setdefault(tuple(r[i] for i in positions), []).append(r)
+            self.fact_indexes[(name, positions)] = index
+        return index.get(tuple(i for i in pattern if i is not None), [])
+
+    def lookup(
+        self,
+        name: str,
+        pattern: tuple[Value | None, ...],
+        part: str,
+        seen: dict[Call, int],
+        read: dict[Call, int],
+    ) -> list[RelationTuple]:
+        """The answers known for the call, or the old or new part of its table.
+
+        Args:
+            name (str): The name of the predicate.
+            pattern (tuple[Value | None, ...]): The values bound by the call.
+            part (str): `"all"` for every answer, `"old"` for the answers in the table
+                when it was read in `seen`, or `"new"` for the answers added since.
+            seen (dict[Call, int]): The size of each table when it was last read.
+            read (dict[Call, int]): Updated with the size of the table read now.
+        """
+        if name in self.rules_for_head:
+            call = (name, pattern)
+            history = self.table(call).history
+            read[call] = len(history)
+            if part == "all":
+                return history
+            if part == "old":
+                return history[: seen.get(call, 0)]
+            return history[seen.get(call, 0) :]
+        if part == "new" or name not in self.table_list:
+            return []
+        return self.facts(name, pattern)
+
+    def expand(self, call: Call) -> bool:
+        """Evaluate the rules for `call` once and return True if its table grew.
+
+        The first time, each rule is evaluated on all the answers in the tables. After
+        that the evaluation is semi-naive: the rule is evaluated once for each predicate
+        in the body with a table, on the answers added to that table since the rule was
+        last evaluated for `call`, the old answers of the tables before it, and all the
+        answers of the tables after it. Every new answer for `call` uses at least one
+        answer added since, so the rest were found the time before.
+        """
+        name, pattern = call
+        answers = self.tables[call]
+        derived: set[RelationTuple] = set()
+        for index, rule in enumerate(self.rules_for_head.get(name, [])):
+            seen = self.seen.get((call, index))
+            read: dict[Call, int] = {}
+            if seen is None:
+                parts = [["all"] * len(rule.predicates)]
+            else:
+                parts = [
+                    ["old"] * k + ["new"] + ["all"] * (len(rule.predicates) - k - 1)
+                    for k, i in enumerate(rule.predicates)
+                    if i.name in self.rules_for_head
+                ]
+            for part in parts:
+                derived.update(self.derive(rule, pattern, part, seen or {}, read))
+            self.seen[(call, index)] = read
+        return len(answers.extend(Relation(answers.header, derived))) > 0
+
+    def derive(
+        self,
+        rule: Rule,
+        pattern: tuple[Value | None, ...],
+        part: list[str],
+        seen: dict[Call, int],
+        read: dict[Call, int],
+    ) -> set[RelationTuple]:
+        """The head tuples of `rule` for the call reading each predicate's `part`."""
+        head = self.bind(rule.head, pattern, {})
+        bindings = [] if head is None else [head]
+        for predicate, predicate_part in zip(rule.predicates, part):
+            extended: dict[tuple[Value, ...], Binding] = {}
+            for binding in bindings:
+                sub_pattern = tuple(
+                    (
+                        self.encode_value(i.value)
+                        if i.is_string()
+                        else binding.get(i.value)
+                    )
+                    for i in predicate.parameters
+                )
+                for r in self.lookup(
+                    predicate.name, sub_pattern, predicate_part, seen, read
+                ):
+                    new_binding = self.bind(predicate, r, binding)
+                    if new_binding is not None:
+                        extended[tuple(new_binding.values())] = new_binding
+            bindings = list(extended.values())
+            if not bindings:
+                return set()
+        return set(
+            tuple(
+                self.encode_value(i.value) if i.is_string() else binding[i.value]
+                for i in rule.head.parameters
+            )
+            for binding in bindings
+        )
+
+    def bind(
+        self,
+        predicate: Predicate,
+        values: tuple[Value | None, ...],
+        binding: Binding,
+    ) -> Binding | None:
+        """Extend `binding` by matching the parameters of `predicate` to `values`.
+
+        A `None` value matches anything and binds nothing. Returns `None` if a
+        constant or an already bound variable does not match its value.
+        """
+        new_binding = dict(binding)
+        for parameter, value in zip(predicate.parameters, values):
+            if value is None:
+                continue
+            if parameter.is_string():
+                if self.encode_value(parameter.value) != value:
+                    return None
+            elif new_binding.setdefault(parameter.value, value) != value:
+                return None
+        return new_binding
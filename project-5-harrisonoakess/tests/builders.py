@@ -0,0 +1,52 @@
+# type: ignore
+"""Builders shared by the tests of recursive Datalog programs."""
+
+from project5.datalogprogram import DatalogProgram, Parameter, Predicate, Rule
+from project5.interpreter import Interpreter
+
+
+def binary(name, x, y, parameter_type="ID"):
+    """The predicate `name(x,y)` with both parameters of `parameter_type`."""
+    return Predicate(name, [Parameter(x, parameter_type), Parameter(y, parameter_type)])
+
+
+def edge(x, y):
+    """The fact `e('x','y')`."""
+    return binary("e", f"'{x}'", f"'{y}'", "STRING")
+
+
+_SHAPES = {
+    "right": [("e", "X", "Y"), ("p", "Y", "Z")],
+    "left": [("p", "X", "Y"), ("e", "Y", "Z")],
+    "double": [("p", "X", "Y"), ("p", "Y", "Z")],
+}
+
+
+def closure_rule(shape):
+    """The right-linear, left-linear, or doubly recursive rule `p(X,Z) :- ...`."""
+    return Rule(binary("p", "X", "Z"), [binary(*i) for i in _SHAPES[shape]])
+
+
+def reach(edges, shapes=("left",), queries=None):
+    """Reachability `p` over the graph with `edges` in `e`.
+
+    The rule `p(X,Y) :- e(X,Y).` is followed by the `closure_rule` for each of
+    `shapes`.
+    """
+    return DatalogProgram(
+        schemes=[binary("e", "A", "B"), binary("p", "A", "B")],
+        facts=[edge(x, y) for x, y in edges],
+        rules=[Rule(binary("p", "X", "Y"), [binary("e", "X", "Y")])]
+        + [closure_rule(i) for i in shapes],
+        queries=[] if queries is None else queries,
+    )
+
+
+def fixpoint(datalog, intern=False):
+    """The interpreter for `datalog` with its rules evaluated to the fix-point."""
+    interpreter = Interpreter(datalog, intern=intern)
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+    for _ in interpreter.eval_rules_optimized():
+        pass
+    return interpreter
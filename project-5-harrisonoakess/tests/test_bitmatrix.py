@@ -0,0 +1,48 @@
+# type: ignore
+"""Tests for the bit-matrix representation of binary relations."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from project5.bitmatrix import BitMatrix  # noqa: E402
+from project5.relation import IncompatibleOperandError  # noqa: E402
+
+
+def _pairs(matrix):
+    return set(zip(*[i.tolist() for i in matrix.pairs()]))
+
+
+def test_given_pairs_when_compose_then_join_and_project():
+    # given
+    size = 130
+    matrix = BitMatrix.from_pairs(
+        size, np.array([1, 1, 64, 129]), np.array([2, 129, 0, 64])
+    )
+
+    # when
+    rows, bits = matrix.compose(np.array([7, 7, 5]), np.array([1, 129, 64]))
+    composed = BitMatrix(size)
+    composed.bits[rows] = bits
+
+    # then
+    assert 4 == len(matrix)
+    assert set([(1, 2), (1, 129), (64, 0), (129, 64)]) == _pairs(matrix)
+    assert [5, 7] == rows.tolist()
+    assert set([(7, 2), (7, 129), (7, 64), (5, 0)]) == _pairs(composed)
+
+
+def test_given_matrices_when_union_and_new_pairs_then_bitwise():
+    # given
+    left = BitMatrix.from_pairs(70, np.array([0, 69]), np.array([69, 0]))
+    right = BitMatrix.from_pairs(70, np.array([0, 3]), np.array([1, 3]))
+
+    # when
+    answer = left.union(right)
+    rows, cols = left.new_pairs(np.array([0, 3]), right.bits[[0, 3]])
+
+    # then
+    assert set([(0, 69), (69, 0), (0, 1), (3, 3)]) == _pairs(answer)
+    assert set([(0, 1), (3, 3)]) == set(zip(rows.tolist(), cols.tolist()))
+    with pytest.raises(IncompatibleOperandError):
+        left.union(BitMatrix(3))
@@ -0,0 +1,71 @@
+# type: ignore
+"""Tests for the transitive-closure evaluation of SCCs."""
+
+import pytest
+
+import project5.closure
+from project5.closure import closure_shape, closure_shapes
+from project5.datalogprogram import Rule
+from project5.interpreter import Interpreter
+from tests.builders import binary, closure_rule, reach
+
+
+def _closure(shapes):
+    """A closure of a graph with a cycle and a long tail using the recursive rules."""
+    edges = [(0, 1), (1, 2), (2, 0), (2, 3)] + [(i, i + 1) for i in range(3, 12)]
+    return reach(edges, shapes)
+
+
+def _report(datalog):
+    interpreter = Interpreter(datalog, intern=True)
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+    answer = [
+        (str(rule), after.difference(before).set_of_tuples)
+        for before, rule, after in interpreter.eval_rules_optimized()
+    ]
+    return answer, interpreter.table_list
+
+
+def test_given_rules_when_closure_shape_then_shape_and_edge():
+    # given
+    other = Rule(binary("p", "X", "Z"), [binary("e", "X", "Y"), binary("p", "Z", "Y")])
+    rules = [closure_rule(i) for i in ("right", "left", "double")] + [other]
+
+    # when
+    answer = [closure_shape(i) for i in rules]
+
+    # then
+    assert [("right", "e"), ("left", "e"), ("double", "p"), None] == answer
+
+
+@pytest.mark.parametrize("limit", [0, 16384])
+@pytest.mark.parametrize(
+    "shapes",
+    [
+        ["right"],
+        ["left"],
+        ["double"],
+        ["double", "right"],
+        ["left", "right", "double"],
+    ],
+)
+def test_given_closure_scc_when_eval_rules_then_same_passes_as_generic(
+    shapes, limit, monkeypatch
+):
+    # given
+    bitmatrix = pytest.importorskip("project5.bitmatrix")
+    monkeypatch.setattr(bitmatrix, "BITMATRIX_DOMAIN_LIMIT", limit)
+    datalog = _closure(shapes)
+    interpreter = Interpreter(datalog)
+    interpreter.eval_schemes()
+    assert closure_shapes(interpreter, interpreter.get_scc()[-1]) is not None
+
+    # when
+    answer = _report(datalog)
+    monkeypatch.setattr(project5.closure, "closure_shapes", lambda i, j: None)
+    expect = _report(datalog)
+
+    # then
+    assert expect == answer
+    assert 3 * 13 + 9 * 10 // 2 == len(answer[1]["p"])
@@ -0,0 +1,212 @@
+# type: ignore
+"""Tests for the columnar relation backend."""
+
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from project5 import columnar  # noqa: E402
+from project5.columnar import ColumnarRelation  # noqa: E402
+from project5.interpreter import Interpreter  # noqa: E402
+from project5.lexer import lexer  # noqa: E402
+from project5.parser import parse  # noqa: E402
+from project5.project5 import project5  # noqa: E402
+from project5.relation import IncompatibleOperandError, Relation  # noqa: E402
+from project5.symboltable import SymbolTable  # noqa: E402
+
+_TEST_ROOT_DIR = "./tests/resources/project5-passoff/"
+
+
+def _relations(header, set_of_tuples):
+    return Relation(header, set_of_tuples), ColumnarRelation(
+        header, set_of_tuples, SymbolTable()
+    )
+
+
+def test_given_columnar_relation_when_construct_then_matches_relation():
+    # given
+    header = ("a", "b")
+    set_of_tuples = set([("1", "2"), ("2", "3")])
+
+    # when
+    relation, columnar = _relations(header, set_of_tuples)
+    columnar.add_tuple(("1", "2"))
+
+    # then
+    assert relation == columnar
+    assert 2 == len(columnar)
+
+
+def test_given_columnar_relation_when_select_then_matches_relation():
+    # given
+    relation, columnar = _relations(
+        ("a", "b", "c"), set([("1", "1", "3"), ("1", "3", "5"), ("2", "2", "5")])
+    )
+
+    # when
+    by_col = columnar.select_eq_col("a", "b")
+    by_lit = columnar.select_eq_lit("c", "5")
+    by_unknown_lit = columnar.select_eq_lit("c", "9")
+
+    # then
+    assert relation.select_eq_col("a", "b") == by_col
+    assert relation.select_eq_lit("c", "5") == by_lit
+    assert Relation(("a", "b", "c"), set()) == by_unknown_lit
+
+
+def test_given_columnar_relation_when_project_and_rename_then_matches_relation():
+    # given
+    relation, columnar = _relations(
+        ("a", "b", "c"), set([("1", "2", "3"), ("1", "2", "5")])
+    )
+
+    # when
+    projected = columnar.project(["b", "a"])
+    renamed = columnar.rename(["x", "y", "z"])
+
+    # then
+    assert relation.project(["b", "a"]) == projected
+    assert 1 == len(projected)
+    assert relation.rename(["x", "y", "z"]) == renamed
+
+
+def test_given_columnar_relations_when_set_operations_then_matches_relation():
+    # given
+    symbols = SymbolTable()
+    left = set([("1", "2"), ("2", "3")])
+    right = set([("2", "3"), ("4", "5")])
+    columnar_left = ColumnarRelation(("a", "b"), left, symbols)
+    columnar_right = ColumnarRelation(("a", "b"), right, symbols)
+    relation_left = Relation(("a", "b"), left)
+    relation_right = Relation(("a", "b"), right)
+
+    # when
+    union = columnar_left.union(columnar_right)
+    difference = columnar_left.difference(relation_right)
+    intersection = columnar_left.intersection(columnar_right)
+
+    # then
+    assert relation_left.union(relation_right) == union
+    assert relation_left.difference(relation_right) == difference
+    assert relation_left.intersection(relation_right) == intersection
+
+
+def test_given_columnar_relation_when_extend_then_matches_relation():
+    # given
+    relation, columnar_relation = _relations(("a", "b"), set([("1", "2")]))
+    right = Relation(("a", "b"), set([("1", "2"), ("2", "3")]))
+    before = columnar_relation.snapshot()
+
+    # when
+    new_tuples = columnar_relation.extend(right)
+
+    # then
+    assert relation.extend(right) == new_tuples
+    assert relation == columnar_relation
+    assert Relation(("a", "b"), new_tuples) == columnar_relation.snapshot().difference(
+        before
+    )
+
+
+def test_given_columnar_relation_when_remove_then_matches_relation():
+    # given
+    relation, columnar_relation = _relations(
+        ("a", "b"), set([("1", "2"), ("2", "3"), ("3", "4")])
+    )
+    tuples = set([("1", "2"), ("3", "4"), ("5", "6")])
+
+    # when
+    removed_tuples = columnar_relation.remove(tuples)
+
+    # then
+    assert relation.remove(tuples) == removed_tuples
+    assert relation == columnar_relation
+    assert relation.revision() == columnar_relation.revision()
+
+
+def test_given_columnar_relation_when_join_then_matches_relation():
+    # given
+    symbols = SymbolTable()
+    left = set([("1", "2", "3"), ("1", "3", "5")])
+    right = set([("3", "4"), ("1", "3")])
+    columnar = ColumnarRelation(("a", "b", "c"), left, symbols)
+
+    # when
+    answer = columnar.join(ColumnarRelation(("c", "d"), right, symbols))
+
+    # then
+    assert Relation(("a", "b", "c"), left).join(Relation(("c", "d"), right)) == answer
+
+
+@pytest.mark.parametrize("threshold", [0, 1000000])
+def test_given_multi_column_key_when_join_then_sort_merge_and_hash_agree(
+    monkeypatch, threshold
+):
+    # given
+    monkeypatch.setattr(columnar, "SORT_MERGE_THRESHOLD", threshold)
+    symbols = SymbolTable()
+    left = set([(str(i % 3), str(i % 5), str(i)) for i in range(30)])
+    right = set([(str(i % 5), str(i % 4), str(i % 3)) for i in range(20)])
+    expected = Relation(("a", "b", "c"), left).join(Relation(("b", "d", "a"), right))
+
+    # when
+    answer = ColumnarRelation(("a", "b", "c"), left, symbols).join(
+        ColumnarRelation(("b", "d", "a"), right, symbols)
+    )
+
+    # then
+    assert expected == answer
+
+
+def test_given_mismatched_columnar_relations_when_union_then_exception():
+    # given
+    left = ColumnarRelation(("a", "b"), set())
+    right = ColumnarRelation(("a", "c"), set())
+
+    # when
+    with pytest.raises(IncompatibleOperandError) as exception:
+        left.union(right)
+
+    # then
+    assert "The headers do not equal each other in union" == str(exception.value)
+
+
+@pytest.mark.parametrize(
+    "bucket, number",
+    [("80", i) for i in range(8)] + [("100", i) for i in (1, 2, 3, 5, 6, 7, 8)],
+)
+def test_given_passoff_input_when_columnar_backend_then_same_answer(bucket, number):
+    # given
+    test_dir = os.path.join(_TEST_ROOT_DIR, bucket)
+    with open(os.path.join(test_dir, f"input{number}.txt"), "r") as f:
+        input = f.read()
+
+    # when
+    answer = project5(input, "columnar")
+
+    # then
+    assert project5(input) == answer
+
+
+def test_given_two_interpreters_when_columnar_backend_then_own_symbol_tables():
+    # given
+    first, second = [
+        Interpreter(
+            parse(lexer(f"Schemes: f(a) Facts: f('{i}'). Rules: Queries:")), "columnar"
+        )
+        for i in (1, 2)
+    ]
+
+    # when
+    for interpreter in (first, second):
+        interpreter.eval_schemes()
+        interpreter.eval_facts()
+    decoded = first.table_list["f"].set_of_tuples
+
+    # then
+    assert first.column_symbols is not second.column_symbols
+    assert ["'1'"] == first.column_symbols.values
+    assert set([("'1'",)]) == decoded
+    assert 1 == first.column_symbols.decoded
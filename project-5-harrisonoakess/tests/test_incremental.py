@@ -0,0 +1,112 @@
+# type: ignore
+"""Tests for the incremental maintenance of the relations."""
+
+import os
+
+import pytest
+
+from project5.datalogprogram import Parameter, Predicate
+from project5.lexer import lexer
+from project5.parser import parse
+from tests.builders import binary, edge, fixpoint, reach
+
+_TEST_ROOT_DIR = "./tests/resources/project5-passoff/"
+
+
+def _relations(interpreter):
+    return {
+        name: set(interpreter.decode_relation(relation).set_of_tuples)
+        for name, relation in interpreter.table_list.items()
+    }
+
+
+def test_given_cycle_when_delete_and_insert_facts_then_same_as_full_evaluation():
+    # given
+    interpreter = fixpoint(reach([(1, 2), (2, 3), (3, 1), (3, 4), (1, 5)]))
+
+    # when
+    removed = interpreter.delete_facts([edge(3, 1)])
+    after_delete = _relations(interpreter)
+    added = interpreter.insert_facts([edge(4, 2)])
+
+    # then
+    assert {
+        "e": set([("'3'", "'1'")]),
+        "p": set(
+            [(x, y) for x in ("'1'", "'2'", "'3'") for y in ("'1'",)]
+            + [(x, "'5'") for x in ("'2'", "'3'")]
+            + [("'3'", "'2'"), ("'3'", "'3'"), ("'2'", "'2'")]
+        ),
+    } == removed
+    assert _relations(fixpoint(reach([(1, 2), (2, 3), (3, 4), (1, 5)]))) == (
+        after_delete
+    )
+    assert set([("'4'", "'2'")]) == added["e"]
+    assert _relations(
+        fixpoint(reach([(1, 2), (2, 3), (3, 4), (1, 5), (4, 2)]))
+    ) == _relations(interpreter)
+
+
+@pytest.mark.parametrize("number", [1, 2, 3, 5, 8])
+def test_given_passoff_input_when_facts_change_then_same_as_full_evaluation(number):
+    # given
+    with open(os.path.join(_TEST_ROOT_DIR, "100", f"input{number}.txt"), "r") as f:
+        input = f.read()
+    interpreter = fixpoint(parse(lexer(input)), intern=True)
+    changed = parse(lexer(input))
+    facts = changed.facts[::3]
+
+    # when
+    interpreter.delete_facts(facts)
+    changed.facts = [i for i in changed.facts if i not in facts]
+    after_delete = _relations(interpreter)
+    interpreter.insert_facts(facts[::2])
+    changed_insert = parse(lexer(input))
+    changed_insert.facts = changed.facts + facts[::2]
+
+    # then
+    assert _relations(fixpoint(changed)) == after_delete
+    assert _relations(fixpoint(changed_insert)) == _relations(interpreter)
+
+
+def test_given_memoized_answers_when_delete_then_insert_then_not_reused():
+    # given
+    interpreter = fixpoint(reach([(1, 2), (2, 3)]), intern=True)
+    query = Predicate("p", [Parameter("'1'", "STRING"), Parameter("Y", "ID")])
+    before = interpreter.answer_query(query)
+    body = interpreter.body_query(binary("e", "X", "Y"))
+    revision = interpreter.table_list["e"].revision()
+
+    # when
+    interpreter.delete_facts([edge(1, 2)])
+    interpreter.insert_facts([edge(1, 3)])
+
+    # then
+    assert 2 == len(before) and 2 == len(body)
+    assert revision + 2 == interpreter.table_list["e"].revision()
+    assert set([("'3'",)]) == set(
+        interpreter.decode_relation(interpreter.answer_query(query)).set_of_tuples
+    )
+    assert set([("'1'", "'3'"), ("'2'", "'3'")]) == set(
+        interpreter.decode_relation(
+            interpreter.body_query(binary("e", "X", "Y"))
+        ).set_of_tuples
+    )
+    assert 2 == len(interpreter.fact_tuples["e"])
+
+
+def test_given_repeated_insert_and_delete_when_updated_then_history_trimmed():
+    # given
+    interpreter = fixpoint(reach([(1, 2), (2, 3)]), intern=True)
+    revision = interpreter.table_list["p"].revision()
+
+    # when
+    for _ in range(50):
+        interpreter.insert_facts([edge(3, 4)])
+        interpreter.delete_facts([edge(3, 4)])
+
+    # then
+    assert [] == interpreter.table_list["e"].history
+    assert [] == interpreter.table_list["p"].history
+    assert 3 == len(interpreter.table_list["p"])
+    assert revision + 50 * 6 == interpreter.table_list["p"].revision()
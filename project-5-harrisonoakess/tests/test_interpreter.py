@@ -4,6 +4,7 @@
 from project5.relation import Relation
 from project5.datalogprogram import Parameter, Predicate, DatalogProgram, Rule
 from project5.interpreter import Interpreter
+from tests.builders import binary
 
 
 def test_eval_schemes():
@@ -728,3 +729,362 @@ def test_eval_rules_optimized():
     for i, expect in zip(final_list, expected):
         assert i[2] == expect
     # assert final_list[0][2] == expected[0] # this probably has a problem
+
+
+def test_plan_join_order():
+    # given
+    relations = [
+        Relation(["X", "Y"], set([("1", "2"), ("2", "3"), ("3", "4")])),
+        Relation(["W"], set([("a",), ("b",)])),
+        Relation(["Y", "Z"], set([("3", "5")])),
+    ]
+    expected = [2, 0, 1]
+    interpreter = Interpreter(DatalogProgram())
+
+    # when
+    order = interpreter.plan_join_order(relations)
+
+    # then
+    assert expected == order
+
+
+def test_given_same_relations_when_plan_join_order_again_then_counts_reused():
+    # given
+    relations = [
+        Relation(["X", "Y"], set([("1", "2"), ("2", "3"), ("3", "4")])),
+        Relation(["Y", "Z"], set([("3", "5")])),
+    ]
+    interpreter = Interpreter(DatalogProgram())
+    interpreter.plan_join_order(relations, ["e(X,Y)", None])
+    counts = interpreter.distinct_memo["e(X,Y)"][2]
+
+    # when
+    order = interpreter.plan_join_order(relations, ["e(X,Y)", None])
+    reused = interpreter.distinct_memo["e(X,Y)"][2]
+    relations[0].extend(Relation(["X", "Y"], set([("4", "5")])))
+    interpreter.plan_join_order(relations, ["e(X,Y)", None])
+
+    # then
+    assert [1, 0] == order
+    assert {"X": 3, "Y": 3} == counts
+    assert counts is reused
+    assert ["e(X,Y)"] == list(interpreter.distinct_memo)
+    assert {"X": 4, "Y": 4} == interpreter.distinct_memo["e(X,Y)"][2]
+
+
+def test_eval_rule():
+    # given
+    schemeslist = [
+        Predicate("e", [Parameter("A", "ID"), Parameter("B", "ID")]),
+        Predicate("w", [Parameter("A", "ID")]),
+        Predicate("p", [Parameter("A", "ID"), Parameter("B", "ID")]),
+    ]
+    factslist = [
+        Predicate("e", [Parameter("'1'", "STRING"), Parameter("'2'", "STRING")]),
+        Predicate("e", [Parameter("'2'", "STRING"), Parameter("'3'", "STRING")]),
+        Predicate("w", [Parameter("'2'", "STRING")]),
+    ]
+    rule = Rule(
+        Predicate("p", [Parameter("Z", "ID"), Parameter("X", "ID")]),
+        [
+            Predicate("e", [Parameter("X", "ID"), Parameter("Y", "ID")]),
+            Predicate("e", [Parameter("Y", "ID"), Parameter("Z", "ID")]),
+            Predicate("w", [Parameter("Y", "ID")]),
+        ],
+    )
+    expected = Relation(["A", "B"], set([("'3'", "'1'")]))
+    interpreter = Interpreter(
+        DatalogProgram(schemes=schemeslist, facts=factslist, rules=[rule])
+    )
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+
+    # when
+    answer = interpreter.eval_rule(rule)
+
+    # then
+    assert expected == answer
+
+
+def test_eval_rule_projects_dead_variables():
+    # given
+    schemeslist = [
+        Predicate("e", [Parameter("A", "ID"), Parameter("B", "ID")]),
+        Predicate("p", [Parameter("A", "ID")]),
+    ]
+    factslist = [
+        Predicate("e", [Parameter("'1'", "STRING"), Parameter("'2'", "STRING")]),
+        Predicate("e", [Parameter("'1'", "STRING"), Parameter("'3'", "STRING")]),
+        Predicate("e", [Parameter("'2'", "STRING"), Parameter("'4'", "STRING")]),
+        Predicate("e", [Parameter("'3'", "STRING"), Parameter("'4'", "STRING")]),
+        Predicate("e", [Parameter("'4'", "STRING"), Parameter("'5'", "STRING")]),
+    ]
+    rule = Rule(
+        Predicate("p", [Parameter("W", "ID")]),
+        [
+            Predicate("e", [Parameter("W", "ID"), Parameter("X", "ID")]),
+            Predicate("e", [Parameter("X", "ID"), Parameter("Y", "ID")]),
+            Predicate("e", [Parameter("Y", "ID"), Parameter("Z", "ID")]),
+        ],
+    )
+    expected = Relation(["A"], set([("'1'",)]))
+    interpreter = Interpreter(
+        DatalogProgram(schemes=schemeslist, facts=factslist, rules=[rule])
+    )
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+
+    # when
+    answer = interpreter.eval_rule(rule)
+
+    # then
+    assert expected == answer
+
+
+def test_given_intern_when_eval_then_tuples_are_ids():
+    # given
+    schemeslist = [
+        Predicate("e", [Parameter("A", "ID"), Parameter("B", "ID")]),
+        Predicate("p", [Parameter("A", "ID"), Parameter("B", "ID")]),
+    ]
+    factslist = [
+        Predicate("e", [Parameter("'1'", "STRING"), Parameter("'2'", "STRING")]),
+        Predicate("e", [Parameter("'2'", "STRING"), Parameter("'3'", "STRING")]),
+    ]
+    ruleslist = [
+        Rule(
+            Predicate("p", [Parameter("X", "ID"), Parameter("Z", "ID")]),
+            [
+                Predicate("e", [Parameter("X", "ID"), Parameter("Y", "ID")]),
+                Predicate("e", [Parameter("Y", "ID"), Parameter("Z", "ID")]),
+            ],
+        )
+    ]
+    querieslist = [
+        Predicate("p", [Parameter("'1'", "STRING"), Parameter("Z", "ID")]),
+    ]
+    interpreter = Interpreter(
+        DatalogProgram(
+            schemes=schemeslist, facts=factslist, rules=ruleslist, queries=querieslist
+        ),
+        intern=True,
+    )
+
+    # when
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+    _ = [i for i in interpreter.eval_rules_optimized()]
+    answers = [i for i in interpreter.eval_queries()]
+
+    # then
+    assert set([(0, 1), (1, 2)]) == interpreter.table_list["e"].set_of_tuples
+    assert Relation(["A", "B"], set([("'1'", "'3'")])) == interpreter.decode_relation(
+        interpreter.table_list["p"]
+    )
+    assert Relation(["Z"], set([("'3'",)])) == interpreter.decode_relation(
+        answers[0][1]
+    )
+
+
+def test_given_triangle_rule_when_eval_rule_then_triangles():
+    # given
+    schemeslist = [
+        Predicate("e", [Parameter("A", "ID"), Parameter("B", "ID")]),
+        Predicate(
+            "tri", [Parameter("A", "ID"), Parameter("B", "ID"), Parameter("C", "ID")]
+        ),
+    ]
+    factslist = [
+        Predicate("e", [Parameter(i, "STRING"), Parameter(j, "STRING")])
+        for i, j in [("'1'", "'2'"), ("'2'", "'3'"), ("'1'", "'3'"), ("'3'", "'4'")]
+    ]
+    rule = Rule(
+        Predicate(
+            "tri", [Parameter("A", "ID"), Parameter("B", "ID"), Parameter("C", "ID")]
+        ),
+        [
+            Predicate("e", [Parameter("A", "ID"), Parameter("B", "ID")]),
+            Predicate("e", [Parameter("B", "ID"), Parameter("C", "ID")]),
+            Predicate("e", [Parameter("A", "ID"), Parameter("C", "ID")]),
+        ],
+    )
+    expected = Relation(["A", "B", "C"], set([("'1'", "'2'", "'3'")]))
+    interpreter = Interpreter(
+        DatalogProgram(schemes=schemeslist, facts=factslist, rules=[rule])
+    )
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+
+    # when
+    answer = interpreter.eval_rule(rule)
+
+    # then
+    assert expected == answer
+
+
+def test_given_recursive_rule_when_eval_rules_then_join_index_is_extended():
+    # given
+    schemeslist = [
+        Predicate("e", [Parameter("A", "ID"), Parameter("B", "ID")]),
+        Predicate("t", [Parameter("A", "ID"), Parameter("B", "ID")]),
+    ]
+    factslist = [
+        Predicate("e", [Parameter("'1'", "STRING"), Parameter("'2'", "STRING")]),
+        Predicate("e", [Parameter("'2'", "STRING"), Parameter("'3'", "STRING")]),
+        Predicate("e", [Parameter("'3'", "STRING"), Parameter("'4'", "STRING")]),
+    ]
+    ruleslist = [
+        Rule(
+            Predicate("t", [Parameter("X", "ID"), Parameter("Y", "ID")]),
+            [Predicate("e", [Parameter("X", "ID"), Parameter("Y", "ID")])],
+        ),
+        Rule(
+            Predicate("t", [Parameter("X", "ID"), Parameter("Z", "ID")]),
+            [
+                Predicate("e", [Parameter("X", "ID"), Parameter("Y", "ID")]),
+                Predicate("t", [Parameter("Y", "ID"), Parameter("Z", "ID")]),
+            ],
+        ),
+    ]
+    interpreter = Interpreter(
+        DatalogProgram(schemes=schemeslist, facts=factslist, rules=ruleslist)
+    )
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+
+    # when
+    for _ in interpreter.eval_rules():
+        pass
+
+    # then
+    t = interpreter.table_list["t"]
+    assert len(t) == 6
+    assert len(interpreter.join_indexes["t"]) > 0
+    for positions, index in interpreter.join_indexes["t"].items():
+        expected = t.index(list(positions))
+        assert index.keys() == expected.keys()
+        for key in index:
+            assert set(index[key]) == set(expected[key])
+
+
+def test_given_rule_with_unchanged_body_when_eval_rules_optimized_then_skipped(
+    monkeypatch,
+):
+    # given
+    schemeslist = [
+        Predicate("a", [Parameter("X", "ID")]),
+        Predicate("b", [Parameter("X", "ID")]),
+        Predicate("c", [Parameter("X", "ID")]),
+    ]
+    factslist = [
+        Predicate("b", [Parameter("'1'", "STRING")]),
+        Predicate("c", [Parameter("'2'", "STRING")]),
+    ]
+    ruleslist = [
+        Rule(
+            Predicate("a", [Parameter("X", "ID")]),
+            [Predicate("b", [Parameter("X", "ID")])],
+        ),
+        Rule(
+            Predicate("b", [Parameter("X", "ID")]),
+            [Predicate("a", [Parameter("X", "ID")])],
+        ),
+        Rule(
+            Predicate("a", [Parameter("X", "ID")]),
+            [
+                Predicate("b", [Parameter("X", "ID")]),
+                Predicate("c", [Parameter("X", "ID")]),
+            ],
+        ),
+    ]
+    interpreter = Interpreter(
+        DatalogProgram(schemes=schemeslist, facts=factslist, rules=ruleslist)
+    )
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+    evaluated = []
+    eval_rule = Interpreter.eval_rule
+
+    def _eval_rule(self, rule):
+        evaluated.append(ruleslist.index(rule))
+        return eval_rule(self, rule)
+
+    monkeypatch.setattr(Interpreter, "eval_rule", _eval_rule)
+
+    # when
+    answer = [i for i in interpreter.eval_rules_optimized()]
+
+    # then
+    assert [0, 1, 2] * 2 == [ruleslist.index(i[1]) for i in answer]
+    assert [0, 1, 2] == evaluated
+    assert Relation(["X"], set([("'1'",)])) == interpreter.table_list["a"]
+
+
+def test_given_long_rule_chain_when_get_scc_then_no_recursion_error_and_cached():
+    # given
+    ruleslist = [
+        Rule(
+            Predicate(f"p{i + 1}", [Parameter("X", "ID")]),
+            [Predicate(f"p{i}", [Parameter("X", "ID")])],
+        )
+        for i in range(5000)
+    ]
+    interpreter = Interpreter(DatalogProgram(rules=ruleslist))
+
+    # when
+    answer = interpreter.get_scc()
+
+    # then
+    assert [[i] for i in range(5000)] == answer
+    assert answer is interpreter.get_scc()
+    assert interpreter.get_rule_dependency_graph() is interpreter.dependency_graph
+
+
+def test_given_rules_sharing_body_when_eval_rule_then_subqueries_computed_once(
+    monkeypatch,
+):
+    # given
+    schemeslist = [
+        binary("e", "A", "B"),
+        Predicate("f", [Parameter("A", "ID")]),
+        Predicate("g", [Parameter("A", "ID")]),
+        Predicate("h", [Parameter("A", "ID")]),
+    ]
+    factslist = [
+        Predicate("e", [Parameter("'1'", "STRING"), Parameter("'2'", "STRING")]),
+        Predicate("e", [Parameter("'2'", "STRING"), Parameter("'3'", "STRING")]),
+        Predicate("f", [Parameter("'2'", "STRING")]),
+    ]
+    g = Predicate("g", [Parameter("X", "ID")])
+    h = Predicate("h", [Parameter("Y", "ID")])
+    f = Predicate("f", [Parameter("Y", "ID")])
+    ruleslist = [
+        Rule(g, [binary("e", "X", "Y"), f]),
+        Rule(h, [binary("e", "X", "Y"), f]),
+    ]
+    interpreter = Interpreter(
+        DatalogProgram(schemes=schemeslist, facts=factslist, rules=ruleslist)
+    )
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+    queried = []
+    single_query = Interpreter.single_query
+
+    def _single_query(self, i, relation=None):
+        queried.append(str(i))
+        return single_query(self, i, relation)
+
+    monkeypatch.setattr(Interpreter, "single_query", _single_query)
+
+    # when
+    answer = [interpreter.eval_rule(i) for i in ruleslist]
+    prefixes = len(interpreter.prefix_memo)
+    interpreter.extend_relation("f", Relation(["A"], set([("'3'",)])))
+    later = interpreter.eval_rule(ruleslist[0])
+
+    # then
+    assert Relation(["A"], set([("'1'",)])) == answer[0]
+    assert Relation(["A"], set([("'2'",)])) == answer[1]
+    assert ["e(X,Y)", "f(Y)", "f(Y)"] == queried
+    assert 2 == prefixes
+    assert Relation(["A"], set([("'1'",), ("'2'",)])) == later
@@ -0,0 +1,77 @@
+# type: ignore
+"""Tests for the magic-sets rewrite."""
+
+import os
+
+import pytest
+
+from project5.datalogprogram import Parameter, Predicate
+from project5.magicsets import magic_sets
+from project5.project5 import project5
+from tests.builders import fixpoint, reach
+
+_TEST_ROOT_DIR = "./tests/resources/project5-passoff/"
+
+
+def _chain(length):
+    """A transitive closure over two disjoint chains queried from one node."""
+    edges = [(f"{c}{i}", f"{c}{i + 1}") for c in ("a", "b") for i in range(length)]
+    query = Predicate("p", [Parameter("'a3'", "STRING"), Parameter("Y", "ID")])
+    return reach(edges, ["right"], [query])
+
+
+def _queries(report):
+    return report[report.index("Query Evaluation") :]
+
+
+def test_given_bound_query_when_magic_sets_then_only_relevant_facts_derived():
+    # given
+    datalog = _chain(6)
+
+    # when
+    rewritten = fixpoint(magic_sets(datalog))
+    original = fixpoint(datalog)
+
+    # then
+    assert [i for i in original.eval_queries()] == [i for i in rewritten.eval_queries()]
+    assert 6 * 7 == len(original.table_list["p"].set_of_tuples)
+    assert 6 == len(rewritten.table_list["p"].set_of_tuples)
+    assert set([("'a3'",), ("'a4'",), ("'a5'",), ("'a6'",)]) == set(
+        rewritten.table_list["magic_p_bf"].set_of_tuples
+    )
+
+
+def test_given_program_when_magic_sets_then_input_unchanged():
+    # given
+    datalog = _chain(2)
+    expect = _chain(2)
+
+    # when
+    magic_sets(datalog)
+
+    # then
+    assert expect.schemes == datalog.schemes
+    assert expect.facts == datalog.facts
+    assert expect.rules == datalog.rules
+    assert expect.queries == datalog.queries
+
+
+@pytest.mark.parametrize("bucket", ["80", "100"])
+def test_given_passoff_inputs_when_magic_then_same_query_answers(bucket):
+    # given
+    test_dir = os.path.join(_TEST_ROOT_DIR, bucket)
+    for name in sorted(os.listdir(test_dir)):
+        if not name.startswith("input"):
+            continue
+        with open(os.path.join(test_dir, name), "r") as f:
+            input = f.read()
+
+        # when
+        answer = project5(input, magic=True)
+
+        # then
+        expect = project5(input)
+        if expect.startswith("Failure!"):
+            assert expect == answer
+        else:
+            assert _queries(expect) == _queries(answer), name
@@ -0,0 +1,47 @@
+# type: ignore
+"""Tests for the multi-way join."""
+
+from project5.multiwayjoin import generic_join, is_cyclic
+from project5.relation import Relation
+
+
+def test_given_cyclic_and_acyclic_bodies_when_is_cyclic_then_expected():
+    # given
+    triangle = [["A", "B"], ["B", "C"], ["A", "C"]]
+    chain = [["A", "B"], ["B", "C"], ["C", "D"]]
+    star = [["A", "B"], ["A", "C"], ["A", "D"]]
+    square = [["A", "B"], ["B", "C"], ["C", "D"], ["D", "A"]]
+    covered = [["A", "B", "C"], ["A", "B"], ["B", "C"], ["A", "C"]]
+
+    # when
+    answers = [is_cyclic(i) for i in [triangle, chain, star, square, covered]]
+
+    # then
+    assert [True, False, False, True, False] == answers
+
+
+def test_given_cyclic_body_when_generic_join_then_matches_binary_joins():
+    # given
+    edges = set([(str(i), str((i * 7 + 3) % 13)) for i in range(40)])
+    edges |= set([(str(i % 13), str((i * 5 + 1) % 13)) for i in range(40)])
+    e = Relation(["a", "b"], edges)
+    relations = [e, e.rename(["b", "c"]), e.rename(["c", "d"]), e.rename(["a", "d"])]
+    expected = relations[0].join(relations[1]).join(relations[2]).join(relations[3])
+
+    # when
+    answer = generic_join(relations)
+
+    # then
+    assert expected.project(answer.header) == answer
+
+
+def test_given_empty_relation_when_generic_join_then_empty():
+    # given
+    e = Relation(["a", "b"], set([("1", "2"), ("2", "3"), ("1", "3")]))
+    empty = Relation(["a", "c"], set())
+
+    # when
+    answer = generic_join([e, e.rename(["b", "c"]), empty])
+
+    # then
+    assert set() == answer.set_of_tuples
@@ -0,0 +1,276 @@
+# type: ignore
+"""Tests for the parallel evaluation of the rules."""
+
+import os
+
+import pytest
+
+from project5.datalogprogram import DatalogProgram, Parameter, Predicate, Rule
+from project5.interpreter import Interpreter
+from project5.lexer import lexer
+from project5.parallel import _load, eval_scc_partitioned, scc_dependencies
+from project5.parser import parse
+from project5.project5 import project5, project5batch
+
+_TEST_ROOT_DIR = "./tests/resources/project5-passoff/"
+
+
+def _pipelines():
+    """Two independent transitive closures that write a shared summary relation."""
+    schemeslist = [
+        Predicate("e", [Parameter("A", "ID"), Parameter("B", "ID")]),
+        Predicate("f", [Parameter("A", "ID"), Parameter("B", "ID")]),
+        Predicate("p", [Parameter("A", "ID"), Parameter("B", "ID")]),
+        Predicate("q", [Parameter("A", "ID"), Parameter("B", "ID")]),
+        Predicate("s", [Parameter("A", "ID")]),
+    ]
+    factslist = [
+        Predicate(
+            name, [Parameter(f"'{i}'", "STRING"), Parameter(f"'{i + 1}'", "STRING")]
+        )
+        for name in ("e", "f")
+        for i in range(6)
+    ]
+    ruleslist = []
+    for edge, closure in (("e", "p"), ("f", "q")):
+        ruleslist += [
+            Rule(
+                Predicate(closure, [Parameter("X", "ID"), Parameter("Y", "ID")]),
+                [Predicate(edge, [Parameter("X", "ID"), Parameter("Y", "ID")])],
+            ),
+            Rule(
+                Predicate(closure, [Parameter("X", "ID"), Parameter("Z", "ID")]),
+                [
+                    Predicate(edge, [Parameter("X", "ID"), Parameter("Y", "ID")]),
+                    Predicate(closure, [Parameter("Y", "ID"), Parameter("Z", "ID")]),
+                ],
+            ),
+            Rule(
+                Predicate("s", [Parameter("X", "ID")]),
+                [Predicate(closure, [Parameter("X", "ID"), Parameter("Y", "ID")])],
+            ),
+        ]
+    return DatalogProgram(schemes=schemeslist, facts=factslist, rules=ruleslist)
+
+
+def _interpreter(datalog):
+    interpreter = Interpreter(datalog)
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+    return interpreter
+
+
+def test_given_shared_head_when_scc_dependencies_then_writers_ordered():
+    # given
+    interpreter = _interpreter(_pipelines())
+    sccs = interpreter.get_scc()
+    component = {rule: index for index, scc in enumerate(sccs) for rule in scc}
+
+    # when
+    answer = scc_dependencies(interpreter)
+
+    # then
+    first, second = sorted([component[2], component[5]])
+    assert first in answer[second]
+    assert component[1] in answer[component[2]]
+    assert component[4] in answer[component[5]]
+    assert set() == answer[component[0]]
+    assert set() == answer[component[3]]
+
+
+def test_given_worker_with_memos_when_load_relations_then_memos_dropped():
+    # given
+    interpreter = _interpreter(_pipelines())
+    for _ in interpreter.eval_rules_optimized():
+        pass
+    assert len(interpreter.body_memo) > 0 and len(interpreter.distinct_memo) > 0
+
+    # when
+    _load(interpreter, {"e": (["A", "B"], set([("'1'", "'2'")]))})
+
+    # then
+    assert ["e"] == list(interpreter.table_list)
+    assert {} == interpreter.body_memo
+    assert {} == interpreter.prefix_memo
+    assert {} == interpreter.distinct_memo
+    assert 0 == len(interpreter.query_cache)
+
+
+def test_given_independent_sccs_when_eval_rules_parallel_then_same_as_sequential():
+    # given
+    sequential = _interpreter(_pipelines())
+    parallel = _interpreter(_pipelines())
+
+    # when
+    expected = [
+        (rule, after.difference(before).set_of_tuples)
+        for before, rule, after in sequential.eval_rules_optimized()
+    ]
+    answer = [
+        (rule, after.difference(before).set_of_tuples)
+        for before, rule, after in parallel.eval_rules_parallel(2)
+    ]
+
+    # then
+    assert [(str(i), j) for i, j in expected] == [(str(i), j) for i, j in answer]
+    assert sequential.table_list == parallel.table_list
+
+
+@pytest.mark.parametrize("bucket, number", [("80", 0), ("100", 1), ("100", 8)])
+def test_given_passoff_input_when_jobs_then_same_answer(bucket, number):
+    # given
+    test_dir = os.path.join(_TEST_ROOT_DIR, bucket)
+    with open(os.path.join(test_dir, f"input{number}.txt"), "r") as f:
+        input = f.read()
+
+    # when
+    answer = project5(input, jobs=2)
+
+    # then
+    assert project5(input) == answer
+
+
+def test_given_recursive_scc_when_eval_scc_partitioned_then_same_relations():
+    # given
+    sequential = _interpreter(_pipelines())
+    partitioned = _interpreter(_pipelines())
+    rounds = 0
+
+    # when
+    for scc in partitioned.get_scc():
+        for _ in sequential.eval_scc(scc):
+            pass
+        if scc == [1]:
+            rounds = eval_scc_partitioned(partitioned, scc, 3)
+        else:
+            for _ in partitioned.eval_scc(scc):
+                pass
+
+    # then
+    assert 6 == rounds
+    assert sequential.table_list == partitioned.table_list
+
+
+@pytest.mark.parametrize("bucket, number", [("80", 0), ("100", 1), ("100", 8)])
+def test_given_passoff_input_when_eval_rules_partitioned_then_same_relations(
+    bucket, number
+):
+    # given
+    test_dir = os.path.join(_TEST_ROOT_DIR, bucket)
+    with open(os.path.join(test_dir, f"input{number}.txt"), "r") as f:
+        datalog = parse(lexer(f.read()))
+    sequential = _interpreter(datalog)
+    partitioned = _interpreter(datalog)
+
+    # when
+    for _ in sequential.eval_rules_optimized():
+        pass
+    partitioned.eval_rules_partitioned(2)
+
+    # then
+    assert sequential.table_list == partitioned.table_list
+
+
+@pytest.mark.parametrize("bucket, number", [("80", 4), ("100", 8)])
+def test_given_passoff_input_when_project5_partitioned_then_same_query_answers(
+    bucket, number
+):
+    # given
+    with open(os.path.join(_TEST_ROOT_DIR, bucket, f"input{number}.txt"), "r") as f:
+        input = f.read()
+
+    # when
+    answer = project5(input, jobs=2, partitioned=True)
+
+    # then
+    expect = project5(input)
+    index = expect.index("Query Evaluation")
+    assert expect[index:] == answer[answer.index("Query Evaluation") :]
+    assert "Rule Evaluation\n\n" in answer
+
+
+@pytest.mark.parametrize("bucket, number", [("80", 0), ("100", 1), ("100", 8)])
+def test_given_passoff_input_when_eval_rules_jacobi_then_same_relations(bucket, number):
+    # given
+    test_dir = os.path.join(_TEST_ROOT_DIR, bucket)
+    with open(os.path.join(test_dir, f"input{number}.txt"), "r") as f:
+        datalog = parse(lexer(f.read()))
+    sequential = _interpreter(datalog)
+    jacobi = _interpreter(datalog)
+
+    # when
+    for _ in sequential.eval_rules_optimized():
+        pass
+    answer = [i for i in jacobi.eval_rules_jacobi(2)]
+
+    # then
+    assert sequential.table_list == jacobi.table_list
+    assert len(datalog.rules) <= len(answer)
+
+
+def test_given_interned_queries_when_eval_queries_with_jobs_then_same_in_order():
+    # given
+    datalog = _pipelines()
+    datalog.queries = [
+        Predicate(name, [Parameter(f"'{i}'", "STRING"), Parameter("Y", "ID")])
+        for name in ("p", "q")
+        for i in range(8)
+    ] + [
+        Predicate("p", [Parameter("X", "ID"), Parameter("X", "ID")]),
+        Predicate("s", [Parameter("X", "ID")]),
+    ]
+    interpreter = Interpreter(datalog, intern=True)
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+    for _ in interpreter.eval_rules_optimized():
+        pass
+
+    # when
+    answer = [i for i in interpreter.eval_queries(3)]
+
+    # then
+    assert [i for i in interpreter.eval_queries()] == answer
+
+
+def test_given_input_files_when_project5batch_then_reports_written(tmp_path):
+    # given
+    test_dir = os.path.join(_TEST_ROOT_DIR, "80")
+    input_files = [os.path.join(test_dir, f"input{i}.txt") for i in range(4)]
+    out_dir = os.path.join(tmp_path, "reports")
+
+    # when
+    answer = [i for i in project5batch(input_files, out_dir, 2)]
+
+    # then
+    assert input_files == [i[0] for i in answer]
+    for input_file, output_file, seconds, error in answer:
+        with open(input_file, "r") as f:
+            expect = project5(f.read()) + "\n"
+        with open(output_file, "r") as f:
+            assert expect == f.read()
+        assert 0 <= seconds
+        assert error is None
+
+
+def test_given_missing_input_file_when_project5batch_then_others_still_reported(
+    tmp_path,
+):
+    # given
+    test_dir = os.path.join(_TEST_ROOT_DIR, "80")
+    input_files = [
+        os.path.join(test_dir, "input0.txt"),
+        os.path.join(tmp_path, "missing.txt"),
+        os.path.join(test_dir, "input1.txt"),
+    ]
+    out_dir = os.path.join(tmp_path, "reports")
+
+    # when
+    answer = [i for i in project5batch(input_files, out_dir, 2)]
+
+    # then
+    assert input_files == [i[0] for i in answer]
+    assert [None, "FileNotFoundError", None] == [
+        i[3] if i[3] is None else i[3].split(":")[0] for i in answer
+    ]
+    assert os.path.exists(answer[2][1])
+    assert not os.path.exists(answer[1][1])
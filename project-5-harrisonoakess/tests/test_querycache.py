@@ -0,0 +1,98 @@
+# type: ignore
+"""Tests for the query cache."""
+
+from project5.datalogprogram import DatalogProgram, Parameter, Predicate
+from project5.interpreter import Interpreter
+from project5.querycache import QueryCache
+from project5.relation import Relation, RelationDelta
+
+
+def _query(*values):
+    return Predicate(
+        "f", [Parameter(i, "STRING" if i.startswith("'") else "ID") for i in values]
+    )
+
+
+def test_given_general_query_when_specific_query_then_answered_from_cache():
+    # given
+    schemeslist = [Predicate("f", [Parameter("A", "ID"), Parameter("B", "ID")])]
+    factslist = [
+        _query(f"'{i}'", f"'{j}'") for i in range(5) for j in range(5) if i <= j
+    ]
+    querieslist = [
+        _query("Y", "X"),
+        _query("'1'", "X"),
+        _query("'1'", "'3'"),
+        _query("X", "X"),
+        _query("'2'", "'2'"),
+        _query("'1'", "Z"),
+    ]
+    datalog = DatalogProgram(
+        schemes=schemeslist, facts=factslist, rules=[], queries=querieslist
+    )
+    interpreter = Interpreter(datalog)
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+
+    # when
+    answer = [i for i in interpreter.eval_queries()]
+
+    # then
+    relation = interpreter.table_list["f"]
+    assert [(i, interpreter.single_query(i, relation)) for i in querieslist] == answer
+    assert 3 == interpreter.query_cache.hits
+
+
+def test_given_budget_when_select_then_least_recently_used_evicted():
+    # given
+    f = Relation(["A", "B"], set([(f"'{i}'", f"'{i % 2}'") for i in range(6)]))
+    cache = QueryCache(5)
+
+    # when
+    cache.select("f", f, ((False, 0), (True, "'0'")))
+    cache.select("f", f, ((False, 0), (True, "'1'")))
+    cache.select("f", f, ((True, "'2'"), (False, 0)))
+
+    # then
+    assert 4 == cache.size
+    assert [
+        ("f", id(f), ((False, 0), (True, "'1'"))),
+        ("f", id(f), ((True, "'2'"), (False, 0))),
+    ] == [i for i in cache.entries]
+    assert {("f", id(f)): set([i[2] for i in cache.entries])} == cache.patterns
+
+
+def test_given_extended_relation_when_select_then_stale_entry_not_used():
+    # given
+    f = Relation(["A", "B"], set([("'a'", "'x'"), ("'a'", "'y'")]))
+    cache = QueryCache()
+    cache.select("f", f, ((False, 0), (True, "'x'")))
+
+    # when
+    f.extend(Relation(["A", "B"], set([("'b'", "'x'")])))
+    answer = cache.select("f", f, ((False, 0), (True, "'x'")))
+
+    # then
+    assert set([("'a'", "'x'"), ("'b'", "'x'")]) == answer.set_of_tuples
+    assert 0 == cache.hits
+
+
+def test_given_relation_and_delta_when_select_then_both_entries_kept():
+    # given
+    f = Relation(["A", "B"], set([("'a'", "'x'"), ("'b'", "'y'")]))
+    delta = RelationDelta(f, set([("'c'", "'x'")]), set([("'a'", "'x'")]))
+    cache = QueryCache()
+    pattern = ((False, 0), (True, "'x'"))
+
+    # when
+    answers = [cache.select("f", i, pattern) for i in (f, delta, f, delta)]
+
+    # then
+    assert [set([("'a'", "'x'")]), set([("'c'", "'x'")])] * 2 == [
+        i.set_of_tuples for i in answers
+    ]
+    assert 3 == cache.hits
+    assert 2 == len(cache)
+    cache.discard(f)
+    assert [("f", id(delta), pattern)] == [i for i in cache.entries]
+    assert {("f", id(delta)): set([pattern])} == cache.patterns
@@ -326,3 +326,70 @@ def test_given_matched_relations_when_difference_then_difference():
 
     # then
     assert expected == answer
+
+
+def test_given_relation_when_trie_then_prefix_lookups_and_sorted_keys():
+    # given
+    relation = Relation(
+        ("a", "b", "c"), set([("1", "2", "3"), ("1", "2", "4"), ("2", "5", "3")])
+    )
+
+    # when
+    trie = relation.trie(["c", "a", "b"])
+
+    # then
+    assert ["3", "4"] == trie.keys()
+    assert ["1", "2"] == trie.keys(("3",))
+    assert [] == trie.keys(("9",))
+    assert {"2": {}} == trie.lookup(("4", "1"))
+    assert [("3", "1", "2"), ("3", "2", "5"), ("4", "1", "2")] == list(trie)
+    assert trie is relation.trie(["c", "a", "b"])
+
+
+def test_given_relation_with_trie_when_add_tuple_then_trie_updated():
+    # given
+    relation = Relation(("a", "b"), set([("1", "2")]))
+    trie = relation.trie(["a", "b"])
+
+    # when
+    relation.add_tuple(("1", "3"))
+    relation.add_tuple(("1", "3"))
+
+    # then
+    assert ["2", "3"] == trie.keys(("1",))
+    assert 2 == len(trie)
+
+
+def test_given_order_not_matching_header_when_trie_then_exception():
+    # given
+    relation = Relation(("a", "b"), set())
+
+    # when
+    with pytest.raises(IncompatibleOperandError) as exception:
+        relation.trie(["a", "c"])
+
+    # then
+    assert (
+        "Error: ['a', 'c'] is not an ordering of header ['a', 'b'] in Relation.trie"
+        == str(exception.value)
+    )
+
+
+def test_given_snapshot_when_extend_then_new_tuples_and_snapshot_unchanged():
+    # given
+    relation = Relation(("a", "b"), set([("1", "2")]))
+    before = relation.snapshot()
+
+    # when
+    new_tuples = relation.extend(Relation(("a", "b"), set([("1", "2"), ("2", "3")])))
+    after = relation.snapshot()
+    relation.extend(Relation(("a", "b"), set([("3", "4")])))
+
+    # then
+    assert set([("2", "3")]) == new_tuples
+    assert Relation(("a", "b"), set([("1", "2")])) == before
+    assert Relation(("a", "b"), set([("1", "2"), ("2", "3")])) == after
+    assert 2 == len(after)
+    assert Relation(("a", "b"), new_tuples) == after.difference(before)
+    with pytest.raises(IncompatibleOperandError):
+        after.add_tuple(("5", "6"))
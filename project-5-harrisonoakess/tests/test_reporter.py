@@ -3,7 +3,9 @@ import pytest
 
 from project5.datalogprogram import Parameter, Predicate, Rule
 from project5.relation import Relation
+from project5.symboltable import SymbolTable
 from project5.reporter import (
+    passes_report,
     project_4_report,
     project_5_report,
     query_report,
@@ -120,6 +122,45 @@ def test_given_eval_rule_iterator_value_when_rule_report_then_expected():
     assert expect == answer
 
 
+def test_given_interned_tuples_when_rule_report_then_decoded_and_sorted():
+    # given
+    symbols = SymbolTable()
+    for i in ["'4'", "'3'", "'1'", "'2'", "'5'"]:
+        symbols.encode(i)
+
+    def _encode(tuples):
+        return set(tuple(symbols.encode(j) for j in i) for i in tuples)
+
+    before = Relation(["e", "f"], _encode(init_r_tuples))
+    rule = Rule(
+        Predicate("r", [Parameter.id("E"), Parameter.id("F")]),
+        [Predicate("f", [Parameter.id("E"), Parameter.id("F")])],
+    )
+    after = Relation(["e", "f"], _encode(init_r_tuples.union(init_f_tuples)))
+    expect = """r(E,F) :- f(E,F).
+  e='1', f='2'
+  e='4', f='3'"""
+
+    # when
+    answer = rule_report(before, rule, after, symbols)
+
+    # then
+    assert expect == answer
+
+
+def test_given_passes_when_passes_report_then_expected():
+    # given
+    passes = [([0], 1), ([1, 2], 8)]
+    expect = """1 pass: R0
+8 passes: R1,R2"""
+
+    # when
+    answer = passes_report(passes)
+
+    # then
+    assert expect == answer
+
+
 def test_given_num_rules_rule_evals_query_evals_when_project_4_report_then_expected():
     # given
     rule_0 = Rule(
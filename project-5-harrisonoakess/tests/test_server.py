@@ -0,0 +1,147 @@
+# type: ignore
+"""Tests for the query server."""
+
+import asyncio
+import os
+
+import pytest
+
+from project5.lexer import lexer
+from project5.parser import parse
+from project5.relation import IncompatibleOperandError
+from project5.server import QueryServer
+from project5.snapshot import SnapshotStore
+from tests.builders import fixpoint, reach
+
+_TEST_ROOT_DIR = "./tests/resources/project5-passoff/"
+
+
+async def _ask(server, lines, socket_path=None, port=None):
+    """Send `lines` to a running `server` and read back one answer for each."""
+    listening = await server.start(socket_path, port)
+    async with listening:
+        if socket_path is not None:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+        else:
+            port = listening.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        answers = []
+        for line in lines:
+            writer.write(
+                line + b"\n" if isinstance(line, bytes) else (line + "\n").encode()
+            )
+            await writer.drain()
+            answer = []
+            while (text := (await reader.readline()).decode()) != "\n":
+                answer.append(text)
+            answers.append("".join(answer).rstrip("\n"))
+        writer.close()
+        await writer.wait_closed()
+    return answers
+
+
+@pytest.mark.parametrize("number", range(8))
+def test_given_passoff_input_when_served_then_same_query_answers(number, tmp_path):
+    # given
+    with open(os.path.join(_TEST_ROOT_DIR, "80", f"input{number}.txt"), "r") as f:
+        input = f.read()
+    with open(os.path.join(_TEST_ROOT_DIR, "80", f"answer{number}.txt"), "r") as f:
+        expect = f.read()
+    server = QueryServer.load(input)
+    queries = [f"{i}?" for i in parse(lexer(input)).queries]
+
+    # when
+    answers = asyncio.run(_ask(server, queries, socket_path=str(tmp_path / "sock")))
+
+    # then
+    index = expect.index("Query Evaluation\n") + len("Query Evaluation\n")
+    assert expect[index:].rstrip("\n") == "\n".join(answers)
+    assert len(queries) == server.answered
+
+
+def test_given_bad_lines_when_served_over_tcp_then_failures_and_server_continues():
+    # given
+    server = QueryServer.load(
+        "Schemes: f(a,b) Facts: f('1','2'). f('2','2'). Rules: Queries: f(A,B)?"
+    )
+
+    # when
+    answers = asyncio.run(
+        _ask(server, ["f(A,B)", "f(A)?", "f(A,A)? f('1',B)?"], port=0)
+    )
+
+    # then
+    assert [
+        'Failure!\n  (EOF,"",1)',
+        "Failure!\n  f(A)? does not match a scheme",
+        "f(A,A)? Yes(1)\n  A='2'\nf('1',B)? Yes(1)\n  B='2'",
+    ] == answers
+    assert 2 == server.answered
+
+
+def test_given_invalid_utf8_or_error_when_served_then_failures_and_server_continues(
+    monkeypatch,
+):
+    # given
+    server = QueryServer.load(
+        "Schemes: f(a,b) Facts: f('1','2'). Rules: Queries: f(A,B)?"
+    )
+    answer_query = SnapshotStore.answer_query
+
+    def _answer_query(self, snapshot, query):
+        if query.parameters[0].value == "'9'":
+            raise IncompatibleOperandError("Error: failed")
+        return answer_query(self, snapshot, query)
+
+    monkeypatch.setattr(SnapshotStore, "answer_query", _answer_query)
+
+    # when
+    answers = asyncio.run(
+        _ask(server, [b"f(\xff,B)?", "f('9',B)?", "f('1',B)?"], port=0)
+    )
+
+    # then
+    assert [
+        'Failure!\n  (UNDEFINED,"\ufffd",1)',
+        "Failure!\n  Error: failed",
+        "f('1',B)? Yes(1)\n  B='2'",
+    ] == answers
+
+
+def test_given_update_running_when_queried_then_answers_from_one_version(tmp_path):
+    # given
+    server = QueryServer(
+        fixpoint(reach([(i, (i + 1) % 150) for i in range(150)]), intern=True)
+    )
+    socket_path = str(tmp_path / "sock")
+    query = "p('0',Y)? p(X,'0')?"
+    before = server.answer(query)
+
+    async def _session():
+        listening = await server.start(socket_path)
+        async with listening:
+            _, updater = await asyncio.open_unix_connection(socket_path)
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            updater.write(b"- e('75','76').\n")
+            await updater.drain()
+            answers = []
+            while server.store.current.version == 0:
+                writer.write((query + "\n").encode())
+                await writer.drain()
+                answer = []
+                while (text := (await reader.readline()).decode()) != "\n":
+                    answer.append(text)
+                answers.append("".join(answer).rstrip("\n"))
+            updater.close()
+            writer.close()
+        return answers
+
+    # when
+    answers = asyncio.run(_session())
+
+    # then
+    after = server.answer(query)
+    assert before != after
+    assert all(i in (before, after) for i in answers)
+    assert after.startswith("p('0',Y)? Yes(75)")
+    assert [1] == list(server.store.live)
@@ -0,0 +1,109 @@
+# type: ignore
+"""Tests for the snapshot store of versioned relations."""
+
+from project5.datalogprogram import Parameter, Predicate
+from project5.relation import RelationDelta
+from project5.snapshot import SnapshotStore
+from project5.symboltable import SymbolTable
+from tests.builders import binary, edge, fixpoint, reach
+
+
+def _store(edges):
+    """The snapshot store for reachability over a graph given by its edges."""
+    datalog = reach(edges)
+    datalog.schemes.append(binary("q", "A", "B"))
+    return SnapshotStore(fixpoint(datalog, intern=True))
+
+
+def _answer(store, snapshot, query):
+    relation = store.interpreter.decode_relation(store.answer_query(snapshot, query))
+    return relation.set_of_tuples
+
+
+def test_given_pinned_snapshot_when_updates_published_then_reader_sees_its_version():
+    # given
+    store = _store([(1, 2), (2, 3)])
+    query = Predicate("p", [Parameter("'1'", "STRING"), Parameter("Y", "ID")])
+    first = store.pin()
+
+    # when
+    store.publish(store.update(insert=[edge(3, 4)]))
+    second = store.pin()
+    store.publish(store.update(delete=[edge(1, 2)]))
+
+    # then
+    assert set([("'2'",), ("'3'",)]) == _answer(store, first, query)
+    assert set([("'2'",), ("'3'",), ("'4'",)]) == _answer(store, second, query)
+    assert set() == _answer(store, store.current, query)
+    assert set([0, 1, 2]) == set(store.live)
+    assert first.table_list["q"] is store.current.table_list["q"]
+    assert first.table_list["p"] is not second.table_list["p"]
+
+
+def test_given_released_snapshots_when_not_current_then_reclaimed_with_cache():
+    # given
+    store = _store([(1, 2), (2, 3)])
+    query = binary("p", "X", "Y")
+    with store.pinned() as snapshot:
+        _answer(store, snapshot, binary("p", "'1'", "'3'", "STRING"))
+        store.publish(store.update(insert=[edge(5, 6)]))
+        assert 1 == len(store.query_cache)
+
+    # when
+    store.publish(store.update(insert=[edge(3, 4)]))
+
+    # then
+    assert [2] == list(store.live)
+    assert 2 == store.reclaimed
+    assert 0 == len(store.query_cache)
+    assert 7 == len(_answer(store, store.current, query))
+
+
+def test_given_small_updates_when_published_then_deltas_until_half_changed():
+    # given
+    store = _store([(i, i + 1) for i in range(1, 10)])
+    query = Predicate("p", [Parameter("'1'", "STRING"), Parameter("Y", "ID")])
+    before = _answer(store, store.current, query)
+    parent = store.current.table_list["p"]
+
+    # when
+    store.publish(store.update(insert=[edge(10, 11)]))
+    delta = store.current.table_list["p"]
+    hits = store.query_cache.hits
+    after = _answer(store, store.current, query)
+    store.publish(store.update(delete=[edge(1, 2)]))
+    second = store.current.table_list["p"]
+    store.publish(store.update(delete=[edge(2, 3)]))
+
+    # then
+    expect = _store([(i, i + 1) for i in range(3, 11)])
+    assert isinstance(delta, RelationDelta) and delta.parent is parent
+    assert 10 == len(delta.added) and 55 == len(delta)
+    assert hits + 1 == store.query_cache.hits
+    assert before | set([("'11'",)]) == after
+    assert isinstance(second, RelationDelta) and 20 == second.changes
+    assert not isinstance(store.current.table_list["p"], RelationDelta)
+    assert expect.interpreter.decode_relation(
+        expect.current.table_list["p"]
+    ) == store.interpreter.decode_relation(store.current.table_list["p"])
+    assert set() == _answer(store, store.current, query)
+
+
+def test_given_query_when_answered_on_snapshot_then_symbols_not_encoded(monkeypatch):
+    # given
+    store = _store([(1, 2), (2, 3)])
+
+    def _encode(self, value):
+        raise AssertionError(f"{value} encoded by a reader")
+
+    monkeypatch.setattr(SymbolTable, "encode", _encode)
+
+    # when
+    answers = [
+        _answer(store, store.current, binary("p", "'1'", "'3'", "STRING")),
+        _answer(store, store.current, binary("p", "'1'", "'9'", "STRING")),
+        _answer(store, store.current, binary("p", "X", "X")),
+    ]
+
+    # then
+    assert [set([()]), set(), set()] == answers
@@ -0,0 +1,73 @@
+# type: ignore
+"""Tests for the tabled top-down interpreter."""
+
+import os
+
+import pytest
+
+from project5.datalogprogram import Parameter, Predicate
+from project5.project5 import project5
+from project5.tabled import TabledInterpreter
+from tests.builders import fixpoint, reach
+
+_TEST_ROOT_DIR = "./tests/resources/project5-passoff/"
+
+
+def _cycle(length, query):
+    """A left-recursive transitive closure over one cycle of `length` nodes."""
+    return reach([(i, (i + 1) % length) for i in range(length)], queries=[query])
+
+
+def _answers(interpreter):
+    interpreter.eval_schemes()
+    interpreter.eval_facts()
+    return [(str(i), j.set_of_tuples) for i, j in interpreter.eval_queries()]
+
+
+def test_given_recursive_rules_when_tabled_then_same_answers_as_bottom_up():
+    # given
+    query = Predicate("p", [Parameter("'3'", "STRING"), Parameter("Y", "ID")])
+    expect = fixpoint(_cycle(6, query))
+
+    # when
+    answer = _answers(TabledInterpreter(_cycle(6, query)))
+
+    # then
+    assert [(str(i), j.set_of_tuples) for i, j in expect.eval_queries()] == answer
+    assert set([(f"'{i}'",) for i in range(6)]) == answer[0][1]
+
+
+def test_given_selective_query_when_tabled_then_only_its_calls_tabled():
+    # given
+    query = Predicate("p", [Parameter("'7'", "STRING"), Parameter("'9'", "STRING")])
+    interpreter = TabledInterpreter(_cycle(2000, query), intern=True)
+
+    # when
+    answer = _answers(interpreter)
+
+    # then
+    assert [("p('7','9')", set([()]))] == answer
+    assert set([("p", (7, 9)), ("p", (7, None))]) == set(interpreter.tables)
+    assert 2000 == len(interpreter.tables[("p", (7, None))].set_of_tuples)
+
+
+@pytest.mark.parametrize("bucket", ["80", "100"])
+def test_given_passoff_inputs_when_tabled_then_same_query_answers(bucket):
+    # given
+    test_dir = os.path.join(_TEST_ROOT_DIR, bucket)
+    for name in sorted(os.listdir(test_dir)):
+        if not name.startswith("input"):
+            continue
+        with open(os.path.join(test_dir, name), "r") as f:
+            input = f.read()
+
+        # when
+        answer = project5(input, tabled=True)
+
+        # then
+        expect = project5(input)
+        if expect.startswith("Failure!"):
+            assert expect == answer
+        else:
+            index = expect.index("Query Evaluation")
+            assert expect[index:] == answer[answer.index("Query Evaluation") :], name